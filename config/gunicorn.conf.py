@@ -0,0 +1,35 @@
+"""
+Gunicorn settings for production: `gunicorn -c config/gunicorn.conf.py config.wsgi:application`.
+Every value can be overridden from the environment.
+"""
+
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "127.0.0.1:8000")
+
+# Threads overlap the blocking calls to the external API; keep the process count modest.
+workers = int(os.environ.get("GUNICORN_WORKERS", "4"))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", "4"))
+
+# Import Django once in the master and fork: workers start in milliseconds and share memory.
+preload_app = True
+
+# Recycle workers to cap slow memory growth.
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", "100"))
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = 30
+keepalive = 5
+
+loglevel = os.environ.get("GUNICORN_LOG_LEVEL", "info")
+accesslog = "-"
+
+
+def when_ready(server):
+    # Runs in the master after the app is preloaded, before workers are forked.
+    from core.warmup import warm_up
+
+    warm_up()
+    server.log.info("Caches warmed up")
@@ -50,6 +50,11 @@ CSRF_TRUSTED_ORIGINS = [
 ]
 
 
+# Release identifier (e.g. git sha): part of every ETag, so a deploy invalidates
+# pages cached by browsers.
+APP_RELEASE = os.environ.get("APP_RELEASE", "")
+
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -59,10 +64,6 @@ INSTALLED_APPS = [
     "unfold.contrib.forms",
     "unfold.contrib.inlines",
     "unfold.contrib.import_export",
-    "unfold.contrib.guardian",
-    "unfold.contrib.simple_history",
-    "unfold.contrib.location_field",
-    "unfold.contrib.constance",
     "django.contrib.admin",
     "django.contrib.auth",
     "django.contrib.contenttypes",
@@ -75,11 +76,15 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    # Compress HTML/JSON responses; static files are served precompressed by WhiteNoise above.
+    "django.middleware.gzip.GZipMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.locale.LocaleMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "core.profiling.ProfilerMiddleware",
+    "core.replica.ReplicaMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -102,6 +107,19 @@ TEMPLATES = [
     },
 ]
 
+if not DEBUG:
+    # Compile each template once per process.
+    TEMPLATES[0]["APP_DIRS"] = False
+    TEMPLATES[0]["OPTIONS"]["loaders"] = [
+        (
+            "django.template.loaders.cached.Loader",
+            [
+                "django.template.loaders.filesystem.Loader",
+                "django.template.loaders.app_directories.Loader",
+            ],
+        ),
+    ]
+
 WSGI_APPLICATION = 'config.wsgi.application'
 
 
@@ -115,6 +133,70 @@ DATABASES = {
     }
 }
 
+# Old transactions/transfers are moved to archive tables by `manage.py archive_history`.
+# Set DJANGO_ARCHIVE_DB_NAME to keep them in a separate SQLite file
+# (then run `manage.py migrate --database archive` once).
+ARCHIVE_AFTER_DAYS = int(os.environ.get("DJANGO_ARCHIVE_AFTER_DAYS", "180"))
+ARCHIVE_DATABASE = "default"
+if os.environ.get("DJANGO_ARCHIVE_DB_NAME"):
+    DATABASES["archive"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.environ["DJANGO_ARCHIVE_DB_NAME"],
+    }
+    ARCHIVE_DATABASE = "archive"
+
+# Optional read replica for dashboards, reports and admin changelists
+# (core.replica). Locally, point DJANGO_REPLICA_DB_NAME at a copy of db.sqlite3.
+# After a write, that client reads from the primary for REPLICA_MAX_LAG seconds.
+REPLICA_DATABASE = None
+REPLICA_MAX_LAG = int(os.environ.get("DJANGO_REPLICA_MAX_LAG", "5"))
+if os.environ.get("DJANGO_REPLICA_DB_NAME"):
+    DATABASES["replica"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.environ["DJANGO_REPLICA_DB_NAME"],
+        "TEST": {"MIRROR": "default"},
+    }
+    REPLICA_DATABASE = "replica"
+
+DATABASE_ROUTERS = ["core.db_routers.ReplicaRouter", "core.db_routers.ArchiveRouter"]
+
+
+# Cache
+# Rate limits and cached API data must be shared by all gunicorn workers in production:
+# set DJANGO_REDIS_URL (e.g. redis://127.0.0.1:6379/1, needs the `redis` package).
+if os.environ.get("DJANGO_REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["DJANGO_REDIS_URL"],
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+# Whether all workers see one cache. With the per-process LocMemCache, a write in
+# one worker is invisible to the others' cached data, so caches keyed by the data
+# version (dashboard fragments, ETags) are bypassed and cached API data is kept short.
+CACHE_SHARED = bool(os.environ.get("DJANGO_REDIS_URL"))
+
+# Sessions: "db" (django_session table), "cached_db" (cache in front of the table),
+# "cache" (cache only) or "signed_cookies" (nothing stored server-side).
+# Cache-backed profiles need the shared cache (DJANGO_REDIS_URL) with several workers.
+# Compare them with `manage.py benchmark_sessions`.
+SESSION_PROFILES = {
+    "db": "django.contrib.sessions.backends.db",
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+    "cache": "django.contrib.sessions.backends.cache",
+    "signed_cookies": "django.contrib.sessions.backends.signed_cookies",
+}
+SESSION_PROFILE = os.environ.get(
+    "DJANGO_SESSION_PROFILE", "cached_db" if os.environ.get("DJANGO_REDIS_URL") else "db"
+)
+SESSION_ENGINE = SESSION_PROFILES[SESSION_PROFILE]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -161,6 +243,9 @@ STORAGES = {
         "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
     }
 }
+# Hashed files (core/*.js, core/app.css, ...) are served with a far-future
+# `Cache-Control: immutable` header; gzip and brotli (needs `Brotli`) variants are
+# written by collectstatic and picked by WhiteNoise from Accept-Encoding.
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
@@ -174,3 +259,24 @@ LOGOUT_REDIRECT_URL = "login"
 
 # External APIs
 YILDIZTOP_API_BASE = os.environ.get("YILDIZTOP_API_BASE", "https://yildiztop.com/api")
+# Shared secret of the client-change webhook (core.webhooks); empty disables it.
+YILDIZTOP_WEBHOOK_SECRET = os.environ.get("YILDIZTOP_WEBHOOK_SECRET", "")
+# Client directory cache lifetimes (seconds). With the webhook pushing changes
+# into a shared cache they only bound staleness if a notification is lost; a
+# per-process cache would only be patched in the worker receiving the webhook.
+_WEBHOOK_UPDATES_CACHE = bool(YILDIZTOP_WEBHOOK_SECRET) and CACHE_SHARED
+YILDIZTOP_DIRECTORY_TTL = int(
+    os.environ.get("YILDIZTOP_DIRECTORY_TTL", "21600" if _WEBHOOK_UPDATES_CACHE else "600")
+)
+YILDIZTOP_TOKEN_TTL = int(os.environ.get("YILDIZTOP_TOKEN_TTL", "3600" if _WEBHOOK_UPDATES_CACHE else "120"))
+
+# Per-user request limits: "<count>/<period>", period in s/m/h (see core.ratelimit)
+RATELIMITS = {
+    "api_clients": os.environ.get("RATELIMIT_API_CLIENTS", "30/10s"),
+    "api_clients_batch": os.environ.get("RATELIMIT_API_CLIENTS_BATCH", "10/10s"),
+    "api_users": os.environ.get("RATELIMIT_API_USERS", "30/10s"),
+}
+
+# Staff can profile a request with ?__profile=1 or "X-Profile: 1" (core.profiling);
+# only the newest profiles are kept.
+REQUEST_PROFILES_KEEP = int(os.environ.get("REQUEST_PROFILES_KEEP", "200"))
@@ -1,11 +1,25 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
 from django.contrib.auth import get_user_model
 from django.contrib.auth.admin import UserAdmin as DjangoUserAdmin
 from django.contrib.auth.forms import UserChangeForm, UserCreationForm
 from django.contrib.auth.models import Group
+from django.db.models import F
+from django.http import HttpResponseRedirect
+from django.utils.html import format_html, format_html_join
 from unfold.admin import ModelAdmin
 
-from .models import Transaction, Wallet, WalletTransfer
+from .models import (
+    DailyRollup,
+    FundHold,
+    RequestProfile,
+    Transaction,
+    TransactionArchive,
+    VelocityLimit,
+    Wallet,
+    WalletTransfer,
+    WalletTransferArchive,
+)
 
 User = get_user_model()
 
@@ -72,11 +86,56 @@ class GroupAdmin(ModelAdmin):
     ordering = ("name",)
 
 
+class WalletAdminForm(forms.ModelForm):
+    """
+    Carries the wallet version the edit started from (see WalletAdmin.save_model).
+    """
+
+    CHANGED_CONCURRENTLY = "Кошелёк изменён другой операцией, обновите страницу и повторите правку."
+
+    version_seen = forms.IntegerField(widget=forms.HiddenInput)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["version_seen"].initial = self.instance.version
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if self.instance.pk and cleaned_data.get("version_seen") != self.instance.version:
+            raise forms.ValidationError(self.CHANGED_CONCURRENTLY)
+        return cleaned_data
+
+
 @admin.register(Wallet)
 class WalletAdmin(ModelAdmin):
-    list_display = ("user", "currency", "balance")
+    form = WalletAdminForm
+    list_display = ("user", "currency", "balance", "held")
+    list_select_related = ("user",)
+    readonly_fields = ("held",)
     search_fields = ("user__username", "user__email")
 
+    def save_model(self, request, obj, form, change):
+        if not change:
+            return super().save_model(request, obj, form, change)
+        # Write only the edited fields, only over the version the form was based on,
+        # and bump it: a concurrent core.balances.transfer() then retries instead of
+        # being overwritten, and a correction never overwrites a transfer.
+        changes = {name: getattr(obj, name) for name in form.changed_data if name != "version_seen"}
+        updated = Wallet.objects.filter(pk=obj.pk, version=form.cleaned_data["version_seen"]).update(
+            **changes, version=F("version") + 1
+        )
+        obj.changed_concurrently = not updated
+
+    def log_change(self, request, obj, message):
+        if not getattr(obj, "changed_concurrently", False):
+            return super().log_change(request, obj, message)
+
+    def response_change(self, request, obj):
+        if getattr(obj, "changed_concurrently", False):
+            self.message_user(request, WalletAdminForm.CHANGED_CONCURRENTLY, messages.ERROR)
+            return HttpResponseRedirect(request.path)
+        return super().response_change(request, obj)
+
 
 @admin.register(Transaction)
 class TransactionAdmin(ModelAdmin):
@@ -89,6 +148,7 @@ class TransactionAdmin(ModelAdmin):
         "amount",
         "created_at_fmt",
     )
+    list_select_related = ("wallet__user",)
     list_filter = (
         ("wallet__user", admin.RelatedOnlyFieldListFilter),
         ("created_at", admin.DateFieldListFilter),
@@ -118,6 +178,7 @@ class TransactionAdmin(ModelAdmin):
 @admin.register(WalletTransfer)
 class WalletTransferAdmin(ModelAdmin):
     list_display = ("id", "from_wallet", "to_wallet", "amount", "created_at")
+    list_select_related = ("from_wallet__user", "to_wallet__user")
     list_filter = (
         ("from_wallet__user", admin.RelatedOnlyFieldListFilter),
         ("to_wallet__user", admin.RelatedOnlyFieldListFilter),
@@ -135,4 +196,130 @@ class WalletTransferAdmin(ModelAdmin):
         return False
 
     def has_delete_permission(self, request, obj=None):
-        return False
\ No newline at end of file
+        return False
+
+
+@admin.register(FundHold)
+class FundHoldAdmin(ModelAdmin):
+    list_display = ("id", "wallet", "amount", "status", "created_at", "expires_at", "settled_at")
+    list_filter = ("status", ("created_at", admin.DateFieldListFilter))
+    list_select_related = ("wallet__user",)
+    search_fields = ("wallet__user__username",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(VelocityLimit)
+class VelocityLimitAdmin(ModelAdmin):
+    list_display = ("id", "user", "group", "kind", "period", "max_amount", "max_count")
+    list_filter = ("kind", "period", "group")
+    list_select_related = ("user", "group")
+    raw_id_fields = ("user",)
+    search_fields = ("user__username", "group__name")
+
+
+@admin.register(DailyRollup)
+class DailyRollupAdmin(ModelAdmin):
+    list_display = ("day", "wallet", "kind", "total", "count")
+    list_filter = ("kind", ("day", admin.DateFieldListFilter))
+    list_select_related = ("wallet__user",)
+    search_fields = ("wallet__user__username",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(ModelAdmin):
+    list_display = (
+        "created_at",
+        "user",
+        "method",
+        "path",
+        "status_code",
+        "duration_ms",
+        "sql_count",
+        "sql_ms",
+        "external_count",
+        "external_ms",
+    )
+    list_filter = ("method", "status_code", ("created_at", admin.DateFieldListFilter))
+    list_select_related = ("user",)
+    search_fields = ("path", "user__username")
+    fields = (
+        ("created_at", "user"),
+        ("method", "path", "status_code"),
+        ("duration_ms", "sql_count", "sql_ms", "external_count", "external_ms"),
+        "external_calls_table",
+        "queries_table",
+        "call_tree_text",
+    )
+    readonly_fields = tuple(f for row in fields for f in (row if isinstance(row, tuple) else (row,)))
+
+    @admin.display(description="Внешние вызовы")
+    def external_calls_table(self, obj: RequestProfile) -> str:
+        return format_html_join(
+            "\n", "<div>{} ms &nbsp; {} {} {}</div>", ((c["ms"], c["method"], c["url"], c["error"]) for c in obj.external_calls)
+        ) or "—"
+
+    @admin.display(description="SQL (по убыванию времени)")
+    def queries_table(self, obj: RequestProfile) -> str:
+        queries = sorted(obj.queries, key=lambda q: q["ms"], reverse=True)
+        return format_html_join(
+            "\n", "<div><b>{} ms</b> [{}] <code>{}</code></div>", ((q["ms"], q["db"], q["sql"]) for q in queries)
+        ) or "—"
+
+    @admin.display(description="Профиль вызовов")
+    def call_tree_text(self, obj: RequestProfile) -> str:
+        return format_html('<pre style="font-size: 11px; overflow-x: auto">{}</pre>', obj.call_tree)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+class ReadOnlyArchiveAdmin(ModelAdmin):
+    """
+    Archive tables may live in another database: no joins, wallets are prefetched.
+    """
+
+    prefetch_fields: tuple[str, ...] = ()
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related(*self.prefetch_fields)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(TransactionArchive)
+class TransactionArchiveAdmin(ReadOnlyArchiveAdmin):
+    list_display = ("id", "wallet", "type", "external_referral_token", "external_user_name", "amount", "created_at")
+    list_filter = ("month", "type")
+    search_fields = ("external_user_name", "external_user_email", "external_referral_token")
+    prefetch_fields = ("wallet__user",)
+
+
+@admin.register(WalletTransferArchive)
+class WalletTransferArchiveAdmin(ReadOnlyArchiveAdmin):
+    list_display = ("id", "from_wallet", "to_wallet", "amount", "created_at")
+    list_filter = ("month",)
+    prefetch_fields = ("from_wallet__user", "to_wallet__user")
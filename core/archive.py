@@ -0,0 +1,93 @@
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.db.models import Model
+from django.utils import timezone
+
+from .data_version import bump_data_version
+from .models import (
+    RollupCursor,
+    Transaction,
+    TransactionArchive,
+    Wallet,
+    WalletTransfer,
+    WalletTransferArchive,
+)
+from .rollups import SOURCE_TRANSACTIONS, SOURCE_TRANSFERS
+
+# hot model -> (archive model, rollup source guarding it)
+ARCHIVES: dict[type[Model], tuple[type[Model], str]] = {
+    Transaction: (TransactionArchive, SOURCE_TRANSACTIONS),
+    WalletTransfer: (WalletTransferArchive, SOURCE_TRANSFERS),
+}
+
+
+def _month(dt: datetime) -> date:
+    return timezone.localtime(dt).date().replace(day=1)
+
+
+def _archive_ids(model: type[Model], ids: list[int]) -> int:
+    archive_model, _ = ARCHIVES[model]
+    # Generated columns (amount_minor) are computed again by the archive table.
+    fields = [f.attname for f in model._meta.concrete_fields if not f.generated]
+    rows = list(model.objects.filter(id__in=ids).values(*fields))
+    objs = [archive_model(month=_month(r["created_at"]), **r) for r in rows]
+    archive_db = settings.ARCHIVE_DATABASE
+    # Copy first, delete second. If the two aliases differ and the delete fails,
+    # the next run re-copies the same ids, which ignore_conflicts turns into a no-op.
+    with db_transaction.atomic(using=archive_db), db_transaction.atomic(using="default"):
+        archive_model.objects.using(archive_db).bulk_create(objs, ignore_conflicts=True)
+        model.objects.filter(id__in=[r["id"] for r in rows]).delete()
+    return len(rows)
+
+
+def archive_old_rows(older_than_days: int, chunk_size: int = 2000, dry_run: bool = False) -> dict[str, int]:
+    """
+    Move Transaction/WalletTransfer rows older than `older_than_days` into the
+    archive tables in chunks. Rows not yet folded into the daily rollups are
+    never moved, so reports stay complete.
+    Returns the number of moved (or, with dry_run, eligible) rows per model.
+    """
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    cursors = dict(RollupCursor.objects.values_list("source", "last_id"))
+    moved: dict[str, int] = {}
+    for model, (_, source) in ARCHIVES.items():
+        eligible = model.objects.filter(created_at__lt=cutoff, id__lte=cursors.get(source, 0))
+        name = model._meta.model_name
+        if dry_run:
+            moved[name] = eligible.count()
+            continue
+        moved[name] = 0
+        while True:
+            ids = list(eligible.order_by("id").values_list("id", flat=True)[:chunk_size])
+            if not ids:
+                break
+            moved[name] += _archive_ids(model, ids)
+    if not dry_run and any(moved.values()):
+        bump_data_version()
+    return moved
+
+
+def transaction_history(limit: int, *, wallet_id: int | None = None, user_id: str | None = None) -> list:
+    """
+    Newest `limit` transactions (optionally for one wallet or user), reading
+    through to TransactionArchive when the hot table has fewer rows.
+    """
+    qs = Transaction.objects.select_related("wallet", "wallet__user")
+    if wallet_id is not None:
+        qs = qs.filter(wallet_id=wallet_id)
+    if user_id:
+        qs = qs.filter(wallet__user_id=user_id)
+    rows = list(qs[:limit])
+    if len(rows) >= limit:
+        return rows
+
+    # The archive may live in another database: no joins, resolve wallets first.
+    older = TransactionArchive.objects.prefetch_related("wallet__user")
+    if wallet_id is not None:
+        older = older.filter(wallet_id=wallet_id)
+    if user_id:
+        older = older.filter(wallet_id__in=list(Wallet.objects.filter(user_id=user_id).values_list("pk", flat=True)))
+    rows.extend(older[: limit - len(rows)])
+    return rows
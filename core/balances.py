@@ -0,0 +1,90 @@
+"""
+Writes to Wallet.balance and Wallet.held with optimistic concurrency: no row is
+locked while reading, and every write bumps Wallet.version.
+
+- adjust() is a single UPDATE whose condition the database evaluates (holds,
+  direct debits), so it never has to retry.
+- transfer() reads (balance, held, version) of both wallets, checks the funds,
+  then writes both rows only if their versions are still the ones it read, in a
+  short transaction and in primary-key order, so two cashiers paying each other
+  can't deadlock. When another write got in between nothing is written and the
+  transfer is recomputed from a fresh read, at most MAX_ATTEMPTS times.
+"""
+
+import random
+import time
+from decimal import Decimal
+
+from django.db import transaction as db_transaction
+from django.db.models import F
+
+from .models import Wallet, WalletTransfer
+
+MAX_ATTEMPTS = 10
+# Random sleep before retry n is up to BACKOFF_SECONDS * 2**n.
+BACKOFF_SECONDS = 0.001
+
+_ZERO = Decimal("0")
+
+
+class WalletBusy(RuntimeError):
+    """
+    The wallets kept changing during transfer(); nothing was written.
+    """
+
+
+class _Stale(Exception):
+    pass
+
+
+def adjust(wallet_id: int, balance: Decimal = _ZERO, held: Decimal = _ZERO, *, covered: bool = False) -> bool:
+    """
+    Add `balance` and `held` to the wallet. With `covered`, only if the available
+    balance (balance - held) stays non-negative. False if nothing was changed.
+    """
+    qs = Wallet.objects.filter(pk=wallet_id)
+    if covered:
+        qs = qs.filter(balance__gte=F("held") + (held - balance))
+    changes = {"version": F("version") + 1}
+    if balance:
+        changes["balance"] = F("balance") + balance
+    if held:
+        changes["held"] = F("held") + held
+    return qs.update(**changes) == 1
+
+
+def transfer(from_wallet_id: int, to_wallet_id: int, amount: Decimal) -> WalletTransfer | None:
+    """
+    Move `amount` between wallets and record the WalletTransfer. None if the
+    sender's available balance doesn't cover it; raises WalletBusy if the
+    wallets changed under every attempt.
+    """
+    deltas = {from_wallet_id: -amount}
+    deltas[to_wallet_id] = deltas.get(to_wallet_id, _ZERO) + amount
+    for attempt in range(MAX_ATTEMPTS):
+        if attempt:
+            time.sleep(random.uniform(0, BACKOFF_SECONDS * 2**attempt))
+        rows = {
+            pk: (balance, held, version)
+            for pk, balance, held, version in Wallet.objects.filter(pk__in=deltas).values_list(
+                "pk", "balance", "held", "version"
+            )
+        }
+        balance, held, _ = rows[from_wallet_id]
+        if balance - held < amount:
+            return None
+        try:
+            with db_transaction.atomic():
+                for pk in sorted(deltas):
+                    balance, _, version = rows[pk]
+                    updated = Wallet.objects.filter(pk=pk, version=version).update(
+                        balance=balance + deltas[pk], version=version + 1
+                    )
+                    if updated != 1:
+                        raise _Stale
+                return WalletTransfer.objects.create(
+                    from_wallet_id=from_wallet_id, to_wallet_id=to_wallet_id, amount=amount
+                )
+        except _Stale:
+            continue
+    raise WalletBusy(f"Wallets {sorted(deltas)} kept changing; gave up after {MAX_ATTEMPTS} attempts")
@@ -0,0 +1,62 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+_LOCAL_CACHE = "django.core.cache.backends.locmem.LocMemCache"
+_CACHE_SESSION_ENGINES = {
+    "django.contrib.sessions.backends.cache",
+    "django.contrib.sessions.backends.cached_db",
+}
+
+
+@register(Tags.caches, deploy=True)
+def check_session_cache(app_configs, **kwargs):
+    """
+    Cache-backed sessions in a per-process cache: a logout in one gunicorn
+    worker stays invisible to the others.
+    """
+    if settings.SESSION_ENGINE not in _CACHE_SESSION_ENGINES:
+        return []
+    backend = settings.CACHES[getattr(settings, "SESSION_CACHE_ALIAS", "default")]["BACKEND"]
+    if backend != _LOCAL_CACHE:
+        return []
+    return [
+        Warning(
+            "Cache-backed sessions use a per-process LocMemCache.",
+            hint="Set DJANGO_REDIS_URL or use DJANGO_SESSION_PROFILE=db / signed_cookies.",
+            id="core.W001",
+        )
+    ]
+
+
+@register(Tags.caches, deploy=True)
+def check_history_cache(app_configs, **kwargs):
+    """
+    Without a shared cache the data version is per worker, so the dashboard
+    fragment cache and its ETags are bypassed (every request renders in full).
+    """
+    if settings.CACHE_SHARED:
+        return []
+    return [
+        Warning(
+            "No shared cache: dashboard history caching and ETags are disabled.",
+            hint="Set DJANGO_REDIS_URL so every gunicorn worker sees the same data version.",
+            id="core.W002",
+        )
+    ]
+
+
+@register(Tags.caches, deploy=True)
+def check_webhook_cache(app_configs, **kwargs):
+    """
+    A client-change webhook only patches the cache of the worker that receives
+    it unless the cache is shared, so the directory TTLs stay short.
+    """
+    if not settings.YILDIZTOP_WEBHOOK_SECRET or settings.CACHE_SHARED:
+        return []
+    return [
+        Warning(
+            "The Yildiztop webhook only updates the client cache of the worker that receives it.",
+            hint="Set DJANGO_REDIS_URL; until then the client directory keeps its short cache lifetimes.",
+            id="core.W003",
+        )
+    ]
@@ -0,0 +1,71 @@
+"""
+Validators for conditional GET (ETag / Last-Modified). They must be much
+cheaper than the views they guard: cache reads and primary-key lookups only.
+"""
+
+import hashlib
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.http import HttpRequest
+
+from .data_version import data_changed_within, get_data_version, history_cache_enabled
+from .external_api import users_cache_stamp
+from .models import Wallet
+from .permissions import is_main_cashier
+
+
+def _digest(*parts) -> str:
+    return hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+
+def dashboard_etag(request: HttpRequest) -> str | None:
+    if not request.user.is_authenticated or not history_cache_enabled():
+        return None
+    # Flashed messages are rendered once: never answer 304 while some are pending.
+    if len(get_messages(request)):
+        return None
+    wallet = Wallet.objects.filter(user=request.user).values_list("balance", "held", "currency").first()
+    if wallet is None:
+        return None
+    return _digest(
+        settings.APP_RELEASE,
+        request.user.pk,
+        # Rotates on login, so a page with a stale CSRF token is never revalidated.
+        request.session.session_key,
+        is_main_cashier(request.user),
+        request.GET.get("user", ""),
+        *wallet,
+        get_data_version(),
+    )
+
+
+def dashboard_replica_ok(request: HttpRequest) -> bool:
+    """
+    The dashboard's ETag and history fragments are keyed by the data version.
+    Rendering them from a replica that may not have caught up with the latest
+    bump would cache stale content under the new key, so use the replica only
+    once the last change is older than the allowed lag.
+    """
+    return not data_changed_within(settings.REPLICA_MAX_LAG)
+
+
+def _client_token(request: HttpRequest) -> str:
+    return (request.GET.get("referral_token") or "").strip()
+
+
+def api_clients_etag(request: HttpRequest) -> str | None:
+    token = _client_token(request)
+    stamp = users_cache_stamp(token) if token else None
+    if stamp is None:
+        return None
+    return _digest(settings.APP_RELEASE, token, stamp)
+
+
+def api_clients_last_modified(request: HttpRequest) -> datetime | None:
+    token = _client_token(request)
+    stamp = users_cache_stamp(token) if token else None
+    if stamp is None:
+        return None
+    return datetime(1970, 1, 1, tzinfo=dt_timezone.utc) + timedelta(microseconds=stamp)
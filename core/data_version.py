@@ -0,0 +1,53 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+DATA_VERSION_KEY = "core:data_version"
+DATA_CHANGED_AT_KEY = "core:data_changed_at"
+
+
+def get_data_version() -> int:
+    """
+    Counter that changes whenever a Transaction or WalletTransfer is written.
+    Used in cache keys of rendered history fragments.
+    """
+    version = cache.get(DATA_VERSION_KEY)
+    if version is None:
+        # Start from the clock so a flushed cache never resurrects old fragments.
+        cache.add(DATA_VERSION_KEY, int(time.time() * 1000), timeout=None)
+        version = cache.get(DATA_VERSION_KEY)
+    return version
+
+
+def history_cache_enabled() -> bool:
+    """
+    Fragments and ETags keyed by the data version are only safe when every
+    worker sees the same counter (settings.CACHE_SHARED).
+    """
+    return settings.CACHE_SHARED
+
+
+def bump_data_version() -> None:
+    """
+    Advance the version once the current transaction commits (right away outside
+    one): a render in between must not cache pre-commit data under the new version.
+    """
+    transaction.on_commit(_bump)
+
+
+def _bump() -> None:
+    try:
+        cache.incr(DATA_VERSION_KEY)
+    except ValueError:
+        cache.set(DATA_VERSION_KEY, int(time.time() * 1000), timeout=None)
+    cache.set(DATA_CHANGED_AT_KEY, time.time(), timeout=3600)
+
+
+def data_changed_within(seconds: float) -> bool:
+    """
+    True if the data version was bumped in the last `seconds`.
+    """
+    changed_at = cache.get(DATA_CHANGED_AT_KEY)
+    return changed_at is not None and time.time() - changed_at < seconds
@@ -0,0 +1,85 @@
+from django.conf import settings
+
+from .replica import note_write, reads_from_replica, replica_configured
+
+ARCHIVE_MODELS = {"transactionarchive", "wallettransferarchive"}
+
+
+def _archive_db() -> str:
+    return getattr(settings, "ARCHIVE_DATABASE", "default")
+
+
+def _is_archive(model) -> bool:
+    return model._meta.app_label == "core" and model._meta.model_name in ARCHIVE_MODELS
+
+
+class ArchiveRouter:
+    """
+    Sends archive models to settings.ARCHIVE_DATABASE and keeps everything
+    else on `default`.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _is_archive(model):
+            return _archive_db()
+        # Relations loaded from an archive row (e.g. `row.wallet`) must still
+        # come from the main database.
+        if _archive_db() != "default":
+            return "default"
+        return None
+
+    db_for_write = db_for_read
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if ARCHIVE_MODELS & {obj1._meta.model_name, obj2._meta.model_name}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        archive_db = _archive_db()
+        if archive_db == "default":
+            return None
+        if app_label == "core" and model_name in ARCHIVE_MODELS:
+            return db == archive_db
+        return db != archive_db
+
+
+# Session rows are written on login and read on every request: never from a lagging copy.
+REPLICA_EXCLUDED_APPS = {"sessions"}
+
+
+class ReplicaRouter:
+    """
+    While the current request reads from the replica (see core.replica), sends
+    reads to settings.REPLICA_DATABASE. Writes always go to `default`, and so do
+    reads of an object loaded from the replica once the request has written.
+    Archive models in a separate database are left to ArchiveRouter.
+    """
+
+    def _skip(self, model) -> bool:
+        return _is_archive(model) and _archive_db() != "default"
+
+    def db_for_read(self, model, **hints):
+        replica = replica_configured()
+        if not replica or self._skip(model):
+            return None
+        if model._meta.app_label not in REPLICA_EXCLUDED_APPS and reads_from_replica():
+            return replica
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        note_write()
+        if not replica_configured() or self._skip(model):
+            return None
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        replica = replica_configured()
+        if replica and {obj1._state.db, obj2._state.db} <= {"default", replica}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == replica_configured():
+            return False
+        return None
@@ -1,5 +1,12 @@
 import json
-from dataclasses import dataclass
+import threading
+import time
+import uuid
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from dataclasses import asdict, dataclass
 from typing import Iterable
 from urllib.error import HTTPError
 from urllib.error import URLError
@@ -10,28 +17,166 @@ from django.conf import settings
 from django.core.cache import cache
 from decimal import Decimal, InvalidOperation
 
+from .jsonstream import iter_array
+from .money import json_number
+from .profiling import external_call
 
-@dataclass(frozen=True)
+
+def _label(user_id: int, name: str, email: str | None) -> str:
+    base = name or f"User {user_id}"
+    if email:
+        return f"{base} ({email})"
+    return base
+
+
+@dataclass(frozen=True, slots=True)
 class ExternalUser:
     id: int
     name: str
     email: str | None
     balance: Decimal | None
     referral_token: str | None
-    image_url: str | None
 
     @property
     def label(self) -> str:
-        base = self.name or f"User {self.id}"
-        if self.email:
-            return f"{base} ({self.email})"
-        return base
+        return _label(self.id, self.name, self.email)
 
 
 class ExternalApiError(RuntimeError):
     pass
 
 
+class ClientDirectory:
+    """
+    Compact, read-only list of external users.
+    Stored column-wise (ids in an int64 array, one tuple per text field), which
+    pickles to a fraction of a list of dataclasses. The id/token indexes and the
+    form choices are built lazily and are never pickled.
+    """
+
+    __slots__ = ("ids", "names", "emails", "balances", "tokens", "_by_id", "_by_token", "_choices", "_users")
+
+    def __init__(
+        self,
+        ids: array,
+        names: tuple[str, ...],
+        emails: tuple[str | None, ...],
+        balances: tuple[str | None, ...],
+        tokens: tuple[str | None, ...],
+    ):
+        self.ids = ids
+        self.names = names
+        self.emails = emails
+        self.balances = balances
+        self.tokens = tokens
+        self._by_id: dict[int, int] | None = None
+        self._by_token: dict[str, int] | None = None
+        self._choices: list[tuple[str, str]] | None = None
+        self._users: list[ExternalUser] | None = None
+
+    @classmethod
+    def from_users(cls, users: Iterable[ExternalUser]) -> "ClientDirectory":
+        return cls.from_rows(asdict(u) for u in users)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[dict]) -> "ClientDirectory":
+        """
+        Directory built straight from API user dicts, consumed one at a time (so a
+        streamed response is never held as a list). Malformed entries are skipped.
+        """
+        ids = array("q")
+        names, emails, balances, tokens = [], [], [], []
+        for u in rows:
+            try:
+                user_id, name, email, balance, token = _user_fields(u)
+                ids.append(user_id)
+            except Exception:
+                # Skip malformed entries rather than breaking the app.
+                continue
+            names.append(name)
+            emails.append(email)
+            balances.append(balance)
+            tokens.append(token)
+        return cls(ids, tuple(names), tuple(emails), tuple(balances), tuple(tokens))
+
+    @classmethod
+    def empty(cls) -> "ClientDirectory":
+        return cls.from_users([])
+
+    def __reduce__(self):
+        return (type(self), (self.ids, self.names, self.emails, self.balances, self.tokens))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _user(self, i: int) -> ExternalUser:
+        bal = self.balances[i]
+        return ExternalUser(
+            id=self.ids[i],
+            name=self.names[i],
+            email=self.emails[i],
+            balance=None if bal is None else Decimal(bal),
+            referral_token=self.tokens[i],
+        )
+
+    def get(self, user_id: int | str) -> ExternalUser | None:
+        if self._by_id is None:
+            self._by_id = {uid: i for i, uid in enumerate(self.ids)}
+        try:
+            i = self._by_id.get(int(user_id))
+        except (TypeError, ValueError):
+            return None
+        return None if i is None else self._user(i)
+
+    def find_token(self, referral_token: str) -> ExternalUser | None:
+        if self._by_token is None:
+            self._by_token = {t: i for i, t in enumerate(self.tokens) if t}
+        i = self._by_token.get(referral_token)
+        return None if i is None else self._user(i)
+
+    def choices(self) -> list[tuple[str, str]]:
+        """
+        (id, label) pairs for a ChoiceField, same labels as ExternalUser.label.
+        """
+        if self._choices is None:
+            self._choices = [
+                (str(uid), _label(uid, name, email))
+                for uid, name, email in zip(self.ids, self.names, self.emails)
+            ]
+        return self._choices
+
+    def users(self) -> list[ExternalUser]:
+        if self._users is None:
+            self._users = [self._user(i) for i in range(len(self.ids))]
+        return self._users
+
+
+def _user_fields(u: dict) -> tuple[int, str, str | None, str | None, str | None]:
+    """
+    (id, name, email, balance as a decimal string, referral_token) of an API user;
+    other fields (image_url, timestamps, ...) are ignored.
+    """
+    get = u.get
+    bal = get("balance")
+    if bal is not None:
+        try:
+            bal = str(Decimal(str(bal)))
+        except InvalidOperation:
+            bal = None
+    return int(get("id")), str(get("name") or ""), get("email") or None, bal, get("referral_token") or None
+
+
+def _parse_user(u: dict) -> ExternalUser:
+    user_id, name, email, bal, token = _user_fields(u)
+    return ExternalUser(
+        id=user_id,
+        name=name,
+        email=email,
+        balance=None if bal is None else Decimal(bal),
+        referral_token=token,
+    )
+
+
 def fetch_yildiztop_users(timeout_s: int = 6) -> list[ExternalUser]:
     """
     Fetch users from the public endpoint:
@@ -40,13 +185,175 @@ def fetch_yildiztop_users(timeout_s: int = 6) -> list[ExternalUser]:
     return fetch_yildiztop_users_by_referral_token(referral_token=None, timeout_s=timeout_s)
 
 
+def _users_cache_key(referral_token: str | None) -> str:
+    return f"yildiztop_users_v3:{referral_token or 'all'}"
+
+
+# Per-process copies of directories already read from the shared cache:
+# cache key -> (stamp, directory). A hit costs one small `:stamp` read instead
+# of unpickling the whole directory again.
+_LOCAL_DIRECTORIES: "OrderedDict[str, tuple[int, ClientDirectory]]" = OrderedDict()
+_LOCAL_DIRECTORIES_MAX = 64
+_local_lock = threading.Lock()
+
+
+def _remember(cache_key: str, stamp: int, directory: ClientDirectory) -> None:
+    with _local_lock:
+        _LOCAL_DIRECTORIES[cache_key] = (stamp, directory)
+        _LOCAL_DIRECTORIES.move_to_end(cache_key)
+        while len(_LOCAL_DIRECTORIES) > _LOCAL_DIRECTORIES_MAX:
+            _LOCAL_DIRECTORIES.popitem(last=False)
+
+
+def _directory_keys(cache_key: str) -> list[str]:
+    # What to read for a directory: only its stamp while this process holds a copy.
+    stamp_key = f"{cache_key}:stamp"
+    return [stamp_key] if cache_key in _LOCAL_DIRECTORIES else [cache_key, stamp_key]
+
+
+def _cached_directory(cache_key: str, found: dict | None = None) -> ClientDirectory | None:
+    """
+    Directory from the per-process copy or the shared cache; never calls upstream.
+    `found` is a get_many result that already includes _directory_keys(cache_key).
+    """
+    if found is None:
+        found = cache.get_many(_directory_keys(cache_key))
+    stamp = found.get(f"{cache_key}:stamp")
+    local = _LOCAL_DIRECTORIES.get(cache_key)
+    if local is not None and stamp == local[0]:
+        return local[1]
+    # An outdated local copy: the directory itself wasn't read yet.
+    cached = found.get(cache_key) if cache_key in found or local is None else cache.get(cache_key)
+    if isinstance(cached, ClientDirectory) and len(cached) and stamp is not None:
+        _remember(cache_key, stamp, cached)
+        return cached
+    return None
+
+
+def _store_directory(referral_token: str | None, directory: ClientDirectory, timeout: int | None = None) -> None:
+    cache_key = _users_cache_key(referral_token)
+    stamp = time.time_ns() // 1000
+    if timeout is None:
+        timeout = settings.YILDIZTOP_TOKEN_TTL if referral_token else settings.YILDIZTOP_DIRECTORY_TTL
+    cache.set_many({cache_key: directory, f"{cache_key}:stamp": stamp}, timeout=timeout)
+    _remember(cache_key, stamp, directory)
+
+
+def _drop_directories(referral_tokens: Iterable[str | None]) -> None:
+    keys = [_users_cache_key(t) for t in dict.fromkeys(referral_tokens)]
+    cache.delete_many([k for key in keys for k in (key, f"{key}:stamp")])
+
+
+_CHANGE_LOCK_KEY = "yildiztop_users_v3:lock"
+# Set by a batch that found the lock taken: the holder may be about to store
+# directories without that batch's changes, so it drops them instead.
+_CHANGE_STALE_KEY = "yildiztop_users_v3:stale"
+# Far longer than merging a full webhook batch takes; a holder that outlives it
+# (and may have lost the lock to another batch) drops instead of storing.
+_CHANGE_LOCK_TIMEOUT = 60
+
+
+def apply_user_changes(changes: list[dict]) -> list[bool]:
+    """
+    Merge pushed client changes (see core.webhooks), in order, into the cached
+    directories: the full list and the lists of each user's old and new referral
+    token. Every affected directory is rebuilt and stored once per batch.
+    Fields missing from a change, e.g. in a balance-only event, keep their cached
+    values. When a change can't be merged (unknown user with partial fields, or
+    another batch being merged concurrently) the affected entries are dropped
+    instead, so the next read refetches them. Returns, per change, True if merged.
+    """
+    owner = uuid.uuid4().hex
+    if not cache.add(_CHANGE_LOCK_KEY, owner, timeout=_CHANGE_LOCK_TIMEOUT):
+        cache.set(_CHANGE_STALE_KEY, 1, timeout=_CHANGE_LOCK_TIMEOUT)
+        _drop_directories([None, *(c.get("referral_token") or None for c in changes)])
+        return [False] * len(changes)
+    cache.delete(_CHANGE_STALE_KEY)
+    try:
+        # token (None for the full list) -> {user id: user} of a cached directory
+        # (None if not cached), read at most once per batch.
+        lists: dict[str | None, dict[int, ExternalUser] | None] = {}
+        changed: set[str | None] = set()
+        dropped: set[str | None] = set()
+
+        def listed(token: str | None) -> dict[int, ExternalUser] | None:
+            if token not in lists:
+                directory = None if token in dropped else _cached_directory(_users_cache_key(token))
+                lists[token] = None if directory is None else {u.id: u for u in directory.users()}
+            return lists[token]
+
+        def drop(token: str | None) -> None:
+            dropped.add(token)
+            lists[token] = None
+
+        results = []
+        for fields in changes:
+            user_id = int(fields["id"])
+            token = fields.get("referral_token") or None
+            everyone = listed(None)
+            previous = everyone.get(user_id) if everyone is not None else None
+            if previous is None and token:
+                by_token = listed(token)
+                previous = by_token.get(user_id) if by_token is not None else None
+            if previous is None and "name" not in fields:
+                drop(None)
+                if token:
+                    drop(token)
+                results.append(False)
+                continue
+            user = _parse_user({**(asdict(previous) if previous is not None else {}), **fields})
+
+            if everyone is not None:
+                everyone[user_id] = user
+                changed.add(None)
+            old_token = previous.referral_token if previous is not None else None
+            if old_token and old_token != user.referral_token and listed(old_token) is not None:
+                lists[old_token].pop(user_id, None)
+                changed.add(old_token)
+            if user.referral_token and listed(user.referral_token) is not None:
+                lists[user.referral_token][user_id] = user
+                changed.add(user.referral_token)
+            results.append(True)
+
+        stored = [t for t in changed if lists[t]]
+        if cache.get(_CHANGE_LOCK_KEY) == owner:
+            for token in stored:
+                _store_directory(token, ClientDirectory.from_users(lists[token].values()))
+        else:
+            dropped.update(stored)
+        if cache.get(_CHANGE_STALE_KEY) is not None:
+            dropped.update(stored)
+        dropped.update(t for t in changed if not lists[t])
+        if dropped:
+            _drop_directories(dropped)
+        return results
+    finally:
+        if cache.get(_CHANGE_LOCK_KEY) == owner:
+            cache.delete(_CHANGE_LOCK_KEY)
+
+
+def users_cache_stamp(referral_token: str | None) -> int | None:
+    """
+    Microsecond timestamp of the cached user list for this token (None if not cached).
+    Changes every time the list is refreshed; used for ETag/Last-Modified.
+    """
+    return cache.get(f"{_users_cache_key(referral_token)}:stamp")
+
+
 def fetch_yildiztop_users_by_referral_token(
     referral_token: str | None,
     timeout_s: int = 6,
 ) -> list[ExternalUser]:
-    cache_key = f"yildiztop_users_v1:{referral_token or 'all'}"
-    cached = cache.get(cache_key)
-    if isinstance(cached, list) and cached:
+    return fetch_yildiztop_directory(referral_token, timeout_s=timeout_s).users()
+
+
+def fetch_yildiztop_directory(
+    referral_token: str | None = None,
+    timeout_s: int = 6,
+) -> ClientDirectory:
+    cache_key = _users_cache_key(referral_token)
+    cached = _cached_directory(cache_key)
+    if cached is not None:
         return cached
 
     base = getattr(settings, "YILDIZTOP_API_BASE", "https://yildiztop.com/api").rstrip("/")
@@ -58,50 +365,79 @@ def fetch_yildiztop_users_by_referral_token(
     last_exc: Exception | None = None
     for _ in range(2):  # small retry for transient 500s/timeouts
         try:
-            with urlopen(req, timeout=timeout_s) as resp:
-                payload = json.loads(resp.read().decode("utf-8"))
+            with external_call("GET", url), urlopen(req, timeout=timeout_s) as resp:
+                # Expected shape (Laravel pagination):
+                # {"success":true,"data":{"data":[{...},{...}]}}
+                # Users are decoded one by one as the body arrives, straight into the directory columns.
+                directory = ClientDirectory.from_rows(iter_array(resp, ("data", "data")))
             last_exc = None
             break
-        except (HTTPError, URLError, TimeoutError, json.JSONDecodeError) as e:
+        except (HTTPError, URLError, TimeoutError, ValueError) as e:
             last_exc = e
             continue
     if last_exc is not None:
-        # If we have stale cache (e.g. from previous process run), use it.
+        # If we have stale data (e.g. an expired entry still held by this process), use it.
         cached = cache.get(cache_key)
-        if isinstance(cached, list) and cached:
+        if isinstance(cached, ClientDirectory) and len(cached):
             return cached
+        local = _LOCAL_DIRECTORIES.get(cache_key)
+        if local is not None:
+            return local[1]
         raise ExternalApiError(f"Failed to fetch users from {url}") from last_exc
 
-    # Expected shape (Laravel pagination):
-    # {"success":true,"data":{"data":[{...},{...}]}}
-    data = payload.get("data") or {}
-    users: Iterable[dict] = data.get("data") or []
-    result: list[ExternalUser] = []
-    for u in users:
-        try:
-            bal = None
-            if u.get("balance") is not None:
-                try:
-                    bal = Decimal(str(u.get("balance")))
-                except InvalidOperation:
-                    bal = None
-            result.append(
-                ExternalUser(
-                    id=int(u.get("id")),
-                    name=str(u.get("name") or ""),
-                    email=(u.get("email") or None),
-                    balance=bal,
-                    referral_token=(u.get("referral_token") or None),
-                    image_url=(u.get("image_url") or None),
-                )
-            )
-        except Exception:
-            # Skip malformed entries rather than breaking the app.
-            continue
-    if result:
-        ttl = 60 * 10 if not referral_token else 60 * 2
-        cache.set(cache_key, result, timeout=ttl)
-    return result
+    if len(directory):
+        _store_directory(referral_token, directory)
+    return directory
+
+
+def fetch_yildiztop_users_by_referral_tokens(
+    referral_tokens: Iterable[str],
+    timeout_s: int = 6,
+    max_workers: int = 8,
+) -> dict[str, list[ExternalUser]]:
+    """
+    Resolve many referral tokens at once: one cache round trip reads the lists
+    of all tokens and the client directory (one more only when this process's
+    copy of the directory is outdated), then exact matches from the directory,
+    then concurrent upstream fetches for whatever is left. Tokens that fail
+    upstream map to [].
+    """
+    tokens = list(dict.fromkeys(t for t in referral_tokens if t))
+    if not tokens:
+        return {}
+    keys = {t: _users_cache_key(t) for t in tokens}
+    everyone_key = _users_cache_key(None)
+    cached = cache.get_many([*keys.values(), *_directory_keys(everyone_key)])
+
+    result: dict[str, list[ExternalUser]] = {}
+    for t in tokens:
+        hit = cached.get(keys[t])
+        if isinstance(hit, ClientDirectory) and len(hit):
+            result[t] = hit.users()
+
+    directory = _cached_directory(everyone_key, cached) if len(result) < len(tokens) else None
+    if directory is not None:
+        for t in tokens:
+            if t not in result:
+                user = directory.find_token(t)
+                if user is not None:
+                    result[t] = [user]
+
+    misses = [t for t in tokens if t not in result]
+    if misses:
+
+        def _fetch(token: str) -> list[ExternalUser]:
+            try:
+                return fetch_yildiztop_users_by_referral_token(token, timeout_s=timeout_s)
+            except ExternalApiError:
+                return []
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(misses))) as pool:
+            # Each task runs in a copy of the caller's context (e.g. an active request profile).
+            futures = [pool.submit(copy_context().run, _fetch, token) for token in misses]
+            for token, future in zip(misses, futures):
+                result[token] = future.result()
+    return {t: result[t] for t in tokens}
 
 
 def post_yildiztop_update_balance(
@@ -115,7 +451,8 @@ def post_yildiztop_update_balance(
     """
     base = getattr(settings, "YILDIZTOP_API_BASE", "https://yildiztop.com/api").rstrip("/")
     url = f"{base}/users/update-balance"
-    body = json.dumps({"referral_token": referral_token, "balance": float(balance)}).encode("utf-8")
+    # The balance is written as an exact decimal literal rather than through float().
+    body = f'{{"referral_token": {json.dumps(referral_token)}, "balance": {json_number(balance)}}}'.encode("utf-8")
     req = Request(
         url,
         data=body,
@@ -127,7 +464,7 @@ def post_yildiztop_update_balance(
         },
     )
     try:
-        with urlopen(req, timeout=timeout_s) as resp:
+        with external_call("POST", url), urlopen(req, timeout=timeout_s) as resp:
             # consume response for debugging/validation if needed
             resp.read()
     except (HTTPError, URLError, TimeoutError) as e:
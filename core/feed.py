@@ -0,0 +1,118 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import Max, Q
+from django.utils import formats, timezone
+
+from .models import Transaction, Wallet, WalletTransfer
+
+FEED_BATCH = 100
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+_US = timedelta(microseconds=1)
+
+
+@dataclass
+class FeedCursor:
+    """
+    Position in the live feed: last seen (updated_at, id) of transactions, so new
+    rows and sync-status changes both advance it, and the last transfer id.
+    Serialized as "<updated_at µs>.<transaction id>.<transfer id>".
+    """
+
+    tx_updated_us: int
+    tx_id: int
+    transfer_id: int
+
+    def __str__(self) -> str:
+        return f"{self.tx_updated_us}.{self.tx_id}.{self.transfer_id}"
+
+    @property
+    def tx_updated_at(self) -> datetime:
+        return _EPOCH + self.tx_updated_us * _US
+
+    @classmethod
+    def parse(cls, value: str | None) -> "FeedCursor | None":
+        try:
+            a, b, c = (value or "").split(".")
+            return cls(int(a), int(b), int(c))
+        except ValueError:
+            return None
+
+    @classmethod
+    def current(cls) -> "FeedCursor":
+        return cls(
+            tx_updated_us=(timezone.now() - _EPOCH) // _US,
+            tx_id=0,
+            transfer_id=WalletTransfer.objects.aggregate(m=Max("id"))["m"] or 0,
+        )
+
+
+def _fmt_dt(value: datetime) -> str:
+    return formats.date_format(timezone.localtime(value), "Y-m-d H:i")
+
+
+def _transaction_event(tx: Transaction) -> dict:
+    return {
+        "kind": "transaction",
+        "id": tx.id,
+        "type": tx.type,
+        "type_display": tx.get_type_display(),
+        "username": tx.wallet.user.get_username(),
+        "token": tx.external_referral_token,
+        "client": tx.external_user_name,
+        "amount": formats.localize(tx.amount),
+        "sync_status": tx.external_sync_status,
+        "created_at": _fmt_dt(tx.created_at),
+    }
+
+
+def _transfer_event(tr: WalletTransfer) -> dict:
+    return {
+        "kind": "transfer",
+        "id": tr.id,
+        "from_username": tr.from_wallet.user.get_username(),
+        "to_username": tr.to_wallet.user.get_username(),
+        "amount": formats.localize(tr.amount),
+        "created_at": _fmt_dt(tr.created_at),
+    }
+
+
+def wallet_event(balance) -> dict:
+    # Same formatting as {{ wallet.balance }} on the dashboard.
+    return {"balance": formats.localize(balance)}
+
+
+def feed_since(
+    cursor: FeedCursor,
+    *,
+    wallet_id: int | None = None,
+    user_id: str | None = None,
+) -> tuple[list[dict], FeedCursor]:
+    """
+    Transactions created or updated and transfers created after `cursor`,
+    limited to one wallet (regular users) or one user (cashier filter).
+    Returns the events in order and the advanced cursor.
+    """
+    tx_qs = Transaction.objects.select_related("wallet__user")
+    tr_qs = WalletTransfer.objects.select_related("from_wallet__user", "to_wallet__user")
+    if user_id:
+        wallet_id = Wallet.objects.filter(user_id=user_id).values_list("pk", flat=True).first() or 0
+    if wallet_id is not None:
+        tx_qs = tx_qs.filter(wallet_id=wallet_id)
+        tr_qs = tr_qs.filter(Q(from_wallet_id=wallet_id) | Q(to_wallet_id=wallet_id))
+
+    since = cursor.tx_updated_at
+    txs = list(
+        tx_qs.filter(Q(updated_at__gt=since) | Q(updated_at=since, id__gt=cursor.tx_id))
+        .order_by("updated_at", "id")[:FEED_BATCH]
+    )
+    transfers = list(tr_qs.filter(id__gt=cursor.transfer_id).order_by("id")[:FEED_BATCH])
+
+    events = [_transaction_event(tx) for tx in txs] + [_transfer_event(tr) for tr in transfers]
+    if txs:
+        last = txs[-1]
+        cursor = FeedCursor((last.updated_at - _EPOCH) // _US, last.id, cursor.transfer_id)
+    if transfers:
+        cursor = FeedCursor(cursor.tx_updated_us, cursor.tx_id, transfers[-1].id)
+    return events, cursor
@@ -38,10 +38,13 @@ class TransactionCreateForm(forms.ModelForm):
 
 
 class CashierDepositForm(forms.Form):
+    # Picked via the /api/users/ search: the widget never renders the user list,
+    # and validation is a single primary-key lookup.
     to_user = forms.ModelChoiceField(
-        queryset=User.objects.all().order_by("username"),
-        widget=forms.Select(attrs={"class": "form-select"}),
+        queryset=User.objects.all(),
+        widget=forms.HiddenInput,
         label="Пользователь",
+        error_messages={"required": "Выберите пользователя.", "invalid_choice": "Пользователь не найден."},
     )
     amount = forms.DecimalField(
         max_digits=12,
@@ -51,4 +54,6 @@ class CashierDepositForm(forms.Form):
         label="Сумма",
     )
 
-
+    def selected_user(self):
+        # Keeps the picker label after a failed POST.
+        return getattr(self, "cleaned_data", {}).get("to_user")
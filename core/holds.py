@@ -0,0 +1,60 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction as db_transaction
+from django.utils import timezone
+
+from .balances import adjust
+from .models import FundHold
+
+# Must comfortably exceed the external API timeouts (see core.external_api).
+HOLD_TTL = timedelta(minutes=5)
+
+
+def reserve(wallet_id: int, amount: Decimal, ttl: timedelta = HOLD_TTL) -> FundHold | None:
+    """
+    Earmark `amount` on the wallet if its available balance (balance - held)
+    covers it. A single conditional UPDATE, so no row lock is held while the
+    caller talks to the network. Returns None when funds are insufficient.
+    """
+    release_expired(wallet_id=wallet_id)
+    with db_transaction.atomic():
+        if not adjust(wallet_id, held=amount, covered=True):
+            return None
+        return FundHold.objects.create(wallet_id=wallet_id, amount=amount, expires_at=timezone.now() + ttl)
+
+
+def _settle(hold: FundHold, status: str, debit: bool) -> bool:
+    with db_transaction.atomic():
+        claimed = FundHold.objects.filter(pk=hold.pk, status=FundHold.Status.HELD).update(
+            status=status, settled_at=timezone.now()
+        )
+        if claimed != 1:
+            return False
+        adjust(hold.wallet_id, balance=-hold.amount if debit else Decimal("0"), held=-hold.amount)
+    hold.status = status
+    return True
+
+
+def capture(hold: FundHold) -> bool:
+    """
+    Debit the held amount. False if the hold was already released (e.g. expired).
+    """
+    return _settle(hold, FundHold.Status.CAPTURED, debit=True)
+
+
+def release(hold: FundHold) -> bool:
+    """
+    Give the held amount back to the available balance. False if already settled.
+    """
+    return _settle(hold, FundHold.Status.RELEASED, debit=False)
+
+
+def release_expired(wallet_id: int | None = None) -> int:
+    """
+    Release holds past their expires_at (all wallets, or one). Returns the count.
+    """
+    qs = FundHold.objects.filter(status=FundHold.Status.HELD, expires_at__lt=timezone.now())
+    if wallet_id is not None:
+        qs = qs.filter(wallet_id=wallet_id)
+    return sum(release(hold) for hold in qs.only("id", "wallet_id", "amount"))
@@ -0,0 +1,113 @@
+"""
+Incremental reading of large JSON responses. The items of one array nested in
+objects (e.g. data.data of a Laravel page) are decoded one at a time while the
+body is read in chunks, so neither the raw body nor the whole parsed document
+is held in memory.
+"""
+
+import codecs
+import json
+import re
+from typing import Any, BinaryIO, Iterator
+
+CHUNK_SIZE = 64 * 1024
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+# What may follow a complete value inside a document. Anything else (e.g. the
+# "." of "-25000000000." cut at the buffer end) means the value goes on.
+_DELIMITERS = frozenset(" \t\n\r,:]}")
+
+
+class _Reader:
+    def __init__(self, stream: BinaryIO, chunk_size: int):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.text = codecs.getincrementaldecoder("utf-8")()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, at_least: int = 0) -> None:
+        # Drop what was consumed, then append at least one chunk (more when a
+        # single value outgrows the buffer, so re-decoding it stays linear).
+        self.buf = self.buf[self.pos :]
+        self.pos = 0
+        data = self.stream.read(max(self.chunk_size, at_least))
+        if data:
+            self.buf += self.text.decode(data)
+        else:
+            self.buf += self.text.decode(b"", final=True)
+            self.eof = True
+
+    def peek(self) -> str:
+        """
+        Next non-whitespace character ("" at the end of the body).
+        """
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf) or self.eof:
+                return self.buf[self.pos : self.pos + 1]
+            self._fill()
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise json.JSONDecodeError(f"Expecting {char!r}", self.buf, self.pos)
+        self.pos += 1
+
+    def value(self) -> Any:
+        """
+        Decode the value at the current position (call peek() first).
+        """
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+                # A number may be cut short by the buffer end, even after a
+                # "." or an "e": trust its end only once a delimiter follows.
+                if self.eof or (end < len(self.buf) and self.buf[end] in _DELIMITERS):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill(len(self.buf) - self.pos)
+
+
+def iter_array(stream: BinaryIO, path: tuple[str, ...], chunk_size: int = CHUNK_SIZE) -> Iterator[Any]:
+    """
+    Yield the items of the array at `path` (keys of nested objects) of the JSON
+    document read from `stream`. Raises ValueError on malformed JSON up to the
+    end of the array, and when a step is missing or not an object/array (e.g.
+    an error page instead of the expected JSON); the rest of the body is not read.
+    """
+    reader = _Reader(stream, chunk_size)
+    missing = f"no array at {'.'.join(path)}"
+    for key in path:
+        if reader.peek() != "{":
+            raise ValueError(missing)
+        reader.pos += 1
+        while reader.peek() != "}":
+            name = reader.value()
+            reader.expect(":")
+            if name == key:
+                break
+            reader.peek()
+            reader.value()
+            if reader.peek() != "}":
+                reader.expect(",")
+        else:
+            raise ValueError(missing)
+    if reader.peek() != "[":
+        raise ValueError(missing)
+    reader.pos += 1
+    if reader.peek() == "]":
+        return
+    while True:
+        yield reader.value()
+        char = reader.peek()
+        if char == "]":
+            return
+        if char != ",":
+            raise json.JSONDecodeError("Expecting ','", reader.buf, reader.pos)
+        reader.pos += 1
+        reader.peek()
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.archive import archive_old_rows
+
+
+class Command(BaseCommand):
+    help = "Move old transactions and wallet transfers into the archive tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than-days",
+            type=int,
+            default=settings.ARCHIVE_AFTER_DAYS,
+            help="Archive rows older than this many days (default: ARCHIVE_AFTER_DAYS).",
+        )
+        parser.add_argument("--chunk-size", type=int, default=2000)
+        parser.add_argument("--dry-run", action="store_true", help="Only count eligible rows.")
+
+    def handle(self, *args, **options):
+        moved = archive_old_rows(
+            older_than_days=options["older_than_days"],
+            chunk_size=options["chunk_size"],
+            dry_run=options["dry_run"],
+        )
+        verb = "eligible" if options["dry_run"] else "archived"
+        for name, n in moved.items():
+            self.stdout.write(f"{name}: {n} rows {verb}")
+        self.stdout.write(
+            self.style.SUCCESS("Done (rows not yet in daily rollups are kept; run update_rollups first).")
+        )
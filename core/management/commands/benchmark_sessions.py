@@ -0,0 +1,71 @@
+import re
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+_SESSION_WRITE = re.compile(r'^\s*(INSERT|UPDATE|DELETE)\b.*"django_session"', re.IGNORECASE | re.DOTALL)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare session profiles: DB queries and writes on django_session per authenticated request, "
+        "and time per request. Uses the configured database and cache."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--username", help="User to log in as (default: first superuser).")
+        parser.add_argument("--path", default=None, help="Page to request (default: the dashboard).")
+        parser.add_argument(
+            "--profiles", nargs="+", choices=sorted(settings.SESSION_PROFILES), default=list(settings.SESSION_PROFILES)
+        )
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        users = User.objects.filter(username=options["username"]) if options["username"] else User.objects.filter(
+            is_superuser=True
+        )
+        user = users.order_by("pk").first()
+        if user is None:
+            raise CommandError("No user to log in as; pass --username.")
+        path = options["path"] or reverse("dashboard")
+        hosts = [h.lstrip(".") for h in settings.ALLOWED_HOSTS if h != "*"]
+        n = options["requests"]
+
+        self.stdout.write(f"{n} x GET {path} as {user.get_username()}")
+        self.stdout.write(f"{'profile':<16}{'queries/req':>12}{'session/req':>12}{'writes/req':>12}{'login q':>9}{'ms/req':>9}")
+        for profile in options["profiles"]:
+            with override_settings(SESSION_ENGINE=settings.SESSION_PROFILES[profile]):
+                client = Client(HTTP_HOST=hosts[0] if hosts else "localhost")
+                with CaptureQueriesContext(connection) as login:
+                    client.force_login(user)
+                # captured_queries slices the live log, which the next request resets: read it now.
+                login_queries = len(login.captured_queries)
+                client.get(path)  # warm up this profile's code paths
+                times = []
+                with CaptureQueriesContext(connection) as ctx:
+                    for _ in range(n):
+                        started = time.perf_counter()
+                        response = client.get(path)
+                        times.append((time.perf_counter() - started) * 1000)
+                sql = [q["sql"] for q in ctx.captured_queries]
+                client.logout()
+            if response.status_code != 200:
+                raise CommandError(f"{profile}: GET {path} returned {response.status_code}")
+            session = [s for s in sql if "django_session" in s]
+            writes = [s for s in session if _SESSION_WRITE.match(s)]
+            self.stdout.write(
+                f"{profile:<16}{len(sql) / n:>12.2f}{len(session) / n:>12.2f}{len(writes) / n:>12.2f}"
+                f"{login_queries:>9}{statistics.median(times):>9.2f}"
+            )
+        self.stdout.write(
+            "session/req: queries on django_session per request; writes/req: INSERT/UPDATE/DELETE among them; "
+            "login q: all queries of one login."
+        )
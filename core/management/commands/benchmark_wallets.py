@@ -0,0 +1,134 @@
+import random
+import threading
+import time
+from collections import Counter
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction as db_transaction
+from django.db.models import F, Sum
+
+from core import balances
+from core.models import Wallet, WalletTransfer
+from core.money import to_minor
+
+PREFIX = "walletbench"
+START_BALANCE = Decimal("1000000.00")
+
+
+def _locked_transfer(from_wallet_id: int, to_wallet_id: int, amount: Decimal) -> WalletTransfer | None:
+    # The previous cashier_deposit write path, kept for comparison.
+    with db_transaction.atomic():
+        from_wallet = Wallet.objects.select_for_update().get(pk=from_wallet_id)
+        Wallet.objects.select_for_update().get(pk=to_wallet_id)
+        if from_wallet.available < amount:
+            return None
+        Wallet.objects.filter(pk=from_wallet_id).update(balance=F("balance") - amount)
+        Wallet.objects.filter(pk=to_wallet_id).update(balance=F("balance") + amount)
+        return WalletTransfer.objects.create(from_wallet_id=from_wallet_id, to_wallet_id=to_wallet_id, amount=amount)
+
+
+PATHS = {"locks": _locked_transfer, "occ": balances.transfer}
+
+
+class Command(BaseCommand):
+    help = (
+        "Concurrency stress test of wallet transfers: worker threads move money between a few hot wallets "
+        "in both directions with the row-lock path and the optimistic (versioned) path, then check that no "
+        "update was lost. Uses the configured database; its own wallets are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=8)
+        parser.add_argument("--transfers", type=int, default=200, help="Transfers per worker.")
+        parser.add_argument("--wallets", type=int, default=4, help="Hot wallets shared by all workers.")
+        parser.add_argument("--paths", nargs="+", choices=sorted(PATHS), default=list(PATHS))
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        if options["wallets"] < 2:
+            raise CommandError("--wallets must be at least 2.")
+        self.stdout.write(
+            f"{options['workers']} workers x {options['transfers']} transfers over {options['wallets']} wallets "
+            f"({connection.vendor})"
+        )
+        self.stdout.write(f"{'path':<8}{'ok':>7}{'failed':>8}{'per s':>9}{'ms p50':>9}{'ms max':>9}  consistency / errors")
+        for path in options["paths"]:
+            wallet_ids = self._setup(options["wallets"])
+            try:
+                self._run(path, wallet_ids, options)
+            finally:
+                self._teardown()
+
+    def _setup(self, count: int) -> list[int]:
+        self._teardown()
+        User = get_user_model()
+        users = [User.objects.create_user(f"{PREFIX}{i}") for i in range(count)]
+        return [Wallet.objects.create(user=u, balance=START_BALANCE).pk for u in users]
+
+    def _teardown(self) -> None:
+        wallets = Wallet.objects.filter(user__username__startswith=PREFIX)
+        WalletTransfer.objects.filter(from_wallet__in=wallets).delete()
+        WalletTransfer.objects.filter(to_wallet__in=wallets).delete()
+        get_user_model().objects.filter(username__startswith=PREFIX).delete()
+
+    def _run(self, path: str, wallet_ids: list[int], options) -> None:
+        move = PATHS[path]
+        barrier = threading.Barrier(options["workers"])
+        lock = threading.Lock()
+        errors: Counter = Counter()
+        times: list[float] = []
+
+        def worker(n: int):
+            rng = random.Random(options["seed"] * 1000 + n)
+            barrier.wait()
+            try:
+                for _ in range(options["transfers"]):
+                    a, b = rng.sample(wallet_ids, 2)
+                    started = time.perf_counter()
+                    try:
+                        move(a, b, Decimal(rng.randint(1, 500)) / 100)
+                        ok = True
+                    except Exception as e:
+                        ok = False
+                        with lock:
+                            errors[f"{type(e).__name__}: {e}"[:60]] += 1
+                    if ok:
+                        with lock:
+                            times.append((time.perf_counter() - started) * 1000)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(options["workers"])]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+
+        times.sort()
+        failed = sum(errors.values())
+        self.stdout.write(
+            f"{path:<8}{len(times):>7}{failed:>8}{len(times) / elapsed:>9.0f}"
+            f"{times[len(times) // 2] if times else 0:>9.2f}{times[-1] if times else 0:>9.2f}  {self._verify(wallet_ids)}"
+        )
+        for message, count in errors.most_common(3):
+            self.stdout.write(f"{'':<8}{count:>7} x {message}")
+
+    def _verify(self, wallet_ids: list[int]) -> str:
+        """
+        Every wallet must equal its start balance plus its recorded transfers.
+        """
+        problems = []
+        expected = dict.fromkeys(wallet_ids, to_minor(START_BALANCE))
+        # Exact integer sums in tiyn (SQLite adds decimal columns as floats).
+        transfers = WalletTransfer.objects.filter(from_wallet__in=wallet_ids).order_by()
+        for side, sign in (("from_wallet_id", -1), ("to_wallet_id", 1)):
+            for pk, total in transfers.values_list(side).annotate(total=Sum("amount_minor")):
+                expected[pk] += sign * total
+        for pk, balance in Wallet.objects.filter(pk__in=wallet_ids).values_list("pk", "balance_minor"):
+            if balance != expected[pk]:
+                problems.append(f"wallet {pk}: {balance} != {expected[pk]} tiyn")
+        return "lost updates: " + "; ".join(problems) if problems else "no lost updates"
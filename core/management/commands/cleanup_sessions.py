@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.sessions import clear_expired_sessions
+
+
+class Command(BaseCommand):
+    help = "Delete expired sessions in small batches; with --every, keep doing it in a loop."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--every", type=int, default=0, help="Repeat every N seconds (run in the background).")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                deleted = clear_expired_sessions(batch_size=options["batch_size"])
+                self.stdout.write(f"Expired sessions deleted: {deleted}")
+            except Exception as e:
+                if not options["every"]:
+                    raise
+                # A failed round (e.g. database locked) must not stop the loop.
+                self.stderr.write(f"Session cleanup failed: {e!r}")
+            if not options["every"]:
+                return
+            close_old_connections()
+            time.sleep(options["every"])
@@ -0,0 +1,68 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.rollups import update_rollups
+from core.scale_data import ScaleSpec, generate, measure_pages, scale_pages
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate users, wallets, transactions and transfers with realistic skew (hot cashiers and agents, "
+        "long-tail clients, recent-heavy dates), then print timings and query plans of the main pages. "
+        "For development databases only."
+    )
+
+    def add_arguments(self, parser):
+        defaults = ScaleSpec()
+        parser.add_argument("--users", type=int, default=defaults.users)
+        parser.add_argument("--cashiers", type=int, default=defaults.cashiers)
+        parser.add_argument("--clients", type=int, default=defaults.clients, help="Distinct external clients.")
+        parser.add_argument("--transactions", type=int, default=defaults.transactions)
+        parser.add_argument("--transfers", type=int, default=defaults.transfers)
+        parser.add_argument("--days", type=int, default=defaults.days, help="History depth.")
+        parser.add_argument("--seed", type=int, default=defaults.seed)
+        parser.add_argument("--prefix", default=defaults.prefix, help="Username prefix of generated users.")
+        parser.add_argument("--chunk-size", type=int, default=defaults.chunk_size)
+        parser.add_argument("--measure-only", action="store_true", help="Skip generation, measure existing data.")
+        parser.add_argument("--no-measure", action="store_true")
+        parser.add_argument("--runs", type=int, default=3, help="Requests per page (median is reported).")
+        parser.add_argument(
+            "--allow-invalidate",
+            action="store_true",
+            help="Allow measuring with DEBUG off: every request invalidates the dashboard caches of all users.",
+        )
+
+    def handle(self, *args, **options):
+        spec = ScaleSpec(
+            users=options["users"],
+            cashiers=options["cashiers"],
+            clients=options["clients"],
+            transactions=options["transactions"],
+            transfers=options["transfers"],
+            days=options["days"],
+            seed=options["seed"],
+            prefix=options["prefix"],
+            chunk_size=options["chunk_size"],
+        )
+        if min(spec.users, spec.cashiers, spec.clients, spec.days, spec.chunk_size) < 1:
+            raise CommandError("--users, --cashiers, --clients, --days and --chunk-size must be positive")
+        if not options["no_measure"] and not (settings.DEBUG or options["allow_invalidate"]):
+            raise CommandError(
+                "Measuring invalidates the dashboard caches; set DJANGO_DEBUG=1 or pass --allow-invalidate."
+            )
+
+        if not options["measure_only"]:
+            generate(spec, progress=self.stdout.write)
+            processed = update_rollups()
+            self.stdout.write(self.style.SUCCESS(f"Data generated; rollups updated ({processed})"))
+
+        if options["no_measure"]:
+            return
+        for page in measure_pages(scale_pages(spec), runs=options["runs"]):
+            self.stdout.write("")
+            self.stdout.write(self.style.MIGRATE_HEADING(page.name))
+            self.stdout.write(f"  HTTP {page.status}, {page.median_ms:.1f} ms median, {page.queries} queries")
+            for q in page.slowest:
+                self.stdout.write(f"  {q.ms:8.1f} ms  {q.sql[:160]}")
+                for line in q.plan:
+                    self.stdout.write(f"              {line}")
@@ -0,0 +1,64 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.importer import KINDS, ImportResult, import_history
+
+
+class Command(BaseCommand):
+    help = (
+        "Import past transactions or wallet transfers from a CSV (with header) or JSONL file. "
+        "Transaction columns: username, type, amount, created_at, [external_user_id, external_user_name, "
+        "external_user_email, external_referral_token, external_sync_status, note]. "
+        "Transfer columns: from_username, to_username, amount, created_at. "
+        "Wallet balances are not changed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", type=Path)
+        parser.add_argument("--kind", choices=sorted(KINDS), required=True)
+        parser.add_argument("--format", dest="fmt", choices=["csv", "jsonl"], help="Default: by file extension.")
+        parser.add_argument("--chunk-size", type=int, default=5000)
+        parser.add_argument("--checkpoint", help="Checkpoint name (default: kind and absolute file path).")
+        parser.add_argument("--restart", action="store_true", help="Ignore the saved checkpoint and start over.")
+        parser.add_argument("--dry-run", action="store_true", help="Only validate rows.")
+        parser.add_argument("--max-errors", type=int, default=20, help="How many invalid rows to print.")
+
+    def handle(self, *args, **options):
+        path: Path = options["path"]
+        if not path.is_file():
+            raise CommandError(f"File not found: {path}")
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be positive")
+
+        shown = 0
+        started = time.perf_counter()
+
+        def on_error(line_no: int, message: str) -> None:
+            nonlocal shown
+            if shown < options["max_errors"]:
+                self.stderr.write(f"line {line_no}: {message}")
+            shown += 1
+
+        def on_chunk(result: ImportResult) -> None:
+            elapsed = time.perf_counter() - started
+            rate = (result.read - result.skipped) / elapsed if elapsed else 0
+            self.stdout.write(f"{result.read} rows read, {result.imported} imported ({rate:,.0f} rows/s)")
+
+        result = import_history(
+            path,
+            options["kind"],
+            fmt=options["fmt"],
+            chunk_size=options["chunk_size"],
+            checkpoint_key=options["checkpoint"],
+            restart=options["restart"],
+            dry_run=options["dry_run"],
+            on_error=on_error,
+            on_chunk=on_chunk,
+        )
+        if result.skipped:
+            self.stdout.write(f"Resumed: skipped {result.skipped} rows imported by an earlier run")
+        verb = "valid" if options["dry_run"] else "imported"
+        summary = f"{result.imported} rows {verb}, {result.errors} invalid rows skipped"
+        self.stdout.write(self.style.SUCCESS(f"Done: {summary}. Run update_rollups to include them in reports."))
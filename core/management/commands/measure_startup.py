@@ -0,0 +1,54 @@
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter: the time a gunicorn worker needs to import the
+# WSGI application (and optionally warm up) before it can serve a request.
+_PROBE = """
+import os, time
+t0 = time.perf_counter()
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+from config.wsgi import application
+t1 = time.perf_counter()
+if {warmup!r}:
+    from core.warmup import warm_up
+    warm_up()
+print(t1 - t0, time.perf_counter() - t1)
+"""
+
+
+class Command(BaseCommand):
+    help = "Measure worker cold start: WSGI app import (and warm-up) time in fresh processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5)
+        parser.add_argument("--warmup", action="store_true", help="Also time core.warmup.warm_up().")
+
+    def handle(self, *args, **options):
+        boot: list[float] = []
+        warm: list[float] = []
+        for _ in range(options["runs"]):
+            proc = subprocess.run(
+                [sys.executable, "-c", _PROBE.format(warmup=options["warmup"])],
+                cwd=settings.BASE_DIR,
+                capture_output=True,
+                text=True,
+            )
+            if proc.returncode != 0:
+                raise CommandError(proc.stderr.strip())
+            b, w = proc.stdout.split()[-2:]
+            boot.append(float(b))
+            warm.append(float(w))
+
+        def fmt(values: list[float]) -> str:
+            return (
+                f"median {statistics.median(values) * 1000:.0f} ms, "
+                f"min {min(values) * 1000:.0f} ms, max {max(values) * 1000:.0f} ms"
+            )
+
+        self.stdout.write(f"app import: {fmt(boot)}")
+        if options["warmup"]:
+            self.stdout.write(f"warm-up:    {fmt(warm)}")
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.holds import release_expired
+
+
+class Command(BaseCommand):
+    help = "Release fund holds whose external operation never completed; with --every, keep doing it in a loop."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--every", type=int, default=0, help="Repeat every N seconds (run in the background).")
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                released = release_expired()
+                self.stdout.write(self.style.SUCCESS(f"Released {released} expired holds"))
+            except Exception as e:
+                if not options["every"]:
+                    raise
+                # A failed round (e.g. database locked) must not stop the loop.
+                self.stderr.write(f"Releasing expired holds failed: {e!r}")
+            if not options["every"]:
+                return
+            close_old_connections()
+            time.sleep(options["every"])
@@ -0,0 +1,35 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.rollups import rebuild_rollups, update_rollups
+
+
+class Command(BaseCommand):
+    help = "Incrementally update daily rollups, or re-aggregate a date range with --from/--to."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="date_from", help="Re-aggregate from this day (YYYY-MM-DD).")
+        parser.add_argument("--to", dest="date_to", help="Re-aggregate up to this day inclusive (YYYY-MM-DD).")
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        date_from, date_to = options["date_from"], options["date_to"]
+        if date_from or date_to:
+            try:
+                start = date.fromisoformat(date_from or date_to)
+                end = date.fromisoformat(date_to or date_from)
+            except ValueError as e:
+                raise CommandError(f"Invalid date: {e}") from e
+            if start > end:
+                raise CommandError("--from must not be after --to")
+            # Fold in pending rows first so the rebuilt range is complete.
+            update_rollups(batch_size=options["batch_size"])
+            rebuild_rollups(start, end)
+            self.stdout.write(self.style.SUCCESS(f"Rollups rebuilt for {start} .. {end}"))
+            return
+
+        processed = update_rollups(batch_size=options["batch_size"])
+        for source, n in processed.items():
+            self.stdout.write(f"{source}: {n} rows")
+        self.stdout.write(self.style.SUCCESS("Rollups updated"))
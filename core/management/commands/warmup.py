@@ -0,0 +1,14 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.warmup import warm_up
+
+
+class Command(BaseCommand):
+    help = "Pre-populate caches (templates, URLs, client directory) before taking traffic."
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        warm_up()
+        self.stdout.write(self.style.SUCCESS(f"Warm-up done in {time.perf_counter() - started:.3f}s"))
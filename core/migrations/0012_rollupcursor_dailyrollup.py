@@ -0,0 +1,45 @@
+# Generated by Django 5.1.15 on 2026-10-19 17:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_alter_transaction_amount_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=32, unique=True, verbose_name='Источник')),
+                ('last_id', models.BigIntegerField(default=0, verbose_name='Последний ID')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата изменения')),
+            ],
+            options={
+                'verbose_name': 'Курсор агрегации',
+                'verbose_name_plural': 'Курсоры агрегации',
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('kind', models.CharField(choices=[('deposit', 'Депозит'), ('withdraw', 'Вывод'), ('transfer_in', 'Входящий перевод'), ('transfer_out', 'Исходящий перевод')], max_length=16, verbose_name='Тип')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Сумма')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Количество')),
+                ('wallet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='core.wallet', verbose_name='Кошелёк')),
+            ],
+            options={
+                'verbose_name': 'Дневной итог',
+                'verbose_name_plural': 'Дневные итоги',
+                'ordering': ['-day'],
+                'indexes': [models.Index(fields=['day', 'kind'], name='rollup_day_kind_idx')],
+                'constraints': [models.UniqueConstraint(fields=('day', 'wallet', 'kind'), name='uniq_rollup_day_wallet_kind')],
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.1.15 on 2026-10-19 17:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_rollupcursor_dailyrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransactionArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('month', models.DateField(db_index=True, verbose_name='Месяц')),
+                ('external_user_id', models.PositiveIntegerField(blank=True, null=True, verbose_name='ID клиента')),
+                ('external_user_name', models.CharField(blank=True, default='', max_length=255, verbose_name='Клиент')),
+                ('external_user_email', models.EmailField(blank=True, default='', max_length=254, verbose_name='Email клиента')),
+                ('external_referral_token', models.CharField(blank=True, db_index=True, default='', max_length=64, verbose_name='Токен')),
+                ('external_balance_before', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('external_balance_after', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('external_sync_status', models.CharField(choices=[('pending', 'Pending'), ('synced', 'Synced'), ('failed', 'Failed')], max_length=16, verbose_name='Статус синхронизации')),
+                ('external_sync_error', models.TextField(blank=True, default='', verbose_name='Ошибка синхронизации')),
+                ('type', models.CharField(choices=[('deposit', 'Депозит'), ('withdraw', 'Вывод')], max_length=16, verbose_name='Тип')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Сумма')),
+                ('note', models.CharField(blank=True, default='', max_length=255, verbose_name='Комментарий')),
+                ('created_at', models.DateTimeField(verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(verbose_name='Дата изменения')),
+                ('wallet', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='core.wallet', verbose_name='Кошелёк')),
+            ],
+            options={
+                'verbose_name': 'Транзакция (архив)',
+                'verbose_name_plural': 'Транзакции (архив)',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['wallet', 'created_at', 'id'], name='txarch_wallet_created_id_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='WalletTransferArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('month', models.DateField(db_index=True, verbose_name='Месяц')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Сумма')),
+                ('created_at', models.DateTimeField(verbose_name='Дата')),
+                ('from_wallet', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='core.wallet', verbose_name='Откуда')),
+                ('to_wallet', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='core.wallet', verbose_name='Кому')),
+            ],
+            options={
+                'verbose_name': 'Перевод кошелька (архив)',
+                'verbose_name_plural': 'Переводы кошельков (архив)',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['from_wallet', 'created_at', 'id'], name='trarch_from_created_id_idx'), models.Index(fields=['to_wallet', 'created_at', 'id'], name='trarch_to_created_id_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.15 on 2026-10-19 17:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_transactionarchive_wallettransferarchive'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['updated_at', 'id'], name='tx_updated_id_idx'),
+        ),
+    ]
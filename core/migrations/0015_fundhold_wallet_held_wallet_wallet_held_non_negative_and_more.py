@@ -0,0 +1,54 @@
+# Generated by Django 5.1.15 on 2026-10-19 17:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_transaction_tx_updated_id_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FundHold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Сумма')),
+                ('status', models.CharField(choices=[('held', 'В резерве'), ('captured', 'Списано'), ('released', 'Освобождено')], default='held', max_length=16, verbose_name='Статус')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('expires_at', models.DateTimeField(verbose_name='Истекает')),
+                ('settled_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата завершения')),
+            ],
+            options={
+                'verbose_name': 'Резерв средств',
+                'verbose_name_plural': 'Резервы средств',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='wallet',
+            name='held',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='В резерве'),
+        ),
+        migrations.AddConstraint(
+            model_name='wallet',
+            constraint=models.CheckConstraint(condition=models.Q(('held__gte', 0)), name='wallet_held_non_negative'),
+        ),
+        migrations.AddField(
+            model_name='fundhold',
+            name='wallet',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holds', to='core.wallet', verbose_name='Кошелёк'),
+        ),
+        migrations.AddIndex(
+            model_name='fundhold',
+            index=models.Index(fields=['status', 'expires_at'], name='hold_status_expires_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fundhold',
+            index=models.Index(fields=['wallet', 'status'], name='hold_wallet_status_idx'),
+        ),
+    ]
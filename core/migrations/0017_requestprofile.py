@@ -0,0 +1,40 @@
+# Generated by Django 5.1.15 on 2026-10-19 18:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_importcheckpoint'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата')),
+                ('method', models.CharField(max_length=8, verbose_name='Метод')),
+                ('path', models.CharField(max_length=500, verbose_name='Путь')),
+                ('status_code', models.PositiveSmallIntegerField(verbose_name='Статус')),
+                ('duration_ms', models.FloatField(verbose_name='Время, мс')),
+                ('sql_count', models.PositiveIntegerField(default=0, verbose_name='SQL запросов')),
+                ('sql_ms', models.FloatField(default=0, verbose_name='SQL, мс')),
+                ('external_count', models.PositiveIntegerField(default=0, verbose_name='Внешних вызовов')),
+                ('external_ms', models.FloatField(default=0, verbose_name='Внешние вызовы, мс')),
+                ('call_tree', models.TextField(blank=True, default='', verbose_name='Профиль вызовов')),
+                ('queries', models.JSONField(blank=True, default=list, verbose_name='SQL')),
+                ('external_calls', models.JSONField(blank=True, default=list, verbose_name='Внешние вызовы')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Профиль запроса',
+                'verbose_name_plural': 'Профили запросов',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
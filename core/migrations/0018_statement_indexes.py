@@ -0,0 +1,25 @@
+# Generated by Django 5.1.15 on 2026-10-19 18:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_requestprofile'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['wallet', 'created_at', 'id'], name='tx_wallet_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='wallettransfer',
+            index=models.Index(fields=['from_wallet', 'created_at', 'id'], name='transfer_from_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='wallettransfer',
+            index=models.Index(fields=['to_wallet', 'created_at', 'id'], name='transfer_to_created_idx'),
+        ),
+    ]
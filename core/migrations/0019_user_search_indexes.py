@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.db import migrations
+
+# Expression indexes on the (swappable, not ours) user table for core.user_search.
+INDEXES = {
+    "core_user_lower_username_idx": "username",
+    "core_user_lower_email_idx": "email",
+}
+
+
+def _table(apps) -> str:
+    return apps.get_model(settings.AUTH_USER_MODEL)._meta.db_table
+
+
+def create_indexes(apps, schema_editor):
+    qn = schema_editor.quote_name
+    for name, column in INDEXES.items():
+        schema_editor.execute(f"CREATE INDEX {qn(name)} ON {qn(_table(apps))} (LOWER({qn(column)}))")
+
+
+def drop_indexes(apps, schema_editor):
+    qn = schema_editor.quote_name
+    for name in INDEXES:
+        schema_editor.execute(f"DROP INDEX {qn(name)}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0018_statement_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.15 on 2026-10-19 18:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0019_user_search_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VelocityLimit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('deposit', 'Депозит'), ('withdraw', 'Вывод'), ('transfer_out', 'Пополнение кассиром')], max_length=16, verbose_name='Операция')),
+                ('period', models.PositiveIntegerField(choices=[(3600, 'Час'), (86400, 'Сутки')], verbose_name='Окно')),
+                ('max_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True, verbose_name='Макс. сумма')),
+                ('max_count', models.PositiveIntegerField(blank=True, null=True, verbose_name='Макс. операций')),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='auth.group', verbose_name='Группа')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Лимит операций',
+                'verbose_name_plural': 'Лимиты операций',
+                'constraints': [models.CheckConstraint(condition=models.Q(('user__isnull', True), ('group__isnull', True), _connector='OR'), name='velocity_limit_user_or_group')],
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+from django.db import migrations, models
+from django.db.models import F
+from django.utils import timezone
+
+
+def _backfill(model_name):
+    # Existing rows were never changed after creation.
+    def run(apps, schema_editor):
+        model = apps.get_model("core", model_name)
+        model.objects.using(schema_editor.connection.alias).update(updated_at=F("created_at"))
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0020_velocitylimit"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="wallettransfer",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True, verbose_name="Дата изменения"),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="wallettransferarchive",
+            name="updated_at",
+            field=models.DateTimeField(default=timezone.now, verbose_name="Дата изменения"),
+            preserve_default=False,
+        ),
+        migrations.RunPython(
+            _backfill("WalletTransfer"), migrations.RunPython.noop, hints={"model_name": "wallettransfer"}
+        ),
+        migrations.RunPython(
+            _backfill("WalletTransferArchive"),
+            migrations.RunPython.noop,
+            hints={"model_name": "wallettransferarchive"},
+        ),
+        migrations.AddIndex(
+            model_name="wallettransfer",
+            index=models.Index(fields=["updated_at", "id"], name="transfer_updated_id_idx"),
+        ),
+    ]
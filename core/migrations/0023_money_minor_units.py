@@ -0,0 +1,51 @@
+# Generated by Django 5.1.15 on 2026-10-19 18:41
+
+import django.db.models.expressions
+import django.db.models.functions.comparison
+import django.db.models.functions.math
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_wallet_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailyrollup',
+            name='total_minor',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.comparison.Cast(django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(models.F('total'), '*', models.Value(100))), models.BigIntegerField()), output_field=models.BigIntegerField(), verbose_name='Сумма, тийин'),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='amount_minor',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.comparison.Cast(django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(models.F('amount'), '*', models.Value(100))), models.BigIntegerField()), output_field=models.BigIntegerField(), verbose_name='Сумма, тийин'),
+        ),
+        migrations.AddField(
+            model_name='transactionarchive',
+            name='amount_minor',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.comparison.Cast(django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(models.F('amount'), '*', models.Value(100))), models.BigIntegerField()), output_field=models.BigIntegerField(), verbose_name='Сумма, тийин'),
+        ),
+        migrations.AddField(
+            model_name='wallet',
+            name='balance_minor',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.comparison.Cast(django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(models.F('balance'), '*', models.Value(100))), models.BigIntegerField()), output_field=models.BigIntegerField(), verbose_name='Баланс, тийин'),
+        ),
+        migrations.AddField(
+            model_name='wallet',
+            name='held_minor',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.comparison.Cast(django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(models.F('held'), '*', models.Value(100))), models.BigIntegerField()), output_field=models.BigIntegerField(), verbose_name='В резерве, тийин'),
+        ),
+        migrations.AddField(
+            model_name='wallettransfer',
+            name='amount_minor',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.comparison.Cast(django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(models.F('amount'), '*', models.Value(100))), models.BigIntegerField()), output_field=models.BigIntegerField(), verbose_name='Сумма, тийин'),
+        ),
+        migrations.AddField(
+            model_name='wallettransferarchive',
+            name='amount_minor',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.comparison.Cast(django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(models.F('amount'), '*', models.Value(100))), models.BigIntegerField()), output_field=models.BigIntegerField(), verbose_name='Сумма, тийин'),
+        ),
+    ]
@@ -1,6 +1,20 @@
 from django.conf import settings
 from django.db import models
-from django.db.models import DecimalField
+from django.db.models import DecimalField, F
+from django.db.models.functions import Cast, Round
+
+
+def minor_units(field: str, verbose_name: str) -> models.GeneratedField:
+    """
+    Stored integer copy of a 2-place money column in tiyn, kept up to date by
+    the database on every write; used for exact sums (see core.money).
+    """
+    return models.GeneratedField(
+        expression=Cast(Round(F(field) * 100), models.BigIntegerField()),
+        output_field=models.BigIntegerField(),
+        db_persist=True,
+        verbose_name=verbose_name,
+    )
 
 
 class Wallet(models.Model):
@@ -14,14 +28,29 @@ class Wallet(models.Model):
     balance = models.DecimalField(
         max_digits=12, decimal_places=2, default=0, verbose_name="Баланс"
     )
+    # Sum of active FundHold amounts (see core.holds); available = balance - held.
+    held = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0, verbose_name="В резерве"
+    )
+    balance_minor = minor_units("balance", "Баланс, тийин")
+    held_minor = minor_units("held", "В резерве, тийин")
+    # Bumped by every balance/held write (see core.balances).
+    version = models.PositiveIntegerField(default=0, editable=False, verbose_name="Версия")
 
     class Meta:
         verbose_name = "Кошелёк"
         verbose_name_plural = "Кошельки"
+        constraints = [
+            models.CheckConstraint(condition=models.Q(held__gte=0), name="wallet_held_non_negative"),
+        ]
 
     def __str__(self) -> str:
         return f"{self.user} ({self.currency})"
 
+    @property
+    def available(self):
+        return self.balance - self.held
+
 
 class Transaction(models.Model):
     class ExternalSyncStatus(models.TextChoices):
@@ -69,6 +98,7 @@ class Transaction(models.Model):
         verbose_name="Тип",
     )
     amount = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="Сумма")
+    amount_minor = minor_units("amount", "Сумма, тийин")
     note = models.CharField(max_length=255, blank=True, default="", verbose_name="Комментарий")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата изменения")
@@ -77,6 +107,10 @@ class Transaction(models.Model):
         ordering = ["-created_at"]
         verbose_name = "Транзакция"
         verbose_name_plural = "Транзакции"
+        indexes = [
+            models.Index(fields=["updated_at", "id"], name="tx_updated_id_idx"),
+            models.Index(fields=["wallet", "created_at", "id"], name="tx_wallet_created_idx"),
+        ]
 
     def __str__(self) -> str:
         who = self.external_user_name or self.wallet.user
@@ -101,13 +135,313 @@ class WalletTransfer(models.Model):
         verbose_name="Кому",
     )
     amount = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="Сумма")
+    amount_minor = minor_units("amount", "Сумма, тийин")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата изменения")
 
     class Meta:
         ordering = ["-created_at"]
         verbose_name = "Перевод кошелька"
         verbose_name_plural = "Переводы кошельков"
+        indexes = [
+            models.Index(fields=["updated_at", "id"], name="transfer_updated_id_idx"),
+            models.Index(fields=["from_wallet", "created_at", "id"], name="transfer_from_created_idx"),
+            models.Index(fields=["to_wallet", "created_at", "id"], name="transfer_to_created_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"{self.from_wallet.user} -> {self.to_wallet.user}: {self.amount}"
 
+
+class FundHold(models.Model):
+    """
+    Funds earmarked on a wallet while an external operation is in flight.
+    Captured (debited) on success, released on failure or after expires_at.
+    """
+
+    class Status(models.TextChoices):
+        HELD = "held", "В резерве"
+        CAPTURED = "captured", "Списано"
+        RELEASED = "released", "Освобождено"
+
+    wallet = models.ForeignKey(
+        Wallet,
+        on_delete=models.CASCADE,
+        related_name="holds",
+        verbose_name="Кошелёк",
+    )
+    amount = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="Сумма")
+    status = models.CharField(
+        max_length=16,
+        choices=Status.choices,
+        default=Status.HELD,
+        verbose_name="Статус",
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    expires_at = models.DateTimeField(verbose_name="Истекает")
+    settled_at = models.DateTimeField(null=True, blank=True, verbose_name="Дата завершения")
+
+    class Meta:
+        ordering = ["-created_at"]
+        verbose_name = "Резерв средств"
+        verbose_name_plural = "Резервы средств"
+        indexes = [
+            models.Index(fields=["status", "expires_at"], name="hold_status_expires_idx"),
+            models.Index(fields=["wallet", "status"], name="hold_wallet_status_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.wallet.user} {self.amount} ({self.status})"
+
+
+class VelocityLimit(models.Model):
+    """
+    Maximum amount and/or number of operations of one kind per wallet within a
+    sliding hour or day (checked by core.velocity). Applies to one user, to the
+    members of a group, or to everyone when both are empty; a user limit
+    overrides group limits, which override the global one.
+    """
+
+    class Kind(models.TextChoices):
+        DEPOSIT = "deposit", "Депозит"
+        WITHDRAW = "withdraw", "Вывод"
+        TRANSFER_OUT = "transfer_out", "Пополнение кассиром"
+
+    class Period(models.IntegerChoices):
+        HOUR = 3600, "Час"
+        DAY = 86400, "Сутки"
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="+",
+        verbose_name="Пользователь",
+    )
+    group = models.ForeignKey(
+        "auth.Group",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="+",
+        verbose_name="Группа",
+    )
+    kind = models.CharField(max_length=16, choices=Kind.choices, verbose_name="Операция")
+    period = models.PositiveIntegerField(choices=Period.choices, verbose_name="Окно")
+    max_amount = models.DecimalField(
+        max_digits=12, decimal_places=2, null=True, blank=True, verbose_name="Макс. сумма"
+    )
+    max_count = models.PositiveIntegerField(null=True, blank=True, verbose_name="Макс. операций")
+
+    class Meta:
+        verbose_name = "Лимит операций"
+        verbose_name_plural = "Лимиты операций"
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(user__isnull=True) | models.Q(group__isnull=True),
+                name="velocity_limit_user_or_group",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        who = self.user or self.group or "все"
+        return f"{who}: {self.get_kind_display()} / {self.get_period_display()}"
+
+
+class DailyRollup(models.Model):
+    """
+    Pre-aggregated daily totals per wallet and operation kind.
+    Maintained incrementally by `manage.py update_rollups` (see core.rollups).
+    """
+
+    class Kind(models.TextChoices):
+        DEPOSIT = "deposit", "Депозит"
+        WITHDRAW = "withdraw", "Вывод"
+        TRANSFER_IN = "transfer_in", "Входящий перевод"
+        TRANSFER_OUT = "transfer_out", "Исходящий перевод"
+
+    day = models.DateField(verbose_name="День")
+    wallet = models.ForeignKey(
+        Wallet,
+        on_delete=models.CASCADE,
+        related_name="daily_rollups",
+        verbose_name="Кошелёк",
+    )
+    kind = models.CharField(max_length=16, choices=Kind.choices, verbose_name="Тип")
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Сумма")
+    total_minor = minor_units("total", "Сумма, тийин")
+    count = models.PositiveIntegerField(default=0, verbose_name="Количество")
+
+    class Meta:
+        ordering = ["-day"]
+        verbose_name = "Дневной итог"
+        verbose_name_plural = "Дневные итоги"
+        constraints = [
+            models.UniqueConstraint(fields=["day", "wallet", "kind"], name="uniq_rollup_day_wallet_kind"),
+        ]
+        indexes = [
+            models.Index(fields=["day", "kind"], name="rollup_day_kind_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.day:%Y-%m-%d} {self.wallet_id} {self.kind}: {self.total}"
+
+
+class RollupCursor(models.Model):
+    """
+    High-water mark (last processed id) per rollup source table.
+    """
+
+    source = models.CharField(max_length=32, unique=True, verbose_name="Источник")
+    last_id = models.BigIntegerField(default=0, verbose_name="Последний ID")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата изменения")
+
+    class Meta:
+        verbose_name = "Курсор агрегации"
+        verbose_name_plural = "Курсоры агрегации"
+
+    def __str__(self) -> str:
+        return f"{self.source}: {self.last_id}"
+
+
+class ImportCheckpoint(models.Model):
+    """
+    Progress of a `manage.py import_history` run: number of input rows already
+    committed. Saved in the same DB transaction as each imported chunk.
+    """
+
+    key = models.CharField(max_length=255, unique=True, verbose_name="Ключ")
+    rows_done = models.BigIntegerField(default=0, verbose_name="Обработано строк")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата изменения")
+
+    class Meta:
+        verbose_name = "Контрольная точка импорта"
+        verbose_name_plural = "Контрольные точки импорта"
+
+    def __str__(self) -> str:
+        return f"{self.key}: {self.rows_done}"
+
+
+class RequestProfile(models.Model):
+    """
+    Profile of one request, recorded on demand by staff (see core.profiling).
+    """
+
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="Дата")
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+        verbose_name="Пользователь",
+    )
+    method = models.CharField(max_length=8, verbose_name="Метод")
+    path = models.CharField(max_length=500, verbose_name="Путь")
+    status_code = models.PositiveSmallIntegerField(verbose_name="Статус")
+    duration_ms = models.FloatField(verbose_name="Время, мс")
+    sql_count = models.PositiveIntegerField(default=0, verbose_name="SQL запросов")
+    sql_ms = models.FloatField(default=0, verbose_name="SQL, мс")
+    external_count = models.PositiveIntegerField(default=0, verbose_name="Внешних вызовов")
+    external_ms = models.FloatField(default=0, verbose_name="Внешние вызовы, мс")
+    call_tree = models.TextField(blank=True, default="", verbose_name="Профиль вызовов")
+    queries = models.JSONField(default=list, blank=True, verbose_name="SQL")
+    external_calls = models.JSONField(default=list, blank=True, verbose_name="Внешние вызовы")
+
+    class Meta:
+        ordering = ["-created_at"]
+        verbose_name = "Профиль запроса"
+        verbose_name_plural = "Профили запросов"
+
+    def __str__(self) -> str:
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
+
+
+class TransactionArchive(models.Model):
+    """
+    Archived Transaction rows (moved by `manage.py archive_history`).
+    Keeps the original id. Lives in settings.ARCHIVE_DATABASE, so relations to
+    Wallet are not enforced at the DB level.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    month = models.DateField(db_index=True, verbose_name="Месяц")
+    wallet = models.ForeignKey(
+        Wallet,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="+",
+        verbose_name="Кошелёк",
+    )
+    external_user_id = models.PositiveIntegerField(null=True, blank=True, verbose_name="ID клиента")
+    external_user_name = models.CharField(max_length=255, blank=True, default="", verbose_name="Клиент")
+    external_user_email = models.EmailField(blank=True, default="", verbose_name="Email клиента")
+    external_referral_token = models.CharField(
+        max_length=64, blank=True, default="", db_index=True, verbose_name="Токен"
+    )
+    external_balance_before = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    external_balance_after = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    external_sync_status = models.CharField(
+        max_length=16,
+        choices=Transaction.ExternalSyncStatus.choices,
+        verbose_name="Статус синхронизации",
+    )
+    external_sync_error = models.TextField(blank=True, default="", verbose_name="Ошибка синхронизации")
+    type = models.CharField(max_length=16, choices=Transaction.Type.choices, verbose_name="Тип")
+    amount = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="Сумма")
+    amount_minor = minor_units("amount", "Сумма, тийин")
+    note = models.CharField(max_length=255, blank=True, default="", verbose_name="Комментарий")
+    created_at = models.DateTimeField(verbose_name="Дата создания")
+    updated_at = models.DateTimeField(verbose_name="Дата изменения")
+
+    class Meta:
+        ordering = ["-created_at"]
+        verbose_name = "Транзакция (архив)"
+        verbose_name_plural = "Транзакции (архив)"
+        indexes = [
+            models.Index(fields=["wallet", "created_at", "id"], name="txarch_wallet_created_id_idx"),
+        ]
+
+    def __str__(self) -> str:
+        who = self.external_user_name or self.wallet_id
+        return f"{who} {self.type} {self.amount} @ {self.created_at:%Y-%m-%d %H:%M}"
+
+
+class WalletTransferArchive(models.Model):
+    """
+    Archived WalletTransfer rows (moved by `manage.py archive_history`).
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    month = models.DateField(db_index=True, verbose_name="Месяц")
+    from_wallet = models.ForeignKey(
+        Wallet,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="+",
+        verbose_name="Откуда",
+    )
+    to_wallet = models.ForeignKey(
+        Wallet,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="+",
+        verbose_name="Кому",
+    )
+    amount = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="Сумма")
+    amount_minor = minor_units("amount", "Сумма, тийин")
+    created_at = models.DateTimeField(verbose_name="Дата")
+    updated_at = models.DateTimeField(verbose_name="Дата изменения")
+
+    class Meta:
+        ordering = ["-created_at"]
+        verbose_name = "Перевод кошелька (архив)"
+        verbose_name_plural = "Переводы кошельков (архив)"
+        indexes = [
+            models.Index(fields=["from_wallet", "created_at", "id"], name="trarch_from_created_id_idx"),
+            models.Index(fields=["to_wallet", "created_at", "id"], name="trarch_to_created_id_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.from_wallet_id} -> {self.to_wallet_id}: {self.amount}"
@@ -0,0 +1,36 @@
+"""
+Money amounts. The app works with Decimal amounts of 2 places (manat and
+tiyn); sums over many rows use integer minor units (tiyn) instead: the
+*_minor columns are stored integer copies of the decimal columns, so SQL SUM is
+exact and cheap (SQLite otherwise adds decimals as floats), and Python adds
+plain ints. Convert at the boundaries with the helpers below.
+"""
+
+from decimal import Decimal
+
+MINOR_PER_UNIT = 100
+
+
+def to_minor(amount: Decimal) -> int:
+    """
+    Exact amount in tiyn. Raises ValueError for fractions of a tiyn.
+    """
+    minor = Decimal(amount).scaleb(2)
+    if minor != minor.to_integral_value():
+        raise ValueError(f"{amount} has fractions of a tiyn")
+    return int(minor)
+
+
+def from_minor(minor: int | None) -> Decimal:
+    """
+    Decimal amount with 2 places from tiyn (None, e.g. an empty SUM, is 0.00).
+    """
+    return Decimal(minor or 0).scaleb(-2)
+
+
+def json_number(amount: Decimal) -> str:
+    """
+    Exact JSON number literal with 2 places, e.g. "-123.45". Unlike float(),
+    it keeps every digit of any amount.
+    """
+    return f"{from_minor(to_minor(amount)):f}"
@@ -8,7 +8,11 @@ from django.shortcuts import redirect
 def is_main_cashier(user) -> bool:
     if not user or not user.is_authenticated:
         return False
-    return user.groups.filter(name="main_cashier").exists()
+    # Memoized on the user object: request.user lives for one request only.
+    cached = getattr(user, "_is_main_cashier", None)
+    if cached is None:
+        cached = user._is_main_cashier = user.groups.filter(name="main_cashier").exists()
+    return cached
 
 
 def main_cashier_required(view_func):
@@ -0,0 +1,155 @@
+"""
+On-demand profiling of single requests for staff: add `?__profile=1` or the
+header `X-Profile: 1`. The request runs under cProfile; SQL queries and
+external API calls are recorded too and saved as a RequestProfile.
+Python 3.12+ allows one active profiler per process, so one request is profiled
+at a time; a toggle arriving meanwhile is served unprofiled.
+"""
+
+import cProfile
+import io
+import pstats
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+QUERY_PARAM = "__profile"
+HEADER = "HTTP_X_PROFILE"
+_TRUTHY = frozenset({"1", "true", "yes", "on"})
+
+MAX_QUERIES = 500
+CALL_TREE_LINES = 80
+
+# Held while a request is being profiled (cProfile is process-wide).
+_profiling = threading.Lock()
+
+# List of external calls of the request being profiled (None: not profiling).
+_external_calls: ContextVar[list | None] = ContextVar("profiled_external_calls", default=None)
+
+
+@contextmanager
+def external_call(method: str, url: str):
+    """
+    Wrap an outgoing HTTP call; recorded only while a request is being profiled.
+    """
+    calls = _external_calls.get()
+    if calls is None:
+        yield
+        return
+    started = time.perf_counter()
+    error = ""
+    try:
+        yield
+    except Exception as e:
+        error = repr(e)
+        raise
+    finally:
+        calls.append(
+            {"method": method, "url": url, "ms": round((time.perf_counter() - started) * 1000, 2), "error": error}
+        )
+
+
+class _QueryRecorder:
+    def __init__(self):
+        self.queries: list[dict] = []
+        self.total_ms = 0.0
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            ms = (time.perf_counter() - started) * 1000
+            self.total_ms += ms
+            self.count += 1
+            if len(self.queries) < MAX_QUERIES:
+                alias = context["connection"].alias
+                self.queries.append({"db": alias, "sql": sql, "ms": round(ms, 2), "many": many})
+
+
+def _wants_profile(request) -> bool:
+    # Only an explicit on value: "?__profile=0" or "X-Profile: off" leave it off.
+    values = (request.GET.get(QUERY_PARAM), request.META.get(HEADER))
+    return any((value or "").strip().lower() in _TRUTHY for value in values)
+
+
+def _call_tree(profiler: cProfile.Profile) -> str:
+    out = io.StringIO()
+    stats = pstats.Stats(profiler, stream=out)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(CALL_TREE_LINES)
+    stats.print_callees(CALL_TREE_LINES // 4)
+    return out.getvalue()
+
+
+def _save(request, response, duration_ms: float, profiler, recorder: _QueryRecorder, calls: list[dict]):
+    from .models import RequestProfile
+
+    profile = RequestProfile.objects.create(
+        user=request.user,
+        method=request.method,
+        path=request.get_full_path()[:500],
+        status_code=response.status_code,
+        duration_ms=round(duration_ms, 2),
+        sql_count=recorder.count,
+        sql_ms=round(recorder.total_ms, 2),
+        external_count=len(calls),
+        external_ms=round(sum(c["ms"] for c in calls), 2),
+        call_tree=_call_tree(profiler),
+        queries=recorder.queries,
+        external_calls=calls,
+    )
+    keep = settings.REQUEST_PROFILES_KEEP
+    stale = RequestProfile.objects.order_by("-created_at").values_list("pk", flat=True)[keep : keep + 100]
+    RequestProfile.objects.filter(pk__in=list(stale)).delete()
+    return profile
+
+
+class ProfilerMiddleware:
+    """
+    Profiles requests of staff users that ask for it. Everyone else (and staff
+    without the toggle) only pays for two string lookups.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not _wants_profile(request) or not request.user.is_staff:
+            return self.get_response(request)
+
+        if not _profiling.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            return self._profile(request)
+        finally:
+            _profiling.release()
+
+    def _profile(self, request):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another tool (a debugger, coverage) already profiles this process.
+            return self.get_response(request)
+        recorder = _QueryRecorder()
+        calls: list[dict] = []
+        token = _external_calls.set(calls)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for conn in connections.all():
+                    stack.enter_context(conn.execute_wrapper(recorder))
+                response = self.get_response(request)
+        finally:
+            profiler.disable()
+            _external_calls.reset(token)
+        duration_ms = (time.perf_counter() - started) * 1000
+
+        profile = _save(request, response, duration_ms, profiler, recorder, calls)
+        response["X-Profile-Id"] = str(profile.pk)
+        return response
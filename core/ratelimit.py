@@ -0,0 +1,89 @@
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.redis import RedisCache
+from django.http import HttpRequest, HttpResponse, JsonResponse
+
+_UNITS = {"s": 1, "m": 60, "h": 3600}
+
+
+def parse_rate(rate: str) -> tuple[int, int]:
+    """
+    "30/10s" -> (30, 10); "60/m" -> (60, 60).
+    """
+    count, _, period = rate.partition("/")
+    unit = period[-1:] if period[-1:] in _UNITS else "s"
+    span = period[:-1] if period[-1:] in _UNITS else period
+    return int(count), int(span or 1) * _UNITS[unit]
+
+
+def _client_key(request: HttpRequest) -> str:
+    if request.user.is_authenticated:
+        return f"u{request.user.pk}"
+    return f"ip{request.META.get('REMOTE_ADDR', '')}"
+
+
+def _redis_count(key: str, timeout: int) -> int | None:
+    """
+    Create the counter with its expiry if missing and increment it, in one
+    MULTI/EXEC round trip. None when the cache is not Redis.
+    """
+    backend = caches[DEFAULT_CACHE_ALIAS]
+    if not isinstance(backend, RedisCache):
+        return None
+    key = backend.make_and_validate_key(key)
+    pipe = backend._cache.get_client(key, write=True).pipeline()
+    pipe.set(key, 0, ex=timeout, nx=True)
+    pipe.incr(key)
+    return pipe.execute()[1]
+
+
+def hit(route: str, ident: str, limit: int, period: int) -> int:
+    """
+    Take one token from the (route, ident) bucket, which is refilled to `limit`
+    at every `period` boundary. Returns the number of seconds to wait, 0 if allowed.
+    On Redis this is one round trip. Other backends use `incr`, and `add` the
+    first time in a window.
+    """
+    now = time.time()
+    window = int(now // period)
+    key = f"rl:{route}:{ident}:{window}"
+    used = _redis_count(key, period + 1)
+    if used is None:
+        try:
+            used = cache.incr(key)
+        except ValueError:
+            if cache.add(key, 1, timeout=period + 1):
+                used = 1
+            else:
+                used = cache.incr(key)
+    if used <= limit:
+        return 0
+    return max(1, math.ceil((window + 1) * period - now))
+
+
+def ratelimit(route: str):
+    """
+    Per-user throttle for a view, configured by settings.RATELIMITS[route]
+    ("<count>/<period>"). Routes without a configured rate are not limited.
+    """
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+            rate = getattr(settings, "RATELIMITS", {}).get(route)
+            if rate:
+                limit, period = parse_rate(rate)
+                retry_after = hit(route, _client_key(request), limit, period)
+                if retry_after:
+                    response = JsonResponse({"error": "rate_limited", "retry_after": retry_after}, status=429)
+                    response["Retry-After"] = str(retry_after)
+                    return response
+            return view_func(request, *args, **kwargs)
+
+        return _wrapped
+
+    return decorator
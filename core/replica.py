@@ -0,0 +1,104 @@
+"""
+Per-request choice between the primary database and the read replica
+(settings.REPLICA_DATABASE). Views opt in with @replica_reads; the actual
+routing is done by core.db_routers.ReplicaRouter.
+"""
+
+from contextvars import ContextVar
+from typing import Callable
+
+from django.conf import settings
+from django.http import HttpRequest
+
+# Set after a write; while present, the client reads from the primary.
+PIN_COOKIE = "db_pin"
+
+_SAFE_METHODS = ("GET", "HEAD")
+
+
+class _Routing:
+    __slots__ = ("use_replica", "wrote")
+
+    def __init__(self):
+        self.use_replica = False
+        self.wrote = False
+
+
+_routing: ContextVar[_Routing | None] = ContextVar("replica_routing", default=None)
+
+
+def replica_configured() -> str | None:
+    return getattr(settings, "REPLICA_DATABASE", None)
+
+
+def reads_from_replica() -> bool:
+    """
+    True while the current request reads from the replica (and has not written yet).
+    """
+    state = _routing.get()
+    return state is not None and state.use_replica and not state.wrote
+
+
+def note_write() -> None:
+    state = _routing.get()
+    if state is not None:
+        state.wrote = True
+
+
+def _always(request: HttpRequest) -> bool:
+    return True
+
+
+def replica_reads(when: Callable[[HttpRequest], bool] | None = None):
+    """
+    Mark a view whose GET/HEAD requests may read from the replica.
+    `when(request)` can veto it per request.
+    """
+
+    def decorator(view):
+        view.replica_reads = when or _always
+        return view
+
+    return decorator
+
+
+def _admin_changelist(request: HttpRequest) -> bool:
+    match = request.resolver_match
+    return match is not None and match.namespace == "admin" and (match.url_name or "").endswith("_changelist")
+
+
+class ReplicaMiddleware:
+    """
+    Turns on replica reads for opted-in views and admin changelists, unless the
+    client wrote recently (read-your-writes). Any write sets the pin cookie for
+    settings.REPLICA_MAX_LAG seconds.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = _Routing()
+        token = _routing.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        if replica_configured() and (state.wrote or request.method not in _SAFE_METHODS):
+            response.set_cookie(
+                PIN_COOKIE, "1", max_age=settings.REPLICA_MAX_LAG, httponly=True, samesite="Lax"
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not replica_configured() or request.method not in _SAFE_METHODS or PIN_COOKIE in request.COOKIES:
+            return None
+        state = _routing.get()
+        if state is None:
+            return None
+        allowed = getattr(view_func, "replica_reads", None)
+        if allowed is not None:
+            state.use_replica = allowed(request)
+        elif _admin_changelist(request):
+            state.use_replica = True
+        return None
@@ -0,0 +1,206 @@
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Iterable, Iterator
+
+from django.db import transaction as db_transaction
+from django.db.models import Count, Max, QuerySet, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import (
+    DailyRollup,
+    RollupCursor,
+    Transaction,
+    TransactionArchive,
+    WalletTransfer,
+    WalletTransferArchive,
+)
+from .money import from_minor
+
+SOURCE_TRANSACTIONS = "transaction"
+SOURCE_TRANSFERS = "wallet_transfer"
+
+# Rows written less than this ago are left for the next run: ids of concurrent
+# inserts may commit out of order, and the high-water mark must never jump over a
+# gap. Judged by updated_at (at least the insert time, even for backdated rows),
+# and a chunk never reaches past the first row that is not settled yet.
+SETTLE_SECONDS = 30
+
+RollupKey = tuple[date, int, str]
+
+
+# Groups are (key, total in tiyn, count): summed as integers, exactly.
+def _transaction_groups(qs: QuerySet) -> Iterator[tuple[RollupKey, int, int]]:
+    rows = (
+        qs.filter(external_sync_status=Transaction.ExternalSyncStatus.SYNCED)
+        .annotate(day=TruncDate("created_at"))
+        .values("day", "wallet_id", "type")
+        .annotate(total=Sum("amount_minor"), count=Count("id"))
+        .order_by()
+    )
+    for r in rows:
+        yield (r["day"], r["wallet_id"], r["type"]), r["total"], r["count"]
+
+
+def _transfer_groups(qs: QuerySet) -> Iterator[tuple[RollupKey, int, int]]:
+    sides = (
+        ("from_wallet_id", DailyRollup.Kind.TRANSFER_OUT),
+        ("to_wallet_id", DailyRollup.Kind.TRANSFER_IN),
+    )
+    for field, kind in sides:
+        rows = (
+            qs.annotate(day=TruncDate("created_at"))
+            .values("day", field)
+            .annotate(total=Sum("amount_minor"), count=Count("id"))
+            .order_by()
+        )
+        for r in rows:
+            yield (r["day"], r[field], kind), r["total"], r["count"]
+
+
+_SOURCES = {
+    SOURCE_TRANSACTIONS: (Transaction, _transaction_groups),
+    SOURCE_TRANSFERS: (WalletTransfer, _transfer_groups),
+}
+# Rows moved out by core.archive still count when a range is rebuilt.
+_ARCHIVED = {
+    SOURCE_TRANSACTIONS: TransactionArchive,
+    SOURCE_TRANSFERS: WalletTransferArchive,
+}
+
+
+def _apply(groups: Iterable[tuple[RollupKey, int, int]]) -> None:
+    deltas: dict[RollupKey, list] = defaultdict(lambda: [0, 0])
+    for key, total, count in groups:
+        deltas[key][0] += total or 0
+        deltas[key][1] += count
+    if not deltas:
+        return
+
+    existing = {
+        (r.day, r.wallet_id, r.kind): r
+        for r in DailyRollup.objects.filter(
+            day__in={k[0] for k in deltas},
+            wallet_id__in={k[1] for k in deltas},
+            kind__in={k[2] for k in deltas},
+        )
+    }
+    to_update: list[DailyRollup] = []
+    to_create: list[DailyRollup] = []
+    for key, (total, count) in deltas.items():
+        row = existing.get(key)
+        if row is None:
+            day, wallet_id, kind = key
+            to_create.append(
+                DailyRollup(day=day, wallet_id=wallet_id, kind=kind, total=from_minor(total), count=count)
+            )
+        else:
+            row.total += from_minor(total)
+            row.count += count
+            to_update.append(row)
+    if to_update:
+        DailyRollup.objects.bulk_update(to_update, ["total", "count"])
+    if to_create:
+        DailyRollup.objects.bulk_create(to_create)
+
+
+def _day_bounds(date_from: date, date_to: date) -> tuple[datetime, datetime]:
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(date_from, time.min), tz)
+    end = timezone.make_aware(datetime.combine(date_to + timedelta(days=1), time.min), tz)
+    return start, end
+
+
+def update_rollups(batch_size: int = 5000) -> dict[str, int]:
+    """
+    Fold rows added since the last run into DailyRollup.
+    Each chunk is applied together with its cursor advance in one DB transaction,
+    so an interrupted run never counts a row twice.
+    Returns the number of processed rows per source.
+    """
+    settle_before = timezone.now() - timedelta(seconds=SETTLE_SECONDS)
+    processed: dict[str, int] = {}
+    for source, (model, grouper) in _SOURCES.items():
+        processed[source] = 0
+        while True:
+            with db_transaction.atomic():
+                cursor, _ = RollupCursor.objects.select_for_update().get_or_create(source=source)
+                pending = model.objects.filter(id__gt=cursor.last_id)
+                unsettled = (
+                    pending.filter(updated_at__gte=settle_before).order_by("id").values_list("id", flat=True).first()
+                )
+                if unsettled is not None:
+                    pending = pending.filter(id__lt=unsettled)
+                edge = list(pending.order_by("id").values_list("id", flat=True)[batch_size - 1 : batch_size])
+                hi = edge[0] if edge else pending.aggregate(hi=Max("id"))["hi"]
+                if hi is None:
+                    break
+                chunk = model.objects.filter(id__gt=cursor.last_id, id__lte=hi)
+                processed[source] += chunk.count()
+                _apply(grouper(chunk))
+                cursor.last_id = hi
+                cursor.save(update_fields=["last_id", "updated_at"])
+    return processed
+
+
+def rebuild_rollups(date_from: date, date_to: date) -> None:
+    """
+    Re-aggregate DailyRollup for [date_from, date_to] from the source tables
+    and their archives. Only rows at or below the current high-water marks are
+    counted, so a later `update_rollups` run picks up the rest without double
+    counting (archived rows always are: only rolled-up rows get archived).
+    """
+    start, end = _day_bounds(date_from, date_to)
+    with db_transaction.atomic():
+        cursors = {}
+        for source in _SOURCES:
+            cursor, _ = RollupCursor.objects.select_for_update().get_or_create(source=source)
+            cursors[source] = cursor
+        DailyRollup.objects.filter(day__gte=date_from, day__lte=date_to).delete()
+        for source, (model, grouper) in _SOURCES.items():
+            for rows in (model, _ARCHIVED[source]):
+                qs = rows.objects.filter(
+                    id__lte=cursors[source].last_id,
+                    created_at__gte=start,
+                    created_at__lt=end,
+                )
+                _apply(grouper(qs))
+
+
+def report_by_wallet(date_from: date, date_to: date) -> list[dict]:
+    """
+    Per-user totals for the period, read only from DailyRollup.
+    """
+    rows = (
+        DailyRollup.objects.filter(day__gte=date_from, day__lte=date_to)
+        .values("wallet_id", "wallet__user__username", "kind")
+        .annotate(total=Sum("total_minor"), count=Sum("count"))
+        .order_by("wallet__user__username")
+    )
+    by_wallet: dict[int, dict] = {}
+    for r in rows:
+        entry = by_wallet.setdefault(
+            r["wallet_id"],
+            {"username": r["wallet__user__username"], **{k: Decimal("0") for k in DailyRollup.Kind.values}, "count": 0},
+        )
+        entry[r["kind"]] = from_minor(r["total"])
+        entry["count"] += r["count"]
+    return list(by_wallet.values())
+
+
+def report_by_day(date_from: date, date_to: date) -> list[dict]:
+    """
+    Per-day totals across all wallets for the period, read only from DailyRollup.
+    """
+    rows = (
+        DailyRollup.objects.filter(day__gte=date_from, day__lte=date_to)
+        .values("day", "kind")
+        .annotate(total=Sum("total_minor"))
+        .order_by("-day")
+    )
+    by_day: dict[date, dict] = {}
+    for r in rows:
+        entry = by_day.setdefault(r["day"], {"day": r["day"], **{k: Decimal("0") for k in DailyRollup.Kind.values}})
+        entry[r["kind"]] = from_minor(r["total"])
+    return list(by_day.values())
@@ -0,0 +1,260 @@
+"""
+Synthetic data for scale testing (`manage.py generate_scale_data`) and
+timings/query plans of the main pages against it.
+"""
+
+import random
+import statistics
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from decimal import Decimal
+from itertools import accumulate
+from typing import Callable, Iterator
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.db import connection, transaction as db_transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .data_version import bump_data_version
+from .importer import bulk_create_dated
+from .models import Transaction, Wallet, WalletTransfer
+
+_SYNC_STATUSES = (
+    (Transaction.ExternalSyncStatus.SYNCED, 97),
+    (Transaction.ExternalSyncStatus.FAILED, 2),
+    (Transaction.ExternalSyncStatus.PENDING, 1),
+)
+
+
+@dataclass
+class ScaleSpec:
+    users: int = 1000
+    cashiers: int = 3
+    clients: int = 20000
+    transactions: int = 200_000
+    transfers: int = 50_000
+    days: int = 365
+    seed: int = 1
+    prefix: str = "scale"
+    chunk_size: int = 5000
+
+
+class _Zipf:
+    """
+    Rank-skewed sampler: item k is picked with weight 1 / k**s, so a few
+    items are hot and the rest form a long tail.
+    """
+
+    def __init__(self, items: list, s: float, rng: random.Random):
+        self.items = items
+        self.cum_weights = list(accumulate(1 / (k**s) for k in range(1, len(items) + 1)))
+        self.rng = rng
+
+    def sample(self, k: int) -> list:
+        return self.rng.choices(self.items, cum_weights=self.cum_weights, k=k)
+
+
+def _skewed_dates(rng: random.Random, now: datetime, days: int, k: int) -> list[datetime]:
+    """
+    More activity in recent weeks (squared uniform age) and during the day
+    (triangular hour around 14:00).
+    """
+    out = []
+    for _ in range(k):
+        day = now - timedelta(days=int(days * rng.random() ** 2))
+        hour = rng.triangular(7, 23, 14)
+        moment = day.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(hours=hour)
+        out.append(min(moment, now))
+    return out
+
+
+def _amounts(rng: random.Random, k: int, median: float) -> list[Decimal]:
+    # Log-normal: many small operations, a few large ones.
+    return [Decimal(f"{min(max(rng.lognormvariate(0, 1.1) * median, 1), 99999):.2f}") for _ in range(k)]
+
+
+def _chunks(total: int, size: int) -> Iterator[int]:
+    while total > 0:
+        yield min(size, total)
+        total -= size
+
+
+def _create_users(spec: ScaleSpec) -> tuple[list[int], list[int]]:
+    User = get_user_model()
+    password = make_password(None)  # unusable; hashing once keeps this fast
+    names = [f"{spec.prefix}_cashier{i}" for i in range(1, spec.cashiers + 1)]
+    names += [f"{spec.prefix}_user{i:06d}" for i in range(1, spec.users + 1)]
+    existing = set(User.objects.filter(username__in=names).values_list("username", flat=True))
+    User.objects.bulk_create(
+        [User(username=n, password=password) for n in names if n not in existing],
+        batch_size=spec.chunk_size,
+    )
+    ids = dict(User.objects.filter(username__in=names).values_list("username", "pk"))
+    cashier_ids = [ids[n] for n in names[: spec.cashiers]]
+    Group.objects.get_or_create(name="main_cashier")[0].user_set.add(*cashier_ids)
+
+    have_wallet = set(Wallet.objects.filter(user_id__in=ids.values()).values_list("user_id", flat=True))
+    Wallet.objects.bulk_create(
+        [Wallet(user_id=pk, balance=Decimal("100000")) for pk in ids.values() if pk not in have_wallet],
+        batch_size=spec.chunk_size,
+    )
+    wallets = dict(Wallet.objects.filter(user_id__in=ids.values()).values_list("user_id", "pk"))
+    return [wallets[pk] for pk in cashier_ids], [wallets[ids[n]] for n in names[spec.cashiers :]]
+
+
+def generate(spec: ScaleSpec, progress: Callable[[str], None] = lambda msg: None) -> None:
+    """
+    Bulk-create users, wallets, transactions and transfers following `spec`.
+    Agents (regular users) and external clients are Zipf-distributed, and
+    transfers come mostly from the busiest cashier.
+    """
+    rng = random.Random(spec.seed)
+    now = timezone.now()
+    cashier_wallets, user_wallets = _create_users(spec)
+    progress(f"{len(cashier_wallets)} cashiers, {len(user_wallets)} users")
+
+    agents = _Zipf(user_wallets, 1.1, rng)
+    clients = _Zipf(list(range(1, spec.clients + 1)), 0.9, rng)
+    statuses, weights = zip(*_SYNC_STATUSES)
+
+    done = 0
+    for n in _chunks(spec.transactions, spec.chunk_size):
+        rows = zip(
+            agents.sample(n),
+            clients.sample(n),
+            _skewed_dates(rng, now, spec.days, n),
+            _amounts(rng, n, 50),
+            rng.choices(statuses, weights=weights, k=n),
+        )
+        objs = [
+            Transaction(
+                wallet_id=wallet_id,
+                external_user_id=client,
+                external_user_name=f"Client {client}",
+                external_referral_token=f"tok{client:06d}",
+                external_sync_status=status,
+                type=Transaction.Type.DEPOSIT if rng.random() < 0.6 else Transaction.Type.WITHDRAW,
+                amount=amount,
+                created_at=created_at,
+            )
+            for wallet_id, client, created_at, amount, status in rows
+        ]
+        with db_transaction.atomic():
+            bulk_create_dated(Transaction, objs)
+        done += n
+        progress(f"transactions: {done}")
+
+    senders = _Zipf(cashier_wallets, 2.0, rng)
+    receivers = _Zipf(user_wallets, 0.8, rng)
+    done = 0
+    for n in _chunks(spec.transfers, spec.chunk_size):
+        rows = zip(senders.sample(n), receivers.sample(n), _skewed_dates(rng, now, spec.days, n), _amounts(rng, n, 200))
+        objs = [
+            WalletTransfer(from_wallet_id=src, to_wallet_id=dst, amount=amount, created_at=created_at)
+            for src, dst, created_at, amount in rows
+        ]
+        with db_transaction.atomic():
+            bulk_create_dated(WalletTransfer, objs)
+        done += n
+        progress(f"transfers: {done}")
+    bump_data_version()
+
+
+@dataclass
+class QueryTiming:
+    sql: str
+    ms: float
+    plan: list[str]
+
+
+@dataclass
+class PageTiming:
+    name: str
+    status: int
+    median_ms: float
+    queries: int
+    slowest: list[QueryTiming] = field(default_factory=list)
+
+
+def explain(sql: str) -> list[str]:
+    """
+    Query plan of a captured SELECT, one line per plan row.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}")
+        return [str(row[-1]) for row in cursor.fetchall()]
+
+
+def _host() -> str:
+    hosts = [h.lstrip(".") for h in settings.ALLOWED_HOSTS if h != "*"]
+    return hosts[0] if hosts else "localhost"
+
+
+def scale_pages(spec: ScaleSpec) -> list[tuple[str, str, dict, str]]:
+    """
+    (name, url, query params, username) of the pages worth measuring: the
+    busiest cashier, the busiest agent and a long-tail agent.
+    """
+    User = get_user_model()
+    cashier = f"{spec.prefix}_cashier1"
+    hot_user = f"{spec.prefix}_user{1:06d}"
+    tail_user = f"{spec.prefix}_user{spec.users:06d}"
+    hot_user_id = User.objects.filter(username=hot_user).values_list("pk", flat=True).first()
+    admin = User.objects.filter(is_superuser=True).values_list("username", flat=True).first() or cashier
+    return [
+        ("dashboard (cashier)", reverse("dashboard"), {}, cashier),
+        ("dashboard (cashier, filtered by hot user)", reverse("dashboard"), {"user": hot_user_id}, cashier),
+        ("dashboard (hot user)", reverse("dashboard"), {}, hot_user),
+        ("dashboard (long-tail user)", reverse("dashboard"), {}, tail_user),
+        ("reports", reverse("reports"), {}, cashier),
+        ("admin: transactions", reverse("admin:core_transaction_changelist"), {}, admin),
+        ("admin: transactions, search", reverse("admin:core_transaction_changelist"), {"q": "tok000042"}, admin),
+        ("admin: wallet transfers", reverse("admin:core_wallettransfer_changelist"), {}, admin),
+        ("admin: wallets", reverse("admin:core_wallet_changelist"), {}, admin),
+    ]
+
+
+def measure_pages(pages: list[tuple[str, str, dict, str]], runs: int = 3, slowest: int = 3) -> list[PageTiming]:
+    """
+    Request each page `runs` times with the history fragments invalidated (a
+    data version bump, as after any write, so they are rendered from the
+    database) and collect the median time, the query count and the plans of
+    the slowest queries. Other cached data is left alone.
+    """
+    User = get_user_model()
+    client = Client(HTTP_HOST=_host())
+    results = []
+    for name, url, params, username in pages:
+        client.force_login(User.objects.get(username=username))
+        times = []
+        for _ in range(runs):
+            bump_data_version()
+            with CaptureQueriesContext(connection) as ctx:
+                started = time.perf_counter()
+                response = client.get(url, params)
+                times.append((time.perf_counter() - started) * 1000)
+        top = sorted(ctx.captured_queries, key=lambda q: float(q["time"]), reverse=True)[:slowest]
+        results.append(
+            PageTiming(
+                name=name,
+                status=response.status_code,
+                median_ms=statistics.median(times),
+                queries=len(ctx.captured_queries),
+                slowest=[
+                    QueryTiming(
+                        sql=q["sql"],
+                        ms=float(q["time"]) * 1000,
+                        plan=explain(q["sql"]) if q["sql"].lstrip().upper().startswith("SELECT") else [],
+                    )
+                    for q in top
+                ],
+            )
+        )
+    return results
@@ -0,0 +1,19 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .data_version import bump_data_version
+from .models import Transaction, VelocityLimit, WalletTransfer
+from .velocity import bump_limits_generation
+
+
+@receiver([post_save, post_delete], sender=Transaction)
+@receiver([post_save, post_delete], sender=WalletTransfer)
+def _history_changed(sender, **kwargs) -> None:
+    bump_data_version()
+
+
+@receiver([post_save, post_delete], sender=VelocityLimit)
+@receiver(m2m_changed, sender=get_user_model().groups.through)
+def _limits_changed(sender, **kwargs) -> None:
+    bump_limits_generation()
@@ -0,0 +1,191 @@
+"""
+Account statement of one wallet: transactions, outgoing and incoming transfers
+merged newest first, with keyset pagination and a running balance.
+
+Each stream is read with its own per-wallet query on a (wallet, created_at, id)
+index, limited to one page, and the streams are merged in Python. Archived rows
+are usually older, but a hot row may predate them (imported and not archived
+yet), so the archive streams are merged into every page; when the hot streams
+fill the page, the archive is only read down to the oldest hot row on it.
+"""
+
+import heapq
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from typing import Iterator
+
+from django.core import signing
+
+from .models import Transaction, TransactionArchive, Wallet, WalletTransfer, WalletTransferArchive
+
+KIND_TRANSACTION = "transaction"
+KIND_TRANSFER_OUT = "transfer_out"
+KIND_TRANSFER_IN = "transfer_in"
+
+# Tie-break between streams for rows with the same created_at.
+_RANK = {KIND_TRANSACTION: 0, KIND_TRANSFER_OUT: 1, KIND_TRANSFER_IN: 2}
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+_US = timedelta(microseconds=1)
+
+_TX_FIELDS = ("id", "created_at", "amount", "type", "external_sync_status", "external_user_name", "external_referral_token")
+_TRANSFER_FIELDS = ("id", "created_at", "amount")
+
+# (kind, model, wallet column, counterparty wallet column)
+_HOT = (
+    (KIND_TRANSACTION, Transaction, "wallet_id", None),
+    (KIND_TRANSFER_OUT, WalletTransfer, "from_wallet_id", "to_wallet_id"),
+    (KIND_TRANSFER_IN, WalletTransfer, "to_wallet_id", "from_wallet_id"),
+)
+_ARCHIVE = (
+    (KIND_TRANSACTION, TransactionArchive, "wallet_id", None),
+    (KIND_TRANSFER_OUT, WalletTransferArchive, "from_wallet_id", "to_wallet_id"),
+    (KIND_TRANSFER_IN, WalletTransferArchive, "to_wallet_id", "from_wallet_id"),
+)
+
+
+@dataclass
+class StatementEntry:
+    kind: str
+    id: int
+    created_at: datetime
+    amount: Decimal
+    delta: Decimal  # effect on the wallet balance
+    balance: Decimal = Decimal("0")  # balance right after this entry
+    type: str = ""
+    sync_status: str = ""
+    counterparty: str = ""
+    counterparty_wallet_id: int | None = None
+
+    @property
+    def key(self) -> tuple[datetime, int, int]:
+        return self.created_at, _RANK[self.kind], self.id
+
+
+@dataclass
+class StatementCursor:
+    """
+    Position after the last entry of a page, (created_at, kind, id), and the
+    balance before that entry, which is the running balance of the next page.
+    Serialized as "<created_at µs>.<kind rank>.<id>.<balance>" and signed per
+    wallet, so the balance can't be forged or reused for another wallet.
+    """
+
+    created_us: int
+    rank: int
+    id: int
+    balance: Decimal
+
+    def __str__(self) -> str:
+        return f"{self.created_us}.{self.rank}.{self.id}.{self.balance}"
+
+    @property
+    def created_at(self) -> datetime:
+        return _EPOCH + self.created_us * _US
+
+    @staticmethod
+    def _signer(wallet_id: int) -> signing.Signer:
+        return signing.Signer(salt=f"core.statement.{wallet_id}")
+
+    def sign(self, wallet_id: int) -> str:
+        return self._signer(wallet_id).sign(str(self))
+
+    @classmethod
+    def after(cls, entry: StatementEntry) -> "StatementCursor":
+        return cls((entry.created_at - _EPOCH) // _US, _RANK[entry.kind], entry.id, entry.balance - entry.delta)
+
+    @classmethod
+    def parse(cls, value: str | None, wallet_id: int) -> "StatementCursor | None":
+        try:
+            a, b, c, d = cls._signer(wallet_id).unsign(value or "").split(".", 3)
+            return cls(int(a), int(b), int(c), Decimal(d))
+        except (signing.BadSignature, ValueError, InvalidOperation):
+            return None
+
+
+@dataclass
+class StatementPage:
+    wallet: Wallet
+    entries: list[StatementEntry]
+    next_cursor: str | None
+
+
+def _delta(kind: str, row: dict) -> Decimal:
+    if kind == KIND_TRANSFER_IN:
+        return row["amount"]
+    if kind == KIND_TRANSFER_OUT:
+        return -row["amount"]
+    # Only sent deposits debit the wallet; withdrawals never change it.
+    if row["type"] == Transaction.Type.DEPOSIT and row["external_sync_status"] == Transaction.ExternalSyncStatus.SYNCED:
+        return -row["amount"]
+    return Decimal("0")
+
+
+def _stream(
+    spec, wallet_id: int, cursor: StatementCursor | None, limit: int, floor: datetime | None = None
+) -> Iterator[StatementEntry]:
+    kind, model, wallet_column, other_column = spec
+    qs = model.objects.filter(**{wallet_column: wallet_id})
+    if floor is not None:
+        qs = qs.filter(created_at__gte=floor)
+    if cursor is not None:
+        # Rows sorting before the cursor within (created_at desc, rank desc, id desc).
+        rank, at = _RANK[kind], cursor.created_at
+        if rank < cursor.rank:
+            qs = qs.filter(created_at__lte=at)
+        elif rank > cursor.rank:
+            qs = qs.filter(created_at__lt=at)
+        else:
+            qs = qs.filter(created_at__lte=at).exclude(created_at=at, id__gte=cursor.id)
+    fields = _TX_FIELDS if other_column is None else (*_TRANSFER_FIELDS, other_column)
+    for row in qs.order_by("-created_at", "-id").values(*fields)[:limit]:
+        entry = StatementEntry(
+            kind=kind, id=row["id"], created_at=row["created_at"], amount=row["amount"], delta=_delta(kind, row)
+        )
+        if other_column is None:
+            entry.type = row["type"]
+            entry.sync_status = row["external_sync_status"]
+            entry.counterparty = row["external_user_name"] or row["external_referral_token"]
+        else:
+            entry.counterparty_wallet_id = row[other_column]
+        yield entry
+
+
+def _merged(streams, limit: int) -> list[StatementEntry]:
+    return list(islice(heapq.merge(*streams, key=lambda e: e.key, reverse=True), limit))
+
+
+def statement_page(wallet: Wallet, cursor: StatementCursor | None = None, size: int = PAGE_SIZE) -> StatementPage:
+    """
+    One page (newest first) of the wallet statement starting after `cursor`.
+    The running balance is derived backwards from the current wallet balance,
+    so it reflects manual balance corrections only from the moment they were made.
+    """
+    hot = _merged([_stream(spec, wallet.pk, cursor, size + 1) for spec in _HOT], size + 1)
+    # Archived rows below the oldest hot row of a full page can't make it onto the page.
+    floor = hot[-1].created_at if len(hot) > size else None
+    archive = _merged([_stream(spec, wallet.pk, cursor, size + 1, floor) for spec in _ARCHIVE], size + 1)
+    entries = _merged([hot, archive], size + 1)
+    more = len(entries) > size
+    entries = entries[:size]
+
+    balance = wallet.balance if cursor is None else cursor.balance
+    for entry in entries:
+        entry.balance = balance
+        balance -= entry.delta
+
+    # Counterparty names for the displayed transfers only, in one query.
+    wallet_ids = {e.counterparty_wallet_id for e in entries if e.counterparty_wallet_id is not None}
+    if wallet_ids:
+        names = dict(Wallet.objects.filter(pk__in=wallet_ids).values_list("pk", "user__username"))
+        for entry in entries:
+            if entry.counterparty_wallet_id is not None:
+                entry.counterparty = names.get(entry.counterparty_wallet_id, "")
+
+    next_cursor = StatementCursor.after(entries[-1]).sign(wallet.pk) if more else None
+    return StatementPage(wallet=wallet, entries=entries, next_cursor=next_cursor)
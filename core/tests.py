@@ -1,3 +1,1319 @@
-from django.test import TestCase
+import html
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.cache.backends.redis import RedisCache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import Sum
+from django.db.transaction import atomic as transaction_atomic
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import formats, timezone
+
+from . import balances, external_api, profiling, ratelimit, user_search
+from .admin import WalletAdminForm
+from .archive import archive_old_rows
+from .changes import changes_since
+from .checks import check_webhook_cache
+from .conditional import dashboard_replica_ok
+from .data_version import bump_data_version, get_data_version
+from .db_routers import ReplicaRouter
+from .holds import reserve
+from .importer import import_history
+from .jsonstream import iter_array
+from .money import from_minor, json_number, to_minor
+from .models import (
+    DailyRollup,
+    FundHold,
+    RequestProfile,
+    RollupCursor,
+    Transaction,
+    TransactionArchive,
+    VelocityLimit,
+    Wallet,
+    WalletTransfer,
+)
+from .replica import PIN_COOKIE, ReplicaMiddleware, replica_reads
+from .rollups import rebuild_rollups, update_rollups
+from .scale_data import ScaleSpec, generate, measure_pages
+from .sessions import clear_expired_sessions
+from .velocity import check as velocity_check
+from .webhooks import handle_events, sign
+
+User = get_user_model()
+
+
+class FakeResponse:
+    def __init__(self, payload: dict):
+        self._body = json.dumps(payload).encode("utf-8")
+
+    def read(self, *args) -> bytes:
+        body, self._body = self._body, b""
+        return body
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def fake_directory(n: int = 30) -> list[dict]:
+    return [
+        {
+            "id": i,
+            "name": f"Client {i}",
+            "email": f"client{i}@example.com",
+            "balance": f"{i}.00",
+            "referral_token": f"token{i:04d}",
+            "image_url": None,
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+# Tests run with DEBUG off; don't depend on a collectstatic manifest.
+without_manifest = override_settings(
+    STORAGES={
+        "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+        "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    }
+)
+
+
+@without_manifest
+class SeededTestCase(TestCase):
+    """
+    Realistic data set: one main cashier, a few regular users, enough
+    transactions/transfers that an N+1 query would blow any budget.
+    """
+
+    ROWS = 30
+
+    @classmethod
+    def setUpTestData(cls):
+        cashiers = Group.objects.create(name="main_cashier")
+        cls.cashier = User.objects.create_user("cashier", password="pw")
+        cls.cashier.groups.add(cashiers)
+        cls.admin = User.objects.create_superuser("admin", "admin@example.com", "pw")
+        cls.users = [User.objects.create_user(f"user{i}", password="pw") for i in range(3)]
+
+        cls.cashier_wallet = Wallet.objects.create(user=cls.cashier, balance=Decimal("100000"))
+        cls.wallets = [Wallet.objects.create(user=u, balance=Decimal("1000")) for u in cls.users]
+        for i in range(cls.ROWS):
+            wallet = cls.wallets[i % len(cls.wallets)]
+            Transaction.objects.create(
+                wallet=wallet,
+                external_user_id=i + 1,
+                external_user_name=f"Client {i + 1}",
+                external_referral_token=f"token{i + 1:04d}",
+                external_sync_status=Transaction.ExternalSyncStatus.SYNCED,
+                type=Transaction.Type.DEPOSIT if i % 2 else Transaction.Type.WITHDRAW,
+                amount=Decimal("10.00"),
+            )
+            WalletTransfer.objects.create(from_wallet=cls.cashier_wallet, to_wallet=wallet, amount=Decimal("5.00"))
+
+    def setUp(self):
+        cache.clear()
+        external_api._LOCAL_DIRECTORIES.clear()
+        self.external_calls: list[str] = []
+        patcher = mock.patch.object(external_api, "urlopen", side_effect=self._fake_urlopen)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _fake_urlopen(self, req, timeout=None):
+        self.external_calls.append(req.full_url)
+        if req.get_method() == "POST":
+            return FakeResponse({"success": True})
+        return FakeResponse({"success": True, "data": {"data": fake_directory()}})
+
+    @contextmanager
+    def assertBudget(self, queries: int, external: int = 0):
+        """
+        Fail if the block runs more than `queries` SQL queries or more than
+        `external` calls to the external API.
+        """
+        calls_before = len(self.external_calls)
+        with CaptureQueriesContext(connection) as ctx:
+            yield
+        executed = len(ctx.captured_queries)
+        sql = "\n".join(q["sql"] for q in ctx.captured_queries)
+        self.assertLessEqual(executed, queries, f"{executed} queries (budget {queries}):\n{sql}")
+        made = len(self.external_calls) - calls_before
+        self.assertLessEqual(made, external, f"{made} external calls (budget {external})")
+
+
+class DashboardBudgetTests(SeededTestCase):
+    def test_cashier_dashboard(self):
+        self.client.force_login(self.cashier)
+        with self.assertBudget(queries=7):
+            response = self.client.get(reverse("dashboard"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["transactions"]), 25)
+
+    def test_cashier_dashboard_filtered(self):
+        # The user has fewer than 25 hot rows: reads through to the archive.
+        self.client.force_login(self.cashier)
+        with self.assertBudget(queries=9):
+            response = self.client.get(reverse("dashboard"), {"user": self.users[0].pk})
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(CACHE_SHARED=True)
+    def test_cashier_dashboard_served_from_fragment_cache(self):
+        self.client.force_login(self.cashier)
+        self.client.get(reverse("dashboard"))
+        with self.assertBudget(queries=5):
+            response = self.client.get(reverse("dashboard"))
+        self.assertEqual(response.status_code, 200)
+
+    def test_user_dashboard(self):
+        self.client.force_login(self.users[0])
+        with self.assertBudget(queries=6):
+            response = self.client.get(reverse("dashboard"))
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(CACHE_SHARED=True)
+    def test_not_modified(self):
+        self.client.force_login(self.users[0])
+        etag = self.client.get(reverse("dashboard"))["ETag"]
+        with self.assertBudget(queries=4):
+            response = self.client.get(reverse("dashboard"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_per_process_cache_bypasses_fragments_and_etag(self):
+        # LocMemCache: other workers would never see a data version bump.
+        self.client.force_login(self.cashier)
+        self.assertNotIn("ETag", self.client.get(reverse("dashboard")))
+        with self.assertBudget(queries=7), CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse("dashboard"))
+        self.assertTrue(any("core_transaction" in q["sql"] for q in ctx.captured_queries))
+
+    def test_data_version_bumps_only_on_commit(self):
+        before = get_data_version()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            WalletTransfer.objects.create(from_wallet=self.cashier_wallet, to_wallet=self.wallets[0], amount=Decimal("1"))
+            self.assertEqual(get_data_version(), before)
+        self.assertEqual(len(callbacks), 1)
+        self.assertGreater(get_data_version(), before)
+
+
+class TransactionCreateBudgetTests(SeededTestCase):
+    def test_get_cold_directory(self):
+        self.client.force_login(self.users[0])
+        with self.assertBudget(queries=3, external=1):
+            response = self.client.get(reverse("transaction_create"))
+        self.assertEqual(response.status_code, 200)
+
+    def test_get_warm_directory(self):
+        self.client.force_login(self.users[0])
+        self.client.get(reverse("transaction_create"))
+        with self.assertBudget(queries=3, external=0):
+            response = self.client.get(reverse("transaction_create"))
+        self.assertEqual(response.status_code, 200)
+
+    def test_post_deposit(self):
+        self.client.force_login(self.users[0])
+        self.client.get(reverse("transaction_create"))
+        data = {"client_id": "3", "type": Transaction.Type.DEPOSIT, "amount": "5.00", "note": ""}
+        # Includes loading the user's velocity limits (cold cache).
+        with self.assertBudget(queries=14, external=1):
+            response = self.client.post(reverse("transaction_create"), data)
+        self.assertRedirects(response, reverse("dashboard"), fetch_redirect_response=False)
+        self.wallets[0].refresh_from_db()
+        self.assertEqual(self.wallets[0].balance, Decimal("995.00"))
+        self.assertEqual(self.wallets[0].held, Decimal("0"))
+
+
+class CashierDepositBudgetTests(SeededTestCase):
+    def test_get(self):
+        # The user picker is filled by /api/users/: no user list on the page.
+        self.client.force_login(self.cashier)
+        with self.assertBudget(queries=5):
+            response = self.client.get(reverse("cashier_deposit"))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, self.users[2].username)
+
+    def test_post_unknown_user(self):
+        self.client.force_login(self.cashier)
+        response = self.client.post(reverse("cashier_deposit"), {"to_user": 999999, "amount": "50.00"})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Пользователь не найден.")
+        self.assertEqual(WalletTransfer.objects.count(), self.ROWS)
+
+    def test_post(self):
+        self.client.force_login(self.cashier)
+        data = {"to_user": self.users[1].pk, "amount": "50.00"}
+        # Includes loading the user's velocity limits (cold cache).
+        with self.assertBudget(queries=14):
+            response = self.client.post(reverse("cashier_deposit"), data)
+        self.assertRedirects(response, reverse("dashboard"), fetch_redirect_response=False)
+        self.wallets[1].refresh_from_db()
+        self.assertEqual(self.wallets[1].balance, Decimal("1050.00"))
+
+    def test_post_releases_expired_holds_first(self):
+        hold = reserve(self.cashier_wallet.pk, Decimal("99990.00"), ttl=timedelta(seconds=-1))
+        self.client.force_login(self.cashier)
+        response = self.client.post(reverse("cashier_deposit"), {"to_user": self.users[1].pk, "amount": "50.00"})
+        self.assertRedirects(response, reverse("dashboard"), fetch_redirect_response=False)
+        hold.refresh_from_db()
+        self.assertEqual(hold.status, FundHold.Status.RELEASED)
+        self.cashier_wallet.refresh_from_db()
+        self.assertEqual((self.cashier_wallet.balance, self.cashier_wallet.held), (Decimal("99950.00"), 0))
+
+
+class ApiClientsBudgetTests(SeededTestCase):
+    def test_cold_and_warm(self):
+        self.client.force_login(self.users[0])
+        with self.assertBudget(queries=2, external=1):
+            response = self.client.get(reverse("api_clients"), {"referral_token": "token0003"})
+        self.assertEqual(response.status_code, 200)
+        with self.assertBudget(queries=2, external=0):
+            response = self.client.get(reverse("api_clients"), {"referral_token": "token0003"})
+        self.assertEqual(response.status_code, 200)
+
+
+class AdminChangelistBudgetTests(SeededTestCase):
+    BUDGET = 7
+
+    def test_changelists(self):
+        from django.contrib import admin
+
+        self.client.force_login(self.admin)
+        for model in admin.site._registry:
+            opts = model._meta
+            url = reverse(f"admin:{opts.app_label}_{opts.model_name}_changelist")
+            with self.subTest(model=opts.label), self.assertBudget(queries=self.BUDGET):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+
+
+@override_settings(REPLICA_DATABASE="replica", REPLICA_MAX_LAG=5)
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def _serve(self, request, view, match=None):
+        """
+        Run `view` through ReplicaMiddleware; return (response, alias reads used).
+        """
+        seen = {}
+
+        def get_response(req):
+            req.resolver_match = match
+            middleware.process_view(req, view, (), {})
+            return view(req, seen)
+
+        middleware = ReplicaMiddleware(get_response)
+        return middleware(request), seen
+
+    @staticmethod
+    @replica_reads()
+    def _reading_view(request, seen):
+        seen["wallet"] = ReplicaRouter().db_for_read(Wallet)
+        seen["session"] = ReplicaRouter().db_for_read(Session)
+        return HttpResponse()
+
+    @staticmethod
+    @replica_reads()
+    def _writing_view(request, seen):
+        ReplicaRouter().db_for_write(Wallet)
+        seen["wallet"] = ReplicaRouter().db_for_read(Wallet)
+        return HttpResponse()
+
+    @staticmethod
+    def _plain_view(request, seen):
+        seen["wallet"] = ReplicaRouter().db_for_read(Wallet)
+        return HttpResponse()
+
+    def test_opted_in_get_reads_replica(self):
+        response, seen = self._serve(self.factory.get("/"), self._reading_view)
+        self.assertEqual(seen, {"wallet": "replica", "session": "default"})
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_other_views_read_primary(self):
+        _, seen = self._serve(self.factory.get("/"), self._plain_view)
+        self.assertEqual(seen["wallet"], "default")
+
+    def test_admin_changelist_reads_replica(self):
+        match = resolve(reverse("admin:core_wallet_changelist"))
+        _, seen = self._serve(self.factory.get("/"), self._plain_view, match=match)
+        self.assertEqual(seen["wallet"], "replica")
+
+    def test_post_reads_primary_and_pins(self):
+        response, seen = self._serve(self.factory.post("/"), self._reading_view)
+        self.assertEqual(seen["wallet"], "default")
+        self.assertEqual(response.cookies[PIN_COOKIE]["max-age"], 5)
+
+    def test_pinned_client_reads_primary(self):
+        request = self.factory.get("/")
+        request.COOKIES[PIN_COOKIE] = "1"
+        _, seen = self._serve(request, self._reading_view)
+        self.assertEqual(seen["wallet"], "default")
+
+    def test_write_switches_to_primary_and_pins(self):
+        response, seen = self._serve(self.factory.get("/"), self._writing_view)
+        self.assertEqual(seen["wallet"], "default")
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+    def test_writes_and_background_reads_use_primary(self):
+        self.assertEqual(self.router.db_for_read(Wallet), "default")
+        self.assertEqual(self.router.db_for_write(Wallet), "default")
+        self.assertFalse(self.router.allow_migrate("replica", "core", "wallet"))
+
+    @override_settings(REPLICA_DATABASE=None)
+    def test_no_replica_configured(self):
+        response, seen = self._serve(self.factory.post("/"), self._reading_view)
+        self.assertIsNone(seen["wallet"])
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_dashboard_waits_for_replica_to_settle(self):
+        cache.clear()
+        self.assertTrue(dashboard_replica_ok(self.factory.get("/")))
+        bump_data_version()
+        self.assertFalse(dashboard_replica_ok(self.factory.get("/")))
+
+
+class ImportHistoryTests(SeededTestCase):
+    def _write(self, text: str, suffix: str) -> Path:
+        with tempfile.NamedTemporaryFile("w", suffix=suffix, delete=False, encoding="utf-8") as f:
+            f.write(text)
+        self.addCleanup(os.unlink, f.name)
+        return Path(f.name)
+
+    def test_import_keeps_dates_and_resumes(self):
+        path = self._write(
+            "username,type,amount,created_at,external_user_id\n"
+            "user0,deposit,12.50,2021-03-01T10:00:00,7\n"
+            "nobody,deposit,1.00,2021-03-01T10:00:00,\n"
+            "user1,withdraw,3.00,2021-03-02T11:30:00+03:00,\n",
+            ".csv",
+        )
+        Transaction.objects.update(updated_at=timezone.now() - timedelta(minutes=5))
+        fed = changes_since("transaction", None, limit=100)
+        errors = []
+        result = import_history(path, "transaction", chunk_size=2, on_error=lambda n, m: errors.append(n))
+        self.assertEqual((result.read, result.imported, result.errors), (3, 2, 1))
+        self.assertEqual(errors, [3])
+        imported = Transaction.objects.filter(created_at__year=2021).order_by("created_at")
+        self.assertEqual([t.amount for t in imported], [Decimal("12.50"), Decimal("3.00")])
+        # updated_at is the import time: the change feed delivers the rows after its cursor.
+        with mock.patch("core.changes.timezone.now", return_value=timezone.now() + timedelta(minutes=1)):
+            rows = changes_since("transaction", fed.cursor).rows
+        self.assertEqual({r["id"] for r in rows}, {t.id for t in imported})
+        self.assertEqual(imported[0].created_at.hour, 10)
+
+        again = import_history(path, "transaction", chunk_size=2)
+        self.assertEqual((again.skipped, again.imported), (3, 0))
+        self.assertEqual(Transaction.objects.filter(created_at__year=2021).count(), 2)
+
+    def test_import_leaves_auto_now_add_alone(self):
+        path = self._write("username,type,amount,created_at\nuser0,deposit,1.00,2019-05-05T05:05:00\n", ".csv")
+        field = Transaction._meta.get_field("created_at")
+        seen = []
+        with mock.patch.object(Transaction.objects, "bulk_create", wraps=Transaction.objects.bulk_create) as create:
+            create.side_effect = lambda *a, **kw: seen.append(field.auto_now_add) or mock.DEFAULT
+            import_history(path, "transaction")
+        self.assertEqual(seen, [True])
+        self.assertTrue(Transaction.objects.filter(created_at__year=2019).exists())
+
+    def test_import_transfers_jsonl(self):
+        path = self._write(
+            '{"from_username": "cashier", "to_username": "user2", "amount": "5", "created_at": "2020-01-01T00:00:00"}\n'
+            "\n"
+            "not json\n",
+            ".jsonl",
+        )
+        result = import_history(path, "transfer")
+        self.assertEqual((result.imported, result.errors), (1, 1))
+        self.assertTrue(WalletTransfer.objects.filter(created_at__year=2020, to_wallet=self.wallets[2]).exists())
+
+
+class ScaleDataTests(TestCase):
+    def test_generate_small_dataset(self):
+        spec = ScaleSpec(users=5, cashiers=1, clients=10, transactions=50, transfers=10, days=30, chunk_size=20)
+        generate(spec)
+        generate(spec)  # users and wallets are reused on a second run
+        self.assertEqual(User.objects.filter(username__startswith="scale_").count(), 6)
+        self.assertEqual(Transaction.objects.count(), 100)
+        self.assertEqual(WalletTransfer.objects.count(), 20)
+        oldest = Transaction.objects.order_by("created_at").first().created_at
+        self.assertGreater(oldest, timezone.now() - timedelta(days=31))
+
+    @without_manifest
+    def test_measuring_keeps_other_cache_keys_and_needs_debug_or_flag(self):
+        generate(ScaleSpec(users=2, cashiers=1, clients=3, transactions=10, transfers=2, days=5))
+        cache.set("unrelated", 1)
+        pages = [("dashboard", reverse("dashboard"), {}, "scale_cashier1")]
+        self.assertEqual([p.status for p in measure_pages(pages, runs=1)], [200])
+        self.assertEqual(cache.get("unrelated"), 1)
+        with self.assertRaisesMessage(CommandError, "--allow-invalidate"):
+            call_command("generate_scale_data", "--measure-only")
+
+
+class ProfilerTests(SeededTestCase):
+    def test_staff_toggle_records_profile(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse("transaction_create"), {"__profile": "1"})
+        profile = RequestProfile.objects.get(pk=response["X-Profile-Id"])
+        self.assertEqual(profile.path, reverse("transaction_create") + "?__profile=1")
+        self.assertEqual(profile.sql_count, len(profile.queries))
+        self.assertGreater(profile.sql_count, 0)
+        self.assertEqual([c["method"] for c in profile.external_calls], ["GET"])
+        self.assertIn("cumulative", profile.call_tree)
+
+        response = self.client.get(reverse("dashboard"), HTTP_X_PROFILE="1")
+        self.assertIn("X-Profile-Id", response)
+
+    def test_ignored_without_toggle_or_for_non_staff(self):
+        self.client.force_login(self.admin)
+        self.assertNotIn("X-Profile-Id", self.client.get(reverse("dashboard")))
+        self.assertNotIn("X-Profile-Id", self.client.get(reverse("dashboard"), {"__profile": "0"}))
+        self.assertNotIn("X-Profile-Id", self.client.get(reverse("dashboard"), {"no__profile": "1"}))
+        self.assertNotIn("X-Profile-Id", self.client.get(reverse("dashboard"), HTTP_X_PROFILE="off"))
+        self.client.force_login(self.cashier)
+        self.assertNotIn("X-Profile-Id", self.client.get(reverse("dashboard"), {"__profile": "1"}))
+        self.assertFalse(RequestProfile.objects.exists())
+
+
+    def test_served_unprofiled_while_the_profiler_is_busy(self):
+        self.client.force_login(self.admin)
+        with profiling._profiling:
+            response = self.client.get(reverse("dashboard"), {"__profile": "1"})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("X-Profile-Id", response)
+        with mock.patch("cProfile.Profile.enable", side_effect=ValueError("Another profiling tool is already active")):
+            response = self.client.get(reverse("dashboard"), {"__profile": "1"})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("X-Profile-Id", response)
+        self.assertFalse(RequestProfile.objects.exists())
+        self.assertIn("X-Profile-Id", self.client.get(reverse("dashboard"), {"__profile": "1"}))
+
+class SessionCleanupTests(TestCase):
+    def test_clears_only_expired_sessions_in_batches(self):
+        now = timezone.now()
+        Session.objects.bulk_create(
+            [Session(session_key=f"old{i}", session_data="", expire_date=now - timedelta(days=1)) for i in range(5)]
+            + [Session(session_key="live", session_data="", expire_date=now + timedelta(days=1))]
+        )
+        self.assertEqual(clear_expired_sessions(batch_size=2), 5)
+        self.assertEqual(list(Session.objects.values_list("session_key", flat=True)), ["live"])
+
+    @override_settings(SESSION_ENGINE="django.contrib.sessions.backends.signed_cookies")
+    def test_nothing_to_do_for_cookie_sessions(self):
+        self.assertEqual(clear_expired_sessions(), 0)
+
+
+class StatementTests(SeededTestCase):
+    def _walk(self, limit: int, **params) -> list[dict]:
+        entries, cursor = [], None
+        while True:
+            query = {"limit": limit, **params, **({"cursor": cursor} if cursor else {})}
+            response = self.client.get(reverse("api_statement"), query)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            entries += data["results"]
+            cursor = data["next_cursor"]
+            if not cursor:
+                return entries
+
+    def assertConsistent(self, entries: list[dict], wallet: Wallet):
+        wallet.refresh_from_db()
+        self.assertEqual(Decimal(entries[0]["balance"]), wallet.balance)
+        for newer, older in zip(entries, entries[1:]):
+            self.assertEqual(Decimal(older["balance"]), Decimal(newer["balance"]) - Decimal(newer["delta"]))
+            self.assertGreaterEqual(newer["created_at"], older["created_at"])
+
+    def test_pages_cover_history_once_with_running_balance(self):
+        wallet = self.wallets[0]
+        self.client.force_login(self.users[0])
+        entries = self._walk(limit=3)
+        keys = [(e["kind"], e["id"]) for e in entries]
+        self.assertEqual(len(keys), len(set(keys)))
+        self.assertEqual(len(keys), Transaction.objects.filter(wallet=wallet).count() + wallet.incoming_transfers.count())
+        self.assertConsistent(entries, wallet)
+        withdraws = [e for e in entries if e["type"] == Transaction.Type.WITHDRAW]
+        self.assertTrue(withdraws and all(e["delta"] == "0" for e in withdraws))
+
+    def test_rows_with_equal_timestamps(self):
+        moment = timezone.now() - timedelta(days=1)
+        Transaction.objects.update(created_at=moment)
+        WalletTransfer.objects.update(created_at=moment)
+        self.client.force_login(self.cashier)
+        entries = self._walk(limit=4, user=self.users[1].pk)
+        keys = [(e["kind"], e["id"]) for e in entries]
+        self.assertEqual(len(keys), len(set(keys)))
+        self.assertEqual(len(keys), 20)
+        self.assertConsistent(entries, self.wallets[1])
+
+    def test_reads_through_to_archive(self):
+        tx = Transaction.objects.filter(wallet=self.wallets[2]).order_by("created_at").first()
+        TransactionArchive.objects.create(
+            id=10_000, month=tx.created_at.date().replace(day=1), wallet=self.wallets[2], type=Transaction.Type.DEPOSIT,
+            external_sync_status=Transaction.ExternalSyncStatus.SYNCED, amount=Decimal("1.00"),
+            created_at=tx.created_at - timedelta(days=365), updated_at=tx.created_at - timedelta(days=365),
+        )
+        self.client.force_login(self.users[2])
+        entries = self._walk(limit=7)
+        self.assertEqual((entries[-1]["kind"], entries[-1]["id"]), ("transaction", 10_000))
+        self.assertConsistent(entries, self.wallets[2])
+
+    def test_hot_rows_older_than_archived_rows_merge_in_order(self):
+        # An imported row that predates the archive but was not archived yet.
+        newest = Transaction.objects.filter(wallet=self.wallets[2]).order_by("created_at").first()
+        Transaction.objects.filter(pk=newest.pk).update(created_at=newest.created_at - timedelta(days=400))
+        TransactionArchive.objects.create(
+            id=10_000, month=newest.created_at.date().replace(day=1), wallet=self.wallets[2],
+            type=Transaction.Type.WITHDRAW, external_sync_status=Transaction.ExternalSyncStatus.SYNCED,
+            amount=Decimal("1.00"), created_at=newest.created_at - timedelta(days=365),
+            updated_at=newest.created_at - timedelta(days=365),
+        )
+        self.client.force_login(self.users[2])
+        for limit in (1, 3, 50):
+            entries = self._walk(limit=limit)
+            keys = [(e["kind"], e["id"]) for e in entries]
+            self.assertEqual(len(keys), len(set(keys)))
+            self.assertEqual(keys[-2:], [("transaction", 10_000), ("transaction", newest.pk)])
+            self.assertConsistent(entries, self.wallets[2])
+
+    def test_cursor_is_signed_per_wallet(self):
+        self.client.force_login(self.users[0])
+        cursor = self.client.get(reverse("api_statement"), {"limit": 2}).json()["next_cursor"]
+        tampered = cursor.replace(".", ".9", 1)
+        self.assertEqual(self.client.get(reverse("api_statement"), {"cursor": tampered}).status_code, 400)
+        self.client.force_login(self.users[1])
+        self.assertEqual(self.client.get(reverse("api_statement"), {"cursor": cursor}).status_code, 400)
+
+    def test_regular_user_sees_only_own_wallet(self):
+        self.client.force_login(self.users[0])
+        data = self.client.get(reverse("api_statement"), {"user": self.users[1].pk}).json()
+        self.assertEqual(data["wallet"]["username"], self.users[0].username)
+
+    def test_page_budget(self):
+        self.client.force_login(self.cashier)
+        with self.assertBudget(queries=10):
+            response = self.client.get(reverse("statement"), {"limit": 10})
+        self.assertEqual(response.status_code, 200)
+        cursor = response.context["page"].next_cursor
+        with self.assertBudget(queries=10):
+            response = self.client.get(reverse("statement"), {"limit": 10, "cursor": cursor})
+        self.assertEqual(len(response.context["page"].entries), 10)
+
+
+@override_settings(YILDIZTOP_WEBHOOK_SECRET="s3cret")
+class YildiztopWebhookTests(SeededTestCase):
+    def _post(self, payload: dict, secret: str = "s3cret", timestamp: int | None = None):
+        body = json.dumps(payload).encode()
+        return self.client.post(
+            reverse("yildiztop_webhook"),
+            body,
+            content_type="application/json",
+            HTTP_X_YILDIZTOP_SIGNATURE=sign(body, secret, timestamp),
+        )
+
+    def test_balance_change_updates_cached_directory_in_place(self):
+        external_api.fetch_yildiztop_directory()
+        stamp = external_api.users_cache_stamp(None)
+        response = self._post({"id": "evt1", "type": "user.balance_changed", "data": {"id": 3, "balance": "77.50"}})
+        self.assertEqual(response.json(), {"applied": 1, "dropped": 0, "duplicate": 0})
+        directory = external_api.fetch_yildiztop_directory()
+        self.assertEqual(directory.get(3).balance, Decimal("77.50"))
+        self.assertEqual(directory.get(3).name, "Client 3")
+        self.assertNotEqual(external_api.users_cache_stamp(None), stamp)
+        self.assertEqual(len(self.external_calls), 1)
+
+    def test_created_user_and_token_change(self):
+        external_api.fetch_yildiztop_directory()
+        external_api.fetch_yildiztop_directory("token0003")
+        self._post(
+            {
+                "events": [
+                    {"type": "user.created", "data": {"id": 99, "name": "New", "referral_token": "token0099"}},
+                    {"type": "user.updated", "data": {"id": 3, "referral_token": "token9999"}},
+                ]
+            }
+        )
+        self.assertEqual(external_api.fetch_yildiztop_directory().get(99).name, "New")
+        self.assertIsNone(external_api.fetch_yildiztop_directory("token0003").get(3))
+        self.assertEqual(external_api.fetch_yildiztop_directory().find_token("token9999").id, 3)
+        self.assertEqual(len(self.external_calls), 2)
+
+    def test_batch_rebuilds_each_directory_once(self):
+        external_api.fetch_yildiztop_directory()
+        events = [{"type": "user.balance_changed", "data": {"id": i, "balance": "5"}} for i in range(1, 21)]
+        with mock.patch("core.external_api._store_directory", wraps=external_api._store_directory) as store:
+            self.assertEqual(self._post({"events": events}).json()["applied"], 20)
+        self.assertEqual(store.call_count, 1)
+        self.assertEqual(external_api.fetch_yildiztop_directory().get(20).balance, Decimal("5"))
+
+    def test_interleaved_batches_never_store_a_directory_missing_changes(self):
+        external_api.fetch_yildiztop_directory()
+        first = [{"type": "user.balance_changed", "data": {"id": 1, "balance": "11"}}]
+        second = [{"type": "user.balance_changed", "data": {"id": 2, "balance": "22"}}]
+        cached_directory = external_api._cached_directory
+
+        def interleaved(*args, **kwargs):
+            directory = cached_directory(*args, **kwargs)
+            # The second batch arrives while the first one holds the lock.
+            self.assertEqual(handle_events(second), {"applied": 0, "dropped": 1, "duplicate": 0})
+            return directory
+
+        with mock.patch("core.external_api._cached_directory", side_effect=interleaved):
+            self.assertEqual(handle_events(first)["applied"], 1)
+        self.assertIsNone(external_api.users_cache_stamp(None))
+
+        external_api.fetch_yildiztop_directory()
+        self.assertEqual(len(self.external_calls), 2)
+        self.assertEqual(handle_events(second)["applied"], 1)
+        self.assertEqual(external_api.fetch_yildiztop_directory().get(2).balance, Decimal("22"))
+
+    def test_unknown_user_with_partial_fields_drops_the_entry(self):
+        external_api.fetch_yildiztop_directory()
+        response = self._post({"type": "user.balance_changed", "data": {"id": 500, "balance": "1"}})
+        self.assertEqual(response.json()["dropped"], 1)
+        self.assertIsNone(external_api.users_cache_stamp(None))
+
+    def test_rejects_bad_signature_stale_timestamp_and_duplicates(self):
+        event = {"id": "evt2", "type": "user.updated", "data": {"id": 1, "name": "X"}}
+        self.assertEqual(self._post(event, secret="wrong").status_code, 403)
+        self.assertEqual(self._post(event, timestamp=int(time.time()) - 3600).status_code, 403)
+        self.assertEqual(self._post({"type": "user.deleted", "data": {"id": 1}}).status_code, 400)
+        self.assertEqual(self._post(event).json()["applied"], 1)
+        self.assertEqual(self._post(event).json()["duplicate"], 1)
+
+    def test_failed_event_is_not_recorded_as_seen(self):
+        events = [{"id": "evt3", "type": "user.updated", "data": {"id": 1, "name": "X"}}]
+        with mock.patch("core.webhooks.apply_user_changes", side_effect=OSError("cache down")):
+            with self.assertRaises(OSError):
+                handle_events(events)
+        self.assertEqual(handle_events(events)["applied"], 1)
+        self.assertEqual(handle_events(events)["duplicate"], 1)
+
+    @override_settings(CACHE_SHARED=False)
+    def test_deploy_check_warns_about_per_process_cache(self):
+        self.assertEqual([w.id for w in check_webhook_cache(None)], ["core.W003"])
+        with override_settings(CACHE_SHARED=True):
+            self.assertEqual(check_webhook_cache(None), [])
+
+    @override_settings(YILDIZTOP_WEBHOOK_SECRET="")
+    def test_disabled_without_secret(self):
+        self.assertEqual(self._post({"type": "user.updated", "data": {"id": 1}}).status_code, 404)
+
+
+class _FakeRedisPipeline:
+    def __init__(self, server: "_FakeRedis"):
+        self.server, self.ops = server, []
+
+    def set(self, key, value, ex=None, nx=False):
+        self.ops.append(("set", key, value, ex, nx))
+
+    def incr(self, key):
+        self.ops.append(("incr", key))
+
+    def execute(self):
+        self.server.round_trips += 1
+        results = []
+        for op in self.ops:
+            if op[0] == "set":
+                _, key, value, ex, nx = op
+                created = not (nx and key in self.server.data)
+                if created:
+                    self.server.data[key] = value
+                    self.server.expiry[key] = ex
+                results.append(created or None)
+            else:
+                self.server.data[op[1]] += 1
+                results.append(self.server.data[op[1]])
+        return results
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.data, self.expiry, self.round_trips = {}, {}, 0
+
+    def get_client(self, key, write=False):
+        return self
+
+    def pipeline(self):
+        return _FakeRedisPipeline(self)
+
+
+class RateLimitTests(SeededTestCase):
+    @override_settings(RATELIMITS={"api_users": "2/10s"})
+    def test_429_with_retry_after_until_the_window_ends(self):
+        self.client.force_login(self.cashier)
+        with mock.patch("core.ratelimit.time.time", return_value=1_000_003.0):
+            statuses = [self.client.get(reverse("api_users"), {"q": "u"}).status_code for _ in range(3)]
+            self.assertEqual(statuses, [200, 200, 429])
+            response = self.client.get(reverse("api_users"), {"q": "u"})
+        self.assertEqual(response["Retry-After"], "7")
+        self.assertEqual(response.json(), {"error": "rate_limited", "retry_after": 7})
+        with mock.patch("core.ratelimit.time.time", return_value=1_000_010.0):
+            self.assertEqual(self.client.get(reverse("api_users"), {"q": "u"}).status_code, 200)
+
+    def test_add_fallback_when_the_counter_is_missing(self):
+        with mock.patch("core.ratelimit.time.time", return_value=1_000_000.0):
+            self.assertEqual(ratelimit.hit("r", "u1", 2, 10), 0)
+            # Another worker created the counter between our incr and add.
+            with mock.patch.object(ratelimit.cache, "incr", side_effect=[ValueError, 2]), mock.patch.object(
+                ratelimit.cache, "add", return_value=False
+            ):
+                self.assertEqual(ratelimit.hit("r", "u2", 2, 10), 0)
+            self.assertEqual(ratelimit.hit("r", "u1", 2, 10), 0)
+            self.assertEqual(ratelimit.hit("r", "u1", 2, 10), 10)
+
+    def test_redis_counts_in_one_round_trip(self):
+        backend = RedisCache("redis://unused", {})
+        server = _FakeRedis()
+        backend.__dict__["_cache"] = server
+        with mock.patch("core.ratelimit.caches", {"default": backend}), mock.patch(
+            "core.ratelimit.time.time", return_value=1_000_000.0
+        ):
+            self.assertEqual([ratelimit.hit("r", "u1", 2, 10) for _ in range(3)], [0, 0, 10])
+        self.assertEqual(server.round_trips, 3)
+        self.assertEqual(list(server.expiry.values()), [11])
+
+
+class ClientsBatchTests(SeededTestCase):
+    def _fake_urlopen(self, req, timeout=None):
+        # Upstream filters by token; later tokens answer faster, so the pool finishes out of order.
+        token = parse_qs(urlsplit(req.full_url).query).get("referral_token", [None])[0]
+        if token is None:
+            return super()._fake_urlopen(req, timeout)
+        self.external_calls.append(req.full_url)
+        time.sleep(max(0, 0.02 - int(token[-4:]) / 1000))
+        rows = [u for u in fake_directory() if u["referral_token"] == token]
+        return FakeResponse({"success": True, "data": {"data": rows}})
+
+    def _ids(self, resolved: dict) -> dict:
+        return {t: [u.id for u in users] for t, users in resolved.items()}
+
+    def test_token_cache_hit_needs_no_upstream_call(self):
+        external_api.fetch_yildiztop_directory("token0004")
+        self.assertEqual(len(self.external_calls), 1)
+        resolved = external_api.fetch_yildiztop_users_by_referral_tokens(["token0004"])
+        self.assertEqual(self._ids(resolved), {"token0004": [4]})
+        self.assertEqual(len(self.external_calls), 1)
+
+    def test_directory_hit_in_one_cache_round_trip(self):
+        external_api.fetch_yildiztop_directory()
+        calls_before = len(self.external_calls)
+        read = external_api.cache.get
+
+        def get_many(keys):
+            return {k: read(k) for k in keys if read(k) is not None}
+
+        with mock.patch.object(external_api.cache, "get_many", side_effect=get_many) as many, mock.patch.object(
+            external_api.cache, "get"
+        ) as get:
+            resolved = external_api.fetch_yildiztop_users_by_referral_tokens(["token0007", "token0002"])
+        self.assertEqual(self._ids(resolved), {"token0007": [7], "token0002": [2]})
+        # The token lists and the directory stamp (this process holds the directory) in one read.
+        self.assertEqual((many.call_count, get.call_count), (1, 0))
+        self.assertEqual(len(self.external_calls), calls_before)
+
+    def test_misses_are_fetched_concurrently_in_request_order(self):
+        tokens = ["token0001", "token0009", "token9999", "token0005"]
+        resolved = external_api.fetch_yildiztop_users_by_referral_tokens(tokens)
+        self.assertEqual(list(resolved), tokens)
+        self.assertEqual(self._ids(resolved), {"token0001": [1], "token0009": [9], "token9999": [], "token0005": [5]})
+        self.assertEqual(len(self.external_calls), 4)
+
+    def test_view_rejects_too_many_tokens(self):
+        self.client.force_login(self.users[0])
+        tokens = ",".join(f"t{i}" for i in range(51))
+        response = self.client.get(reverse("api_clients_batch"), {"tokens": tokens})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.external_calls, [])
+
+        response = self.client.get(reverse("api_clients_batch"), {"tokens": "token0003, token9999"})
+        self.assertEqual(response.json()["missing"], ["token9999"])
+        self.assertEqual([c["id"] for c in response.json()["results"]["token0003"]], [3])
+
+
+class UserSearchTests(SeededTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        User.objects.bulk_create(
+            [User(username=f"Picker{i:02d}", email=f"picker{i:02d}@example.com") for i in range(25)]
+        )
+
+    def test_prefix_search_pages(self):
+        self.client.force_login(self.cashier)
+        names, cursor = [], None
+        while True:
+            params = {"q": "pick", "limit": 10, **({"cursor": cursor} if cursor else {})}
+            with self.assertBudget(queries=4):
+                data = self.client.get(reverse("api_users"), params).json()
+            names += [r["username"] for r in data["results"]]
+            cursor = data["next_cursor"]
+            if not cursor:
+                break
+        self.assertEqual(names, [f"Picker{i:02d}" for i in range(25)])
+
+    def test_email_search(self):
+        self.client.force_login(self.cashier)
+        data = self.client.get(reverse("api_users"), {"q": "PICKER07@ex"}).json()
+        self.assertEqual([r["username"] for r in data["results"]], ["Picker07"])
+
+    def test_non_ascii_names_fold_like_python(self):
+        names = ["Иван", "иванов", "ИВАНОВА", "Игорь", "Straße"]
+        User.objects.bulk_create([User(username=n, email=f"{i}@example.com") for i, n in enumerate(names)])
+        for query in ("иван", "Иван", "ИВАН"):
+            found = user_search.search_users(query).results
+            self.assertEqual([r["username"] for r in found], ["Иван", "иванов", "ИВАНОВА"], query)
+        first = user_search.search_users("и", limit=2)
+        rest = user_search.search_users("и", cursor=first.next_cursor, limit=2)
+        self.assertEqual([r["username"] for r in first.results + rest.results], ["Иван", "иванов", "ИВАНОВА", "Игорь"])
+        self.assertIsNone(rest.next_cursor)
+        self.assertEqual([r["username"] for r in user_search.search_users("straß").results], ["Straße"])
+
+    def test_cashiers_only(self):
+        self.client.force_login(self.users[0])
+        self.assertEqual(self.client.get(reverse("api_users"), {"q": "pick"}).status_code, 302)
+
+
+class VelocityLimitTests(SeededTestCase):
+    def _deposit(self, amount: str):
+        return self.client.post(reverse("cashier_deposit"), {"to_user": self.users[1].pk, "amount": amount})
+
+    def test_hourly_amount_limit_counts_history_and_new_deposits(self):
+        # The 30 seeded transfers (150.00) are recounted from the database on a cold cache.
+        VelocityLimit.objects.create(
+            group=Group.objects.get(name="main_cashier"),
+            kind=VelocityLimit.Kind.TRANSFER_OUT,
+            period=VelocityLimit.Period.HOUR,
+            max_amount=Decimal("300"),
+        )
+        self.client.force_login(self.cashier)
+        self._deposit("100.00")
+        response = self._deposit("60.00")
+        self.assertRedirects(response, reverse("cashier_deposit"), fetch_redirect_response=False)
+        self.assertEqual(WalletTransfer.objects.count(), self.ROWS + 1)
+        self.assertTrue(any("300.00" in str(m) for m in response.wsgi_request._messages))
+
+    def test_user_limit_overrides_group_limit(self):
+        kind, day = VelocityLimit.Kind.TRANSFER_OUT, VelocityLimit.Period.DAY
+        VelocityLimit.objects.create(group=Group.objects.get(name="main_cashier"), kind=kind, period=day, max_count=1)
+        VelocityLimit.objects.create(user=self.cashier, kind=kind, period=day, max_count=100)
+        self.assertIsNone(velocity_check(self.cashier, self.cashier_wallet.pk, kind, Decimal("1")))
+
+    def test_warm_check_needs_no_queries_and_sees_limit_changes(self):
+        kind, hour = VelocityLimit.Kind.WITHDRAW, VelocityLimit.Period.HOUR
+        VelocityLimit.objects.create(kind=kind, period=hour, max_count=6)
+        wallet_id = self.wallets[0].pk
+        self.assertIsNone(velocity_check(self.users[0], wallet_id, kind, Decimal("1")))
+        with self.assertNumQueries(0):
+            self.assertIsNone(velocity_check(self.users[0], wallet_id, kind, Decimal("1")))
+        VelocityLimit.objects.create(user=self.users[0], kind=kind, period=hour, max_count=5)
+        breach = velocity_check(self.users[0], wallet_id, kind, Decimal("1"))
+        self.assertEqual((breach.max_count, breach.used_count), (5, 5))
+
+    def test_send_is_counted_after_success(self):
+        # users[0] has 5 synced withdrawals from the seed data.
+        VelocityLimit.objects.create(
+            kind=VelocityLimit.Kind.WITHDRAW, period=VelocityLimit.Period.DAY, max_count=6
+        )
+        self.client.force_login(self.users[0])
+        self.client.get(reverse("transaction_create"))
+        data = {"client_id": "3", "type": Transaction.Type.WITHDRAW, "amount": "5.00", "note": ""}
+        self.client.post(reverse("transaction_create"), data)
+        self.client.post(reverse("transaction_create"), data)
+        self.assertEqual(Transaction.objects.filter(wallet=self.wallets[0]).count(), 11)
+        self.assertEqual(len(self.external_calls), 2)
+
+
+class LiveFeedTests(SeededTestCase):
+    def _poll(self, last_id=None) -> tuple[list[tuple[str, dict]], str]:
+        headers = {"HTTP_LAST_EVENT_ID": last_id} if last_id else {}
+        response = self.client.get(reverse("api_feed"), **headers)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        events, last = [], None
+        for block in response.content.decode().split("\n\n"):
+            fields = dict(line.split(": ", 1) for line in block.splitlines() if ": " in line)
+            if "event" in fields:
+                events.append((fields["event"], json.loads(fields["data"])))
+            last = fields.get("id", last)
+        return events, last
+
+    def test_answers_at_once_and_resumes_from_last_event_id(self):
+        self.client.force_login(self.users[0])
+        events, cursor = self._poll()
+        self.assertEqual(events, [])
+
+        transfer = WalletTransfer.objects.create(
+            from_wallet=self.cashier_wallet, to_wallet=self.wallets[0], amount=Decimal("1234.50")
+        )
+        Wallet.objects.filter(pk=self.wallets[0].pk).update(balance=Decimal("2234.50"))
+        events, cursor = self._poll(cursor)
+        self.assertEqual([(kind, data["id"]) for kind, data in events[:-1]], [("transfer", transfer.pk)])
+        self.assertEqual(events[-1], ("wallet", {"balance": formats.localize(Decimal("2234.50"))}))
+
+        self.assertEqual(self._poll(cursor), ([], cursor))
+
+
+    def test_first_connect_resumes_from_the_rendered_page(self):
+        self.client.force_login(self.users[0])
+        page = self.client.get(reverse("dashboard")).content.decode()
+        feed_url = html.unescape(re.search(r'data-feed-url="([^"]+)"', page).group(1))
+        # Committed after the page was rendered, before EventSource connects.
+        transfer = WalletTransfer.objects.create(
+            from_wallet=self.cashier_wallet, to_wallet=self.wallets[0], amount=Decimal("3.00")
+        )
+        response = self.client.get(feed_url)
+        self.assertIn(f'"id": {transfer.pk}', response.content.decode())
+
+class RollupTests(SeededTestCase):
+    def _rollups(self):
+        return sorted(DailyRollup.objects.values_list("day", "wallet_id", "kind", "total", "count"))
+
+    def _age(self, minutes: int = 5):
+        moment = timezone.now() - timedelta(minutes=minutes)
+        Transaction.objects.update(created_at=moment, updated_at=moment)
+        WalletTransfer.objects.update(created_at=moment, updated_at=moment)
+
+    def _transaction(self, created_at, amount="7.00") -> Transaction:
+        tx = Transaction.objects.create(
+            wallet=self.wallets[0],
+            type=Transaction.Type.DEPOSIT,
+            amount=Decimal(amount),
+            external_sync_status=Transaction.ExternalSyncStatus.SYNCED,
+        )
+        Transaction.objects.filter(pk=tx.pk).update(created_at=created_at)
+        return tx
+
+    def test_chunks_stop_before_the_first_unsettled_row_and_resume(self):
+        self._age()
+        self.assertEqual(update_rollups(batch_size=7), {"transaction": self.ROWS, "wallet_transfer": self.ROWS})
+        # A fresh row, then a backdated one (e.g. imported) with a higher id: its old
+        # created_at must not pull the fresh row in before it has settled.
+        fresh = self._transaction(timezone.now())
+        backdated = self._transaction(timezone.now() - timedelta(days=3), amount="3.00")
+        self.assertEqual(update_rollups()["transaction"], 0)
+        self.assertEqual(RollupCursor.objects.get(source="transaction").last_id, fresh.pk - 1)
+
+        with mock.patch("core.rollups.timezone.now", return_value=timezone.now() + timedelta(minutes=1)):
+            self.assertEqual(update_rollups()["transaction"], 2)
+        self.assertEqual(RollupCursor.objects.get(source="transaction").last_id, backdated.pk)
+
+        incremental = self._rollups()
+        rebuild_rollups(timezone.localdate() - timedelta(days=5), timezone.localdate())
+        self.assertEqual(self._rollups(), incremental)
+
+    def test_reports_page_reads_the_rollups(self):
+        self._age()
+        update_rollups()
+        self.client.force_login(self.cashier)
+        response = self.client.get(reverse("reports"))
+        self.assertEqual(response.status_code, 200)
+        by_wallet = {row["username"]: row for row in response.context["by_wallet"]}
+        # user0 has 5 seeded deposits, 5 withdrawals and 10 transfers in.
+        self.assertEqual((by_wallet["user0"]["deposit"], by_wallet["user0"]["withdraw"]), (Decimal("50.00"),) * 2)
+        self.assertEqual(by_wallet["user0"]["transfer_in"], Decimal("50.00"))
+        self.assertEqual(by_wallet["cashier"]["transfer_out"], Decimal("150.00"))
+        self.assertEqual(sum(day["deposit"] for day in response.context["by_day"]), Decimal("150.00"))
+
+    def test_rebuild_counts_archived_rows(self):
+        old = timezone.now() - timedelta(days=200)
+        self._age()
+        Transaction.objects.filter(id__in=Transaction.objects.order_by("id").values("id")[:12]).update(created_at=old)
+        WalletTransfer.objects.filter(id__in=WalletTransfer.objects.order_by("id").values("id")[:12]).update(
+            created_at=old
+        )
+        update_rollups()
+        before = self._rollups()
+
+        moved = archive_old_rows(older_than_days=180)
+        self.assertEqual(moved, {"transaction": 12, "wallettransfer": 12})
+        rebuild_rollups(old.date() - timedelta(days=1), timezone.now().date())
+        self.assertEqual(self._rollups(), before)
+
+
+class ChangeFeedTests(SeededTestCase):
+    def setUp(self):
+        super().setUp()
+        # Seeded rows are brand new; age them past the settle horizon, all on one timestamp.
+        self.settled = timezone.now() - timedelta(minutes=5)
+        Transaction.objects.update(updated_at=self.settled)
+        WalletTransfer.objects.update(updated_at=self.settled)
+
+    def _walk(self, source: str, limit: int, cursor=None) -> tuple[list[int], object]:
+        ids = []
+        while True:
+            batch = changes_since(source, cursor, limit)
+            ids += [row["id"] for row in batch.rows]
+            cursor = batch.cursor
+            if not batch.more:
+                return ids, cursor
+
+    def test_pages_through_equal_timestamps_without_gaps_or_duplicates(self):
+        ids, cursor = self._walk("transaction", limit=7)
+        self.assertEqual(ids, sorted(Transaction.objects.values_list("id", flat=True)))
+        self.assertEqual(changes_since("transaction", cursor).rows, [])
+
+    def test_unsettled_rows_are_held_back_then_delivered_once_changed(self):
+        _, cursor = self._walk("wallet_transfer", limit=100)
+        fresh = WalletTransfer.objects.create(
+            from_wallet=self.cashier_wallet, to_wallet=self.wallets[0], amount=Decimal("1.00")
+        )
+        self.assertEqual(changes_since("wallet_transfer", cursor).rows, [])
+
+        changed = Transaction.objects.order_by("id").first()
+        _, tx_cursor = self._walk("transaction", limit=100)
+        Transaction.objects.filter(pk=changed.pk).update(
+            note="fixed", updated_at=self.settled + timedelta(minutes=1)
+        )
+        WalletTransfer.objects.filter(pk=fresh.pk).update(updated_at=self.settled + timedelta(minutes=1))
+        self.assertEqual([r["id"] for r in changes_since("wallet_transfer", cursor).rows], [fresh.pk])
+        rows = changes_since("transaction", tx_cursor).rows
+        self.assertEqual([(r["id"], r["note"]) for r in rows], [(changed.pk, "fixed")])
+
+    def test_save_bumps_updated_at(self):
+        transfer = WalletTransfer.objects.order_by("id").first()
+        transfer.save()
+        transfer.refresh_from_db()
+        self.assertGreater(transfer.updated_at, self.settled)
+
+    def test_api_is_staff_only_and_validates_input(self):
+        url = reverse("api_changes")
+        self.client.force_login(self.users[0])
+        self.assertEqual(self.client.get(url, {"source": "transaction"}).status_code, 403)
+
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get(url, {"source": "wallet"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"source": "transaction", "cursor": "nope"}).status_code, 400)
+        first = self.client.get(url, {"source": "transaction", "limit": 20}).json()
+        self.assertEqual(len(first["results"]), 20)
+        self.assertTrue(first["more"])
+        rest = self.client.get(url, {"source": "transaction", "cursor": first["cursor"]}).json()
+        self.assertEqual(len(rest["results"]), self.ROWS - 20)
+        self.assertFalse(rest["more"])
+
+    def test_export_command_appends_rows_and_saves_cursor(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output, cursor_file = Path(tmp) / "out.jsonl", Path(tmp) / "cursor"
+            args = ["--source", "wallet_transfer", "--output", output, "--cursor-file", cursor_file, "--batch-size", 8]
+            call_command("export_changes", *map(str, args), stderr=io.StringIO())
+            call_command("export_changes", *map(str, args), stderr=io.StringIO())
+            lines = output.read_text().splitlines()
+            self.assertEqual(len(lines), self.ROWS)
+            last = json.loads(lines[-1])
+            self.assertEqual(cursor_file.read_text().strip().split(".")[1], str(last["id"]))
+
+
+class JsonStreamTests(SimpleTestCase):
+    def _items(self, doc: str, path=("data", "data"), chunk_size: int = 3) -> list:
+        return list(iter_array(io.BytesIO(doc.encode("utf-8")), path, chunk_size=chunk_size))
+
+    def test_items_match_json_loads_across_chunk_boundaries(self):
+        users = [{"id": 12345, "name": "Çağrı \"Ş\" 🙂", "tags": [1, {"a": None}]}, 2.5, "x", []]
+        doc = json.dumps({"success": True, "meta": {"data": [0]}, "data": {"current_page": 1, "data": users}}, indent=1)
+        for chunk_size in (1, 2, 7, 4096):
+            self.assertEqual(self._items(doc, chunk_size=chunk_size), users)
+        self.assertEqual(self._items('{"data":{"data":[123456789]}}'), [123456789])
+
+    def test_numbers_cut_at_the_buffer_end(self):
+        doc = json.dumps({"total": -25000000000.25, "data": {"page": 1e5, "data": [1.5e-3, -25000000000.25, 7]}})
+        for chunk_size in range(1, len(doc) + 1):
+            self.assertEqual(self._items(doc, chunk_size=chunk_size), [1.5e-3, -25000000000.25, 7], chunk_size)
+
+    def test_missing_or_non_array_path_raises(self):
+        self.assertEqual(self._items('{"data":{"data":[]}}'), [])
+        for doc in ('{"success": false}', '{"data": null}', '{"data": {"data": {}}}', "[]", "<html>502</html>", ""):
+            with self.assertRaises(ValueError, msg=doc):
+                self._items(doc)
+
+    def test_error_body_is_a_failed_fetch_not_an_empty_directory(self):
+        cache.clear()
+        external_api._LOCAL_DIRECTORIES.clear()
+        with mock.patch.object(external_api, "urlopen", return_value=FakeResponse({"success": False})):
+            with self.assertRaises(external_api.ExternalApiError):
+                external_api.fetch_yildiztop_directory()
+        self.assertIsNone(external_api.users_cache_stamp(None))
+
+    def test_malformed_json_raises(self):
+        for doc in ('{"data": {"data": [{"id": 1}, {"id": 2', '{"data": {"data": [1 2]}}', '{"data" {"data": []}}'):
+            with self.assertRaises(ValueError, msg=doc):
+                self._items(doc)
+
+    def test_directory_keeps_used_fields_and_skips_malformed_entries(self):
+        rows = [*fake_directory(2), {"name": "no id"}, {"id": 3, "name": "C", "balance": "oops"}]
+        directory = external_api.ClientDirectory.from_rows(iter(rows))
+        self.assertEqual(list(directory.ids), [1, 2, 3])
+        self.assertEqual(directory.get(2).balance, Decimal("2.00"))
+        self.assertIsNone(directory.get(3).balance)
+        self.assertFalse(hasattr(directory.get(1), "image_url"))
+
+    def test_choices_are_built_from_the_columns(self):
+        rows = [*fake_directory(2), {"id": 3, "name": "", "email": None}]
+        directory = external_api.ClientDirectory.from_rows(iter(rows))
+        with mock.patch.object(external_api, "ExternalUser", side_effect=AssertionError("no per-user objects")):
+            choices = directory.choices()
+        self.assertEqual(choices, [(str(u.id), u.label) for u in directory.users()])
+        self.assertEqual(choices[2], ("3", "User 3"))
+
+
+class WalletConcurrencyTests(SeededTestCase):
+    def _racing(self, times: int):
+        """
+        Stand-in for db_transaction in core.balances: another write to the
+        receiving wallet commits right before each of the first `times` writes.
+        """
+        calls = []
+
+        def atomic(*args, **kwargs):
+            if len(calls) < times:
+                balances.adjust(self.wallets[1].pk, balance=Decimal("7.00"))
+            calls.append(1)
+            return transaction_atomic(*args, **kwargs)
+
+        return calls, mock.patch.object(balances, "db_transaction", SimpleNamespace(atomic=atomic))
+
+    def test_conflicting_write_is_retried_without_losing_either_update(self):
+        calls, racing = self._racing(times=1)
+        with racing:
+            transfer = balances.transfer(self.wallets[0].pk, self.wallets[1].pk, Decimal("10.00"))
+        self.assertIsNotNone(transfer)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(Wallet.objects.get(pk=self.wallets[0].pk).balance, Decimal("990.00"))
+        receiver = Wallet.objects.get(pk=self.wallets[1].pk)
+        self.assertEqual(receiver.balance, Decimal("1017.00"))
+        self.assertEqual(receiver.version, 2)
+
+    def test_gives_up_after_max_attempts_and_writes_nothing(self):
+        transfers = WalletTransfer.objects.count()
+        calls, racing = self._racing(times=balances.MAX_ATTEMPTS)
+        with racing, mock.patch.object(balances.time, "sleep"), self.assertRaises(balances.WalletBusy):
+            balances.transfer(self.wallets[0].pk, self.wallets[1].pk, Decimal("10.00"))
+        self.assertEqual(len(calls), balances.MAX_ATTEMPTS)
+        self.assertEqual(Wallet.objects.get(pk=self.wallets[0].pk).balance, Decimal("1000.00"))
+        self.assertEqual(WalletTransfer.objects.count(), transfers)
+
+    def test_insufficient_available_balance(self):
+        Wallet.objects.filter(pk=self.wallets[0].pk).update(held=Decimal("995.00"))
+        self.assertIsNone(balances.transfer(self.wallets[0].pk, self.wallets[1].pk, Decimal("10.00")))
+        self.assertFalse(balances.adjust(self.wallets[0].pk, balance=Decimal("-10.00"), covered=True))
+        self.assertTrue(balances.adjust(self.wallets[0].pk, balance=Decimal("-5.00"), covered=True))
+        wallet = Wallet.objects.get(pk=self.wallets[0].pk)
+        self.assertEqual((wallet.available, wallet.version), (Decimal("0.00"), 1))
+
+    def test_admin_edit_bumps_version(self):
+        self.client.force_login(self.admin)
+        wallet = self.wallets[0]
+        url = reverse("admin:core_wallet_change", args=[wallet.pk])
+        form = {"user": wallet.user_id, "currency": "TMT", "balance": "1234.00", "version_seen": 0}
+        response = self.client.post(url, form)
+        self.assertEqual(response.status_code, 302)
+        wallet.refresh_from_db()
+        self.assertEqual((wallet.balance, wallet.version), (Decimal("1234.00"), 1))
+
+    def test_admin_edit_of_a_changed_wallet_is_refused(self):
+        self.client.force_login(self.admin)
+        wallet = self.wallets[0]
+        url = reverse("admin:core_wallet_change", args=[wallet.pk])
+        self.assertContains(self.client.get(url), 'name="version_seen" value="0"')
+        balances.transfer(wallet.pk, self.wallets[1].pk, Decimal("10.00"))
+        form = {"user": wallet.user_id, "currency": "TMT", "balance": "1234.00", "version_seen": 0}
+        self.assertContains(self.client.post(url, form), WalletAdminForm.CHANGED_CONCURRENTLY)
+        self.assertEqual(Wallet.objects.get(pk=wallet.pk).balance, Decimal("990.00"))
+
+        # Changed after the form was validated: nothing is written, the editor is told to reload.
+        with mock.patch.object(WalletAdminForm, "clean", lambda form: form.cleaned_data):
+            response = self.client.post(url, form, follow=True)
+        self.assertContains(response, WalletAdminForm.CHANGED_CONCURRENTLY)
+        self.assertEqual(Wallet.objects.get(pk=wallet.pk).balance, Decimal("990.00"))
+
+
+class WalletTwoConnectionTests(TransactionTestCase):
+    """
+    An admin correction and a transfer on two real database connections.
+    """
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser("admin", "admin@example.com", "pw")
+        self.sender = Wallet.objects.create(user=User.objects.create_user("sender"), balance=Decimal("1000"))
+        self.receiver = Wallet.objects.create(user=User.objects.create_user("receiver"), balance=Decimal("1000"))
+
+    def test_transfer_retries_over_an_admin_correction(self):
+        read, corrected = threading.Event(), threading.Event()
+        results = []
+
+        def atomic(*args, **kwargs):
+            # The transfer has read both wallets; let the admin write in between, once.
+            if not read.is_set():
+                read.set()
+                corrected.wait(5)
+            return transaction_atomic(*args, **kwargs)
+
+        def run_transfer():
+            try:
+                results.append(balances.transfer(self.sender.pk, self.receiver.pk, Decimal("10.00")))
+            finally:
+                connection.close()
+
+        with mock.patch.object(balances, "db_transaction", SimpleNamespace(atomic=atomic)):
+            worker = threading.Thread(target=run_transfer)
+            worker.start()
+            self.assertTrue(read.wait(5))
+            self.client.force_login(self.admin)
+            url = reverse("admin:core_wallet_change", args=[self.sender.pk])
+            form = {"user": self.sender.user_id, "currency": "TMT", "balance": "500.00", "version_seen": 0}
+            self.assertEqual(self.client.post(url, form).status_code, 302)
+            corrected.set()
+            worker.join(5)
+
+        self.assertIsNotNone(results[0])
+        self.assertEqual(
+            list(Wallet.objects.order_by("pk").values_list("balance", "version")),
+            [(Decimal("490.00"), 2), (Decimal("1010.00"), 1)],
+        )
+
+
+class MoneyTests(SeededTestCase):
+    def test_conversions_are_exact(self):
+        self.assertEqual(to_minor(Decimal("9999999999.99")), 999999999999)
+        self.assertEqual(to_minor(Decimal("-0.1")), -10)
+        self.assertEqual(from_minor(1005), Decimal("10.05"))
+        self.assertEqual(str(from_minor(None)), "0.00")
+        self.assertEqual(json_number(Decimal("-1234567890.1")), "-1234567890.10")
+        with self.assertRaises(ValueError):
+            to_minor(Decimal("0.001"))
+
+    def test_minor_columns_follow_every_write(self):
+        wallet = self.wallets[0]
+        Transaction.objects.bulk_create(
+            [Transaction(wallet=wallet, type=Transaction.Type.WITHDRAW, amount=Decimal("0.10")) for _ in range(10)]
+        )
+        balances.adjust(wallet.pk, balance=Decimal("-0.07"), held=Decimal("0.30"))
+        total = Transaction.objects.filter(wallet=wallet, amount=Decimal("0.10")).aggregate(s=Sum("amount_minor"))["s"]
+        self.assertEqual(from_minor(total), Decimal("1.00"))
+        self.assertEqual(
+            Wallet.objects.filter(pk=wallet.pk).values_list("balance_minor", "held_minor").get(), (99993, 30)
+        )
+
+    def test_update_balance_posts_exact_decimal(self):
+        with mock.patch.object(external_api, "urlopen", return_value=FakeResponse({"success": True})) as urlopen:
+            external_api.post_yildiztop_update_balance("tok", Decimal("-9999999999.99"))
+        body = urlopen.call_args.args[0].data.decode()
+        self.assertIn('"balance": -9999999999.99}', body)
+        self.assertEqual(json.loads(body, parse_float=Decimal)["balance"], Decimal("-9999999999.99"))
@@ -7,7 +7,15 @@ urlpatterns = [
     path("dashboard/", views.dashboard, name="dashboard"),
     path("transactions/new/", views.transaction_create, name="transaction_create"),
     path("cashier/deposit/", views.cashier_deposit, name="cashier_deposit"),
+    path("reports/", views.reports, name="reports"),
+    path("statement/", views.statement, name="statement"),
     path("api/clients/", views.api_clients, name="api_clients"),
+    path("api/feed/", views.api_feed, name="api_feed"),
+    path("api/changes/", views.api_changes, name="api_changes"),
+    path("api/statement/", views.api_statement, name="api_statement"),
+    path("api/clients/batch/", views.api_clients_batch, name="api_clients_batch"),
+    path("api/users/", views.api_users, name="api_users"),
+    path("api/webhooks/yildiztop/", views.yildiztop_webhook, name="yildiztop_webhook"),
 ]
 
 
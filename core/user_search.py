@@ -0,0 +1,90 @@
+"""
+Username/email prefix search for the cashier deposit picker. Served by the
+lower(username) / lower(email) indexes (migration 0019) with keyset pagination,
+so each page is an index range scan however many users there are.
+
+SQLite's LOWER() only folds A-Z, so a query with other letters ("Иван") can't
+be compared with the indexed keys as is: the index narrows the candidates to
+names starting with any case of the first letter, and the rest is matched and
+ordered in Python with str.casefold().
+"""
+
+from dataclasses import dataclass
+
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 50
+
+# Sorts after any character a prefix can be followed by.
+_MAX_CHAR = "\U0010ffff"
+
+
+@dataclass
+class UserSearchPage:
+    results: list[dict]
+    next_cursor: str | None
+
+
+def _after(cursor: str | None) -> tuple[int, str] | None:
+    last_id, _, last_key = (cursor or "").partition(":")
+    return (int(last_id), last_key) if last_id.isdigit() else None
+
+
+def _page(rows: list[dict], limit: int) -> UserSearchPage:
+    # rows: up to limit + 1 dicts with "pk", "key", the username field and "email".
+    User = get_user_model()
+    page = rows[:limit]
+    return UserSearchPage(
+        results=[
+            {"id": r["pk"], "username": r[User.USERNAME_FIELD], "email": r["email"]}
+            for r in page
+        ],
+        next_cursor=f"{page[-1]['pk']}:{page[-1]['key']}" if len(rows) > limit else None,
+    )
+
+
+def search_users(query: str, cursor: str | None = None, limit: int = PAGE_SIZE) -> UserSearchPage:
+    """
+    Users whose username (or email, when the query contains "@") starts with
+    `query`, case-insensitively, ordered by that field. `cursor` is the
+    `next_cursor` of the previous page.
+    """
+    User = get_user_model()
+    query = query.strip()
+    field = "email" if "@" in query else User.USERNAME_FIELD
+    if not query.isascii():
+        return _search_folded(query, field, cursor, limit)
+    prefix = query.lower()
+    qs = User.objects.annotate(key=Lower(field))
+    if prefix:
+        qs = qs.filter(key__gte=prefix, key__lt=prefix + _MAX_CHAR)
+    after = _after(cursor)
+    if after:
+        last_id, last_key = after
+        qs = qs.filter(Q(key__gt=last_key) | Q(key=last_key, pk__gt=last_id))
+    return _page(list(qs.order_by("key", "pk").values("pk", "key", User.USERNAME_FIELD, "email")[: limit + 1]), limit)
+
+
+def _search_folded(query: str, field: str, cursor: str | None, limit: int) -> UserSearchPage:
+    User = get_user_model()
+    prefix = query.casefold()
+    first = query[0]
+    starts = Q()
+    for variant in {first, first.lower(), first.upper(), first.title()}:
+        stored = variant.lower() if variant.isascii() else variant  # what LOWER() makes of it
+        starts |= Q(key__gte=stored, key__lt=stored + _MAX_CHAR)
+    candidates = User.objects.annotate(key=Lower(field)).filter(starts).values("pk", User.USERNAME_FIELD, "email")
+    rows = []
+    for r in candidates.iterator():
+        folded = r[field].casefold()
+        if folded.startswith(prefix):
+            rows.append({**r, "key": folded})
+    rows.sort(key=lambda r: (r["key"], r["pk"]))
+    after = _after(cursor)
+    if after:
+        last_id, last_key = after
+        rows = [r for r in rows if (r["key"], r["pk"]) > (last_key, last_id)]
+    return _page(rows[: limit + 1], limit)
@@ -0,0 +1,191 @@
+"""
+Per-wallet velocity limits (VelocityLimit) over sliding hour/day windows.
+
+Each window is split into buckets held in the shared cache as two counters,
+amount in tiyn and number of operations. A check reads the user's limits,
+every bucket of both windows and their warm markers in one get_many; a
+successful operation increments the current buckets. A window whose marker is
+missing (evicted or flushed cache) is rebuilt from the database with one
+indexed range query and written back.
+"""
+
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Q
+
+from .models import Transaction, VelocityLimit, WalletTransfer
+from .money import from_minor, to_minor
+
+Kind = VelocityLimit.Kind
+Period = VelocityLimit.Period
+
+# Window -> bucket size in seconds: the hour is tracked to 5 minutes, the day to 1 hour.
+BUCKETS = {Period.HOUR: 300, Period.DAY: 3600}
+
+GENERATION_KEY = "vel:gen"
+
+_NO_LIMIT = (None, None)
+
+
+@dataclass
+class VelocityBreach:
+    kind: str
+    period: int
+    max_amount: Decimal | None
+    max_count: int | None
+    used_amount: Decimal
+    used_count: int
+
+    @property
+    def message(self) -> str:
+        window = Period(self.period).label.lower()
+        if self.max_count is not None and self.used_count >= self.max_count:
+            return f"лимит {self.max_count} операций за {window} исчерпан"
+        return f"лимит {self.max_amount} за {window} (уже использовано {self.used_amount})"
+
+
+def bump_limits_generation() -> None:
+    """
+    Invalidate every user's cached limits (a limit or a group membership changed).
+    """
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, int(time.time() * 1000), timeout=None)
+
+
+def _stricter(a: int | None, b: int | None) -> int | None:
+    return b if a is None else a if b is None else min(a, b)
+
+
+def _load_limits(user) -> dict[tuple[str, int], tuple[int | None, int | None]]:
+    # Most specific level wins (user, then groups, then global); within a level the strictest.
+    rows = VelocityLimit.objects.filter(
+        Q(user=user) | Q(group__user=user) | Q(user__isnull=True, group__isnull=True)
+    ).values_list("user_id", "group_id", "kind", "period", "max_amount", "max_count")
+    best: dict[tuple[str, int], tuple[int, int | None, int | None]] = {}
+    for user_id, group_id, kind, period, max_amount, max_count in rows:
+        level = 0 if user_id else 1 if group_id else 2
+        cents = None if max_amount is None else to_minor(max_amount)
+        current = best.get((kind, period))
+        if current is None or level < current[0]:
+            best[(kind, period)] = (level, cents, max_count)
+        elif level == current[0]:
+            best[(kind, period)] = (level, _stricter(current[1], cents), _stricter(current[2], max_count))
+    return {key: (cents, count) for key, (_, cents, count) in best.items()}
+
+
+def _limits(user, generation, cached) -> dict[tuple[str, int], tuple[int | None, int | None]]:
+    if generation is None:
+        cache.add(GENERATION_KEY, int(time.time() * 1000), timeout=None)
+        generation = cache.get(GENERATION_KEY)
+    if cached is not None and cached[0] == generation:
+        return cached[1]
+    limits = _load_limits(user)
+    cache.set(f"vel:limits:{user.pk}", (generation, limits), timeout=3600)
+    return limits
+
+
+def _bucket_key(wallet_id: int, kind: str, period: int, index: int) -> str:
+    return f"vel:{wallet_id}:{kind}:{period}:{index}"
+
+
+def _bucket_keys(wallet_id: int, kind: str, period: int, now: float) -> list[str]:
+    size = BUCKETS[period]
+    current = int(now // size)
+    return [_bucket_key(wallet_id, kind, period, i) for i in range(current - period // size + 1, current + 1)]
+
+
+def _marker_key(wallet_id: int, kind: str, period: int) -> str:
+    return f"vel:{wallet_id}:{kind}:{period}:warm"
+
+
+def _rebuild(wallet_id: int, kind: str, period: int, now: float) -> tuple[int, int]:
+    """
+    Recount a window from the database, store its buckets and mark it warm.
+    """
+    size = BUCKETS[period]
+    first = int(now // size) - period // size + 1
+    since = datetime.fromtimestamp(first * size, tz=dt_timezone.utc)
+    if kind == Kind.TRANSFER_OUT:
+        qs = WalletTransfer.objects.filter(from_wallet_id=wallet_id)
+    else:
+        qs = Transaction.objects.filter(
+            wallet_id=wallet_id, type=kind, external_sync_status=Transaction.ExternalSyncStatus.SYNCED
+        )
+    amounts: dict[int, int] = defaultdict(int)
+    counts: dict[int, int] = defaultdict(int)
+    for created_at, amount in qs.filter(created_at__gte=since).values_list("created_at", "amount_minor"):
+        i = int(created_at.timestamp() // size)
+        amounts[i] += amount
+        counts[i] += 1
+    values = {_marker_key(wallet_id, kind, period): 1}
+    for i in amounts:
+        base = _bucket_key(wallet_id, kind, period, i)
+        values[f"{base}:a"] = amounts[i]
+        values[f"{base}:n"] = counts[i]
+    cache.set_many(values, timeout=period + size)
+    return sum(amounts.values()), sum(counts.values())
+
+
+def check(user, wallet_id: int, kind: str, amount: Decimal) -> VelocityBreach | None:
+    """
+    The limit that one more operation of `kind` for `amount` would exceed, or None.
+    Costs one cache round trip while counters and limits are cached.
+    """
+    now = time.time()
+    windows = {period: _bucket_keys(wallet_id, kind, period, now) for period in BUCKETS}
+    keys = [GENERATION_KEY, f"vel:limits:{user.pk}"]
+    for period, buckets in windows.items():
+        keys.append(_marker_key(wallet_id, kind, period))
+        keys += [f"{b}:{c}" for b in buckets for c in "an"]
+    found = cache.get_many(keys)
+    limits = _limits(user, found.get(GENERATION_KEY), found.get(f"vel:limits:{user.pk}"))
+
+    cents = to_minor(amount)
+    for period, buckets in windows.items():
+        max_amount, max_count = limits.get((kind, period), _NO_LIMIT)
+        if max_amount is None and max_count is None:
+            continue
+        if _marker_key(wallet_id, kind, period) in found:
+            used_amount = sum(found.get(f"{b}:a", 0) for b in buckets)
+            used_count = sum(found.get(f"{b}:n", 0) for b in buckets)
+        else:
+            used_amount, used_count = _rebuild(wallet_id, kind, period, now)
+        if (max_amount is not None and used_amount + cents > max_amount) or (
+            max_count is not None and used_count + 1 > max_count
+        ):
+            return VelocityBreach(
+                kind=kind,
+                period=period,
+                max_amount=None if max_amount is None else from_minor(max_amount),
+                max_count=max_count,
+                used_amount=from_minor(used_amount),
+                used_count=used_count,
+            )
+    return None
+
+
+def _incr(key: str, delta: int, timeout: int) -> None:
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        if not cache.add(key, delta, timeout=timeout):
+            cache.incr(key, delta)
+
+
+def record(wallet_id: int, kind: str, amount: Decimal) -> None:
+    """
+    Count a successful operation in the current bucket of every window.
+    """
+    now = time.time()
+    cents = to_minor(amount)
+    for period, size in BUCKETS.items():
+        base = _bucket_key(wallet_id, kind, period, int(now // size))
+        _incr(f"{base}:a", cents, timeout=period + size)
+        _incr(f"{base}:n", 1, timeout=period + size)
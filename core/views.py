@@ -1,21 +1,41 @@
-from decimal import Decimal
+import json
+from datetime import date, timedelta
 
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.shortcuts import redirect, render
-from django.http import JsonResponse
-from django.db import transaction as db_transaction
-from django.db.models import F
+from django.shortcuts import get_object_or_404, redirect, render
+from django.conf import settings
+from django.http import Http404, HttpResponse, JsonResponse
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.cache import cache_control
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition, require_POST
 
+from .archive import transaction_history
+from .changes import BATCH_SIZE, MAX_BATCH_SIZE, SOURCES, ChangeCursor, changes_since, row_json
+from .conditional import api_clients_etag, api_clients_last_modified, dashboard_etag, dashboard_replica_ok
+from .data_version import get_data_version, history_cache_enabled
+from .feed import FeedCursor, feed_since, wallet_event
 from .forms import CashierDepositForm, TransactionCreateForm
 from .external_api import (
+    ClientDirectory,
     ExternalApiError,
+    fetch_yildiztop_directory,
     fetch_yildiztop_users_by_referral_token,
-    fetch_yildiztop_users,
+    fetch_yildiztop_users_by_referral_tokens,
     post_yildiztop_update_balance,
 )
-from .models import Transaction, Wallet, WalletTransfer
+from .holds import capture, release, release_expired, reserve
+from .models import Transaction, VelocityLimit, Wallet
 from .permissions import is_main_cashier, main_cashier_required
+from .ratelimit import ratelimit
+from .replica import replica_reads
+from .rollups import report_by_day, report_by_wallet
+from .statement import MAX_PAGE_SIZE, PAGE_SIZE, StatementCursor, statement_page
+from . import balances, user_search, velocity
+from .webhooks import SIGNATURE_HEADER, WebhookError, handle_events, parse_events, verify_signature
 
 
 def home(request):
@@ -24,16 +44,21 @@ def home(request):
     return redirect("login")
 
 
+@replica_reads(when=dashboard_replica_ok)
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=dashboard_etag)
 def dashboard(request):
-    wallet, _ = Wallet.objects.get_or_create(user=request.user)
+    # Plain read first: get_or_create() always goes to the primary.
+    wallet = Wallet.objects.filter(user=request.user).first()
+    if wallet is None:
+        wallet, _ = Wallet.objects.get_or_create(user=request.user)
     cashier = is_main_cashier(request.user)
+    # History is evaluated lazily: the template serves it from the fragment cache
+    # (keyed by data_version) and only runs these queries on a miss.
     if cashier:
         user_id = (request.GET.get("user") or "").strip()
-        qs = Transaction.objects.select_related("wallet", "wallet__user").all()
-        if user_id:
-            qs = qs.filter(wallet__user_id=user_id)
-        transactions = qs[:25]
+        transactions = SimpleLazyObject(lambda: transaction_history(25, user_id=user_id))
         user_choices = (
             Transaction.objects.select_related("wallet__user")
             .values("wallet__user_id", "wallet__user__username")
@@ -41,7 +66,7 @@ def dashboard(request):
             .order_by("wallet__user__username")
         )
     else:
-        transactions = wallet.transactions.all()[:10]
+        transactions = SimpleLazyObject(lambda: transaction_history(10, wallet_id=wallet.pk))
         user_id = ""
         user_choices = []
     return render(
@@ -53,10 +78,91 @@ def dashboard(request):
             "is_cashier": cashier,
             "filter_user_id": user_id,
             "user_choices": user_choices,
+            "data_version": get_data_version(),
+            # Called by the template right before the rows it renders (and cached
+            # with them), so the feed starts from what the page shows.
+            "feed_cursor": FeedCursor.current,
+            # 0 renders the history fragments without caching them.
+            "history_cache_seconds": 600 if history_cache_enabled() else 0,
         },
     )
 
 
+def _statement_wallet(request) -> Wallet:
+    # Own wallet; the main cashier may look at anyone's with ?user=<id>.
+    user_id = (request.GET.get("user") or "").strip()
+    if user_id and is_main_cashier(request.user):
+        return get_object_or_404(Wallet.objects.select_related("user"), user_id=user_id)
+    wallet = Wallet.objects.select_related("user").filter(user=request.user).first()
+    if wallet is None:
+        wallet, _ = Wallet.objects.get_or_create(user=request.user)
+    return wallet
+
+
+def _page_size(request, default: int = PAGE_SIZE, maximum: int = MAX_PAGE_SIZE) -> int:
+    try:
+        return min(max(int(request.GET.get("limit") or default), 1), maximum)
+    except ValueError:
+        return default
+
+
+@replica_reads(when=dashboard_replica_ok)
+@login_required
+def statement(request):
+    """
+    Wallet statement: transactions and transfers newest first, with a running balance.
+    """
+    wallet = _statement_wallet(request)
+    raw_cursor = request.GET.get("cursor")
+    cursor = StatementCursor.parse(raw_cursor, wallet.pk) if raw_cursor else None
+    if raw_cursor and cursor is None:
+        messages.warning(request, "Ссылка на страницу выписки устарела, показано начало.")
+    page = statement_page(wallet, cursor, _page_size(request))
+    return render(
+        request,
+        "core/statement.html",
+        {
+            "page": page,
+            "wallet": wallet,
+            "filter_user_id": wallet.user_id if wallet.user_id != request.user.pk else "",
+        },
+    )
+
+
+@replica_reads(when=dashboard_replica_ok)
+@login_required
+def api_statement(request):
+    """
+    JSON statement. Supports: ?user=<id> (main cashier), ?limit=, ?cursor=<next_cursor>.
+    """
+    wallet = _statement_wallet(request)
+    raw_cursor = request.GET.get("cursor")
+    cursor = StatementCursor.parse(raw_cursor, wallet.pk) if raw_cursor else None
+    if raw_cursor and cursor is None:
+        return JsonResponse({"error": "invalid cursor"}, status=400)
+    page = statement_page(wallet, cursor, _page_size(request))
+    return JsonResponse(
+        {
+            "wallet": {"username": wallet.user.get_username(), "currency": wallet.currency, "balance": str(wallet.balance)},
+            "results": [
+                {
+                    "kind": e.kind,
+                    "id": e.id,
+                    "created_at": e.created_at.isoformat(),
+                    "amount": str(e.amount),
+                    "delta": str(e.delta),
+                    "balance": str(e.balance),
+                    "type": e.type,
+                    "sync_status": e.sync_status,
+                    "counterparty": e.counterparty,
+                }
+                for e in page.entries
+            ],
+            "next_cursor": page.next_cursor,
+        }
+    )
+
+
 @main_cashier_required
 def cashier_deposit(request):
     from_wallet, _ = Wallet.objects.get_or_create(user=request.user)
@@ -67,21 +173,24 @@ def cashier_deposit(request):
             amount = form.cleaned_data["amount"]
             to_wallet, _ = Wallet.objects.get_or_create(user=to_user)
 
-            with db_transaction.atomic():
-                from_wallet = Wallet.objects.select_for_update().get(pk=from_wallet.pk)
-                to_wallet = Wallet.objects.select_for_update().get(pk=to_wallet.pk)
+            breach = velocity.check(request.user, from_wallet.pk, VelocityLimit.Kind.TRANSFER_OUT, amount)
+            if breach is not None:
+                messages.warning(request, f"Пополнение не выполнено: {breach.message}.")
+                return redirect("cashier_deposit")
 
-                if from_wallet.balance < amount:
-                    messages.warning(request, f"Недостаточно средств: у вас {from_wallet.balance}, нужно {amount}.")
-                    return redirect("cashier_deposit")
-
-                Wallet.objects.filter(pk=from_wallet.pk).update(balance=F("balance") - amount)
-                Wallet.objects.filter(pk=to_wallet.pk).update(balance=F("balance") + amount)
-                WalletTransfer.objects.create(
-                    from_wallet=from_wallet,
-                    to_wallet=to_wallet,
-                    amount=amount,
-                )
+            try:
+                transfer = balances.transfer(from_wallet.pk, to_wallet.pk, amount)
+                # Expired holds count as held until released: free them and try once more.
+                if transfer is None and release_expired(wallet_id=from_wallet.pk):
+                    transfer = balances.transfer(from_wallet.pk, to_wallet.pk, amount)
+            except balances.WalletBusy:
+                messages.error(request, "Кошелёк сейчас занят другими операциями. Попробуйте ещё раз.")
+                return redirect("cashier_deposit")
+            if transfer is None:
+                from_wallet.refresh_from_db(fields=["balance", "held"])
+                messages.warning(request, f"Недостаточно средств: у вас {from_wallet.available}, нужно {amount}.")
+                return redirect("cashier_deposit")
+            velocity.record(from_wallet.pk, VelocityLimit.Kind.TRANSFER_OUT, amount)
 
             messages.success(request, "Пополнение выполнено.")
             return redirect("dashboard")
@@ -91,16 +200,45 @@ def cashier_deposit(request):
     return render(request, "core/cashier_deposit.html", {"form": form, "wallet": from_wallet})
 
 
+def _parse_day(value: str | None, default: date) -> date:
+    try:
+        return date.fromisoformat((value or "").strip())
+    except ValueError:
+        return default
+
+
+@replica_reads()
+@main_cashier_required
+def reports(request):
+    """
+    Period totals per user and per day, read only from the DailyRollup table.
+    """
+    today = timezone.localdate()
+    date_to = _parse_day(request.GET.get("to"), today)
+    date_from = _parse_day(request.GET.get("from"), date_to - timedelta(days=29))
+    if date_from > date_to:
+        date_from, date_to = date_to, date_from
+    return render(
+        request,
+        "core/reports.html",
+        {
+            "date_from": date_from,
+            "date_to": date_to,
+            "by_wallet": report_by_wallet(date_from, date_to),
+            "by_day": report_by_day(date_from, date_to),
+        },
+    )
+
+
 @login_required
 def transaction_create(request):
     wallet, _ = Wallet.objects.get_or_create(user=request.user)
     try:
-        external_users = fetch_yildiztop_users()
+        directory = fetch_yildiztop_directory()
     except ExternalApiError:
-        external_users = []
+        directory = ClientDirectory.empty()
 
-    user_by_id = {str(u.id): u for u in external_users}
-    client_choices = [(str(u.id), u.label) for u in external_users]
+    client_choices = directory.choices()
 
     if not client_choices:
         messages.warning(request, "Список клиентов временно недоступен (внешний API). Попробуйте позже.")
@@ -109,17 +247,28 @@ def transaction_create(request):
         form = TransactionCreateForm(request.POST, client_choices=client_choices)
         if form.is_valid():
             client_id = form.cleaned_data["client_id"]
-            ext_user = user_by_id.get(str(client_id))
+            ext_user = directory.get(client_id)
             if not ext_user:
                 messages.error(request, "Выбранный клиент некорректен. Попробуйте снова.")
                 return redirect("transaction_create")
 
-            # Don't store a transaction if there isn't enough money.
+            # Don't store a transaction if there isn't enough money: a DEPOSIT first
+            # earmarks the amount, so concurrent sends cannot spend it twice.
             amount = form.cleaned_data["amount"]
             tx_type = form.cleaned_data["type"]
-            if tx_type == Transaction.Type.DEPOSIT and (wallet.balance is None or Decimal(wallet.balance) < amount):
-                messages.warning(request, f"Не отправлено: сумма {amount} больше вашего баланса {wallet.balance}.")
+            breach = velocity.check(request.user, wallet.pk, tx_type, amount)
+            if breach is not None:
+                messages.warning(request, f"Не отправлено: {breach.message}.")
                 return redirect("dashboard")
+            hold = None
+            if tx_type == Transaction.Type.DEPOSIT:
+                hold = reserve(wallet.pk, amount)
+                if hold is None:
+                    wallet.refresh_from_db(fields=["balance", "held"])
+                    messages.warning(
+                        request, f"Не отправлено: сумма {amount} больше вашего доступного баланса {wallet.available}."
+                    )
+                    return redirect("dashboard")
 
             # Try external update-balance right away.
             try:
@@ -139,21 +288,18 @@ def transaction_create(request):
                 tx.external_sync_status = Transaction.ExternalSyncStatus.SYNCED
                 tx.external_sync_error = ""
                 tx.save()
+                velocity.record(wallet.pk, tx.type, tx.amount)
 
                 # Update our wallet balance only after external update succeeded.
                 # Requirement: WITHDRAW must NOT decrease own balance.
-                if tx.type == Transaction.Type.DEPOSIT:
-                    with db_transaction.atomic():
-                        updated = Wallet.objects.filter(pk=wallet.pk, balance__gte=tx.amount).update(
-                            balance=F("balance") - tx.amount
-                        )
-                        if updated != 1:
-                            messages.error(request, "Баланс изменился. Внешний запрос успешен, но локальный баланс не обновился.")
-                        else:
-                            # refresh local object for subsequent page render
-                            wallet.refresh_from_db(fields=["balance"])
+                if hold is not None and not capture(hold):
+                    # The hold expired while the external call was running: debit directly.
+                    if not balances.adjust(wallet.pk, balance=-tx.amount, covered=True):
+                        messages.error(request, "Баланс изменился. Внешний запрос успешен, но локальный баланс не обновился.")
                 messages.success(request, "Успешно отправлено.")
             except ExternalApiError as e:
+                if hold is not None:
+                    release(hold)
                 messages.error(request, "Ошибка внешнего сервиса. Операция не отправлена.")
 
             return redirect("dashboard")
@@ -162,11 +308,19 @@ def transaction_create(request):
     return render(request, "core/transaction_form.html", {"form": form})
 
 
+def _client_json(u) -> dict:
+    return {"id": u.id, "label": u.label, "name": u.name, "email": u.email}
+
+
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=api_clients_etag, last_modified_func=api_clients_last_modified)
+@ratelimit("api_clients")
 def api_clients(request):
     """
     JSON endpoint for client search.
     Supports: ?referral_token=...
+    Answers 304 while the cached list for the token is unchanged.
     """
     referral_token = (request.GET.get("referral_token") or "").strip()
     if not referral_token:
@@ -177,13 +331,135 @@ def api_clients(request):
     except ExternalApiError:
         users = []
 
+    response = JsonResponse({"results": [_client_json(u) for u in users]})
+    # The list may have just been fetched: expose validators for the next request.
+    etag = api_clients_etag(request)
+    if etag:
+        response["ETag"] = quote_etag(etag)
+        response["Last-Modified"] = http_date(api_clients_last_modified(request).timestamp())
+    return response
+
+
+@main_cashier_required
+@ratelimit("api_users")
+def api_users(request):
+    """
+    JSON endpoint for the cashier deposit user picker.
+    Supports: ?q=<username prefix, or email prefix if it contains "@">, ?cursor=<next_cursor>, ?limit=
+    """
+    page = user_search.search_users(
+        request.GET.get("q") or "",
+        cursor=request.GET.get("cursor"),
+        limit=_page_size(request, user_search.PAGE_SIZE, user_search.MAX_PAGE_SIZE),
+    )
+    return JsonResponse({"results": page.results, "next_cursor": page.next_cursor})
+
+
+@login_required
+def api_changes(request):
+    """
+    Change feed for analytics (staff only, see core.changes).
+    Supports: ?source=transaction|wallet_transfer, ?cursor=<cursor of the previous batch>, ?limit=
+    """
+    if not request.user.is_staff:
+        return JsonResponse({"error": "forbidden"}, status=403)
+    source = request.GET.get("source") or ""
+    if source not in SOURCES:
+        return JsonResponse({"error": f"source must be one of: {', '.join(sorted(SOURCES))}"}, status=400)
+    raw_cursor = request.GET.get("cursor")
+    cursor = ChangeCursor.parse(raw_cursor) if raw_cursor else None
+    if raw_cursor and cursor is None:
+        return JsonResponse({"error": "invalid cursor"}, status=400)
+    batch = changes_since(source, cursor, _page_size(request, BATCH_SIZE, MAX_BATCH_SIZE))
     return JsonResponse(
         {
-            "results": [
-                {"id": u.id, "label": u.label, "name": u.name, "email": u.email}
-                for u in users
-            ]
+            "source": source,
+            "results": [row_json(row) for row in batch.rows],
+            "cursor": str(batch.cursor) if batch.cursor else None,
+            "more": batch.more,
+            "lag_seconds": batch.lag_seconds,
         }
     )
 
-# Create your views here.
+
+API_CLIENTS_BATCH_MAX = 50
+
+
+@login_required
+@ratelimit("api_clients_batch")
+def api_clients_batch(request):
+    """
+    JSON endpoint resolving many referral tokens in one request.
+    Supports: ?tokens=a,b,c (comma/whitespace separated) or repeated ?referral_token=...
+    Returns {"results": {token: [client, ...]}, "missing": [token, ...]}.
+    """
+    raw = " ".join([request.GET.get("tokens") or "", *request.GET.getlist("referral_token")])
+    tokens = list(dict.fromkeys(t for t in raw.replace(",", " ").split() if t))
+    if len(tokens) > API_CLIENTS_BATCH_MAX:
+        return JsonResponse({"error": f"too many tokens (max {API_CLIENTS_BATCH_MAX})"}, status=400)
+
+    resolved = fetch_yildiztop_users_by_referral_tokens(tokens)
+    return JsonResponse(
+        {
+            "results": {t: [_client_json(u) for u in users] for t, users in resolved.items()},
+            "missing": [t for t, users in resolved.items() if not users],
+        }
+    )
+
+
+@csrf_exempt
+@require_POST
+def yildiztop_webhook(request):
+    """
+    Client-change notifications from Yildiztop (see core.webhooks): updates the
+    cached client directories in place instead of waiting for their TTL.
+    """
+    secret = settings.YILDIZTOP_WEBHOOK_SECRET
+    if not secret:
+        raise Http404
+    try:
+        verify_signature(request.body, request.META.get(SIGNATURE_HEADER, ""), secret)
+    except WebhookError as e:
+        return JsonResponse({"error": str(e)}, status=403)
+    try:
+        events = parse_events(request.body)
+    except WebhookError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    return JsonResponse(handle_events(events))
+
+
+# Milliseconds the browser waits before asking for the next batch.
+FEED_RETRY_MS = 5000
+
+
+@login_required
+def api_feed(request):
+    """
+    Server-Sent Events feed of new/updated transactions and new transfers,
+    answered at once: the response carries what is new since Last-Event-ID
+    (or ?cursor=, the dashboard's render-time position) and ends, and EventSource
+    reconnects after FEED_RETRY_MS with the last id. No worker thread is held
+    between polls.
+    """
+    cashier = is_main_cashier(request.user)
+    user_id = (request.GET.get("user") or "").strip() if cashier else ""
+    own_wallet_id = Wallet.objects.filter(user=request.user).values_list("pk", flat=True).first()
+    wallet_id = None if cashier else own_wallet_id
+    cursor = FeedCursor.parse(request.headers.get("Last-Event-ID") or request.GET.get("cursor"))
+    if cursor is None:
+        cursor = FeedCursor.current()
+        events = []
+    else:
+        events, cursor = feed_since(cursor, wallet_id=wallet_id, user_id=user_id)
+
+    parts = [f"retry: {FEED_RETRY_MS}\n"]
+    for event in events:
+        parts.append(f"event: {event['kind']}\ndata: {json.dumps(event)}\n\n")
+    if events and own_wallet_id is not None:
+        balance = Wallet.objects.filter(pk=own_wallet_id).values_list("balance", flat=True).first()
+        parts.append(f"event: wallet\ndata: {json.dumps(wallet_event(balance))}\n\n")
+    # The id goes last so a reconnect after a cut-off body repeats the batch.
+    parts.append(f"id: {cursor}\n\n")
+    response = HttpResponse("".join(parts), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    return response
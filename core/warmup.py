@@ -0,0 +1,38 @@
+import logging
+
+from django.db import connections
+from django.template.loader import get_template
+from django.urls import get_resolver
+
+from .data_version import get_data_version
+from .external_api import ExternalApiError, fetch_yildiztop_directory
+
+logger = logging.getLogger(__name__)
+
+TEMPLATES = [
+    "base.html",
+    "registration/login.html",
+    "core/dashboard.html",
+    "core/transaction_form.html",
+    "core/cashier_deposit.html",
+    "core/reports.html",
+    "core/statement.html",
+]
+
+
+def warm_up() -> None:
+    """
+    Populate per-process and shared caches before taking traffic:
+    URL resolver, compiled templates, the data version and the client directory.
+    Safe to run in the gunicorn master with preload_app (workers inherit the result).
+    """
+    get_resolver()._populate()
+    for name in TEMPLATES:
+        get_template(name)
+    get_data_version()
+    try:
+        fetch_yildiztop_directory()
+    except ExternalApiError:
+        logger.warning("warm-up: client directory is unavailable")
+    # Never hand an open DB connection over to forked workers.
+    connections.close_all()
@@ -0,0 +1,94 @@
+"""
+Signed client-change notifications pushed by Yildiztop
+(POST /api/webhooks/yildiztop/), applied to the cached client directories.
+
+Header  X-Yildiztop-Signature: t=<unix time>,v1=<hex HMAC-SHA256 of "<t>.<raw body>">
+Body    {"id": "<event id>", "type": "user.updated", "data": {"id": 7, "balance": "12.50"}}
+        or {"events": [<event>, ...]}
+"""
+
+import hashlib
+import hmac
+import json
+import time
+
+from django.core.cache import cache
+
+from .external_api import apply_user_changes
+
+SIGNATURE_HEADER = "HTTP_X_YILDIZTOP_SIGNATURE"
+# Older (or future) timestamps are rejected: a captured request can't be replayed later.
+TOLERANCE_SECONDS = 300
+EVENT_TYPES = frozenset({"user.created", "user.updated", "user.balance_changed"})
+MAX_EVENTS = 500
+
+
+class WebhookError(ValueError):
+    pass
+
+
+def sign(body: bytes, secret: str, timestamp: int | None = None) -> str:
+    """
+    Signature header value for `body` (what the sender computes).
+    """
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    digest = hmac.new(secret.encode(), f"{timestamp}.".encode() + body, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+
+def verify_signature(body: bytes, header: str, secret: str) -> None:
+    try:
+        parts = dict(item.split("=", 1) for item in header.split(","))
+        timestamp = int(parts["t"])
+    except (KeyError, ValueError):
+        raise WebhookError("malformed signature header") from None
+    if abs(time.time() - timestamp) > TOLERANCE_SECONDS:
+        raise WebhookError("signature timestamp out of tolerance")
+    expected = sign(body, secret, timestamp).rpartition("v1=")[2]
+    if not hmac.compare_digest(expected, parts.get("v1", "")):
+        raise WebhookError("signature mismatch")
+
+
+def parse_events(body: bytes) -> list[dict]:
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise WebhookError("invalid JSON") from None
+    events = payload.get("events", [payload]) if isinstance(payload, dict) else None
+    if not isinstance(events, list) or not 0 < len(events) <= MAX_EVENTS:
+        raise WebhookError(f"expected an event or 1..{MAX_EVENTS} events")
+    for event in events:
+        if not isinstance(event, dict) or event.get("type") not in EVENT_TYPES:
+            raise WebhookError("unknown event type")
+        data = event.get("data")
+        if not isinstance(data, dict) or not str(data.get("id", "")).isdigit():
+            raise WebhookError("event data must contain a numeric id")
+    return events
+
+
+def handle_events(events: list[dict]) -> dict[str, int]:
+    """
+    Apply events in order, as one batch. Events with an id are applied at most
+    once (redeliveries within the tolerance window are skipped); if applying
+    fails, the batch's events are forgotten again, so the sender's retry is applied.
+    """
+    counts = {"applied": 0, "dropped": 0, "duplicate": 0}
+    fresh, keys = [], []
+    for event in events:
+        key = f"yildiztop_webhook:{event['id']}" if event.get("id") else None
+        if key and not cache.add(key, 1, timeout=TOLERANCE_SECONDS * 2):
+            counts["duplicate"] += 1
+            continue
+        fresh.append(event["data"])
+        if key:
+            keys.append(key)
+    if not fresh:
+        return counts
+    try:
+        results = apply_user_changes(fresh)
+    except Exception:
+        cache.delete_many(keys)
+        raise
+    for applied in results:
+        counts["applied" if applied else "dropped"] += 1
+    return counts
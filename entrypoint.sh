@@ -8,5 +8,11 @@ python manage.py collectstatic --noinput
 echo "Apply database migrations"
 python manage.py migrate
 
-# Run server
-gunicorn config.wsgi:application --bind 127.0.0.1:8000 --log-level debug --workers=8
+# Delete expired sessions in the background (no-op for cache/cookie sessions)
+python manage.py cleanup_sessions --every "${SESSION_CLEANUP_EVERY:-3600}" &
+
+# Give back funds held by operations that never completed (see core.holds)
+python manage.py release_expired_holds --every "${HOLDS_RELEASE_EVERY:-60}" &
+
+# Run server (workers, threads, preload and warm-up: see config/gunicorn.conf.py)
+exec gunicorn -c config/gunicorn.conf.py config.wsgi:application
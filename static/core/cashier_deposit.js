@@ -0,0 +1,85 @@
+(function () {
+  const input = document.getElementById("id_to_user");
+  const btn = document.getElementById("cashierToUserBtn");
+  const label = document.getElementById("cashierToUserLabel");
+  const results = document.getElementById("cashierToUserResults");
+  const search = document.getElementById("cashierToUserSearch");
+  if (!input || !btn || !label || !results || !search) return;
+
+  const apiUrl = results.dataset.apiUrl;
+  let query = "";
+  let nextCursor = null;
+  let requestSeq = 0;
+
+  function item(user) {
+    const name = user.username || "User";
+    const initial = name.slice(0, 1).toUpperCase();
+    const b = document.createElement("button");
+    b.type = "button";
+    b.className = "list-group-item list-group-item-action mc-picker-item";
+    b.innerHTML =
+      '<span class="mc-picker-avatar" aria-hidden="true">' +
+      '</span>' +
+      '<span class="mc-picker-main">' +
+      '<span class="mc-picker-title"></span>' +
+      '<span class="mc-picker-subtitle"></span>' +
+      "</span>";
+    b.querySelector(".mc-picker-avatar").textContent = initial;
+    b.querySelector(".mc-picker-title").textContent = name;
+    b.querySelector(".mc-picker-subtitle").textContent = user.email || "Пополнить этого пользователя";
+    b.addEventListener("click", () => {
+      input.value = String(user.id);
+      label.textContent = name;
+      bootstrap.Dropdown.getOrCreateInstance(btn).hide();
+    });
+    return b;
+  }
+
+  function moreButton() {
+    const b = document.createElement("button");
+    b.type = "button";
+    b.className = "list-group-item list-group-item-action text-center text-muted mc-picker-more";
+    b.textContent = "Показать ещё";
+    b.addEventListener("click", () => load(false));
+    return b;
+  }
+
+  async function load(reset) {
+    const seq = ++requestSeq;
+    const params = new URLSearchParams({ q: query });
+    if (!reset && nextCursor) params.set("cursor", nextCursor);
+    let data;
+    try {
+      const resp = await fetch(apiUrl + "?" + params.toString(), { headers: { "Accept": "application/json" } });
+      if (!resp.ok) return;
+      data = await resp.json();
+    } catch (e) {
+      return;
+    }
+    if (seq !== requestSeq) return; // a newer search is in flight
+    if (reset) results.innerHTML = "";
+    const more = results.querySelector(".mc-picker-more");
+    if (more) more.remove();
+    for (const user of data.results || []) results.appendChild(item(user));
+    if (reset && !(data.results || []).length) {
+      const empty = document.createElement("div");
+      empty.className = "list-group-item text-muted";
+      empty.textContent = "Никого не найдено.";
+      results.appendChild(empty);
+    }
+    nextCursor = data.next_cursor || null;
+    if (nextCursor) results.appendChild(moreButton());
+  }
+
+  let t = null;
+  search.addEventListener("input", () => {
+    if (t) clearTimeout(t);
+    t = setTimeout(() => {
+      query = search.value.trim();
+      load(true);
+    }, 250);
+  });
+  btn.addEventListener("show.bs.dropdown", () => {
+    if (!results.childElementCount) load(true);
+  });
+})();
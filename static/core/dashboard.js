@@ -0,0 +1,54 @@
+(function () {
+  const form = document.getElementById("cashierFilterForm");
+  const select = document.getElementById("cashierUserSelect");
+  const btn = document.getElementById("cashierUserBtn");
+  const label = document.getElementById("cashierUserBtnLabel");
+  const results = document.getElementById("cashierUserResults");
+  const search = document.getElementById("cashierUserSearch");
+  if (!form || !select || !btn || !label || !results || !search) return;
+
+  const options = Array.from(select.options).map((o) => ({ value: o.value, text: o.text }));
+
+  function setSelectedFromSelect() {
+    const opt = select.options[select.selectedIndex];
+    label.textContent = opt ? opt.text : "Все пользователи";
+  }
+
+  function render(items) {
+    results.innerHTML = "";
+    for (const it of items) {
+      const name = it.text || "User";
+      const initial = (name || "?").slice(0, 1).toUpperCase();
+      const b = document.createElement("button");
+      b.type = "button";
+      b.className = "list-group-item list-group-item-action mc-picker-item";
+      b.innerHTML =
+        '<span class="mc-picker-avatar" aria-hidden="true">' +
+        initial +
+        "</span>" +
+        '<span class="mc-picker-main">' +
+        '<span class="mc-picker-title"></span>' +
+        '<span class="mc-picker-subtitle"></span>' +
+        "</span>";
+      b.querySelector(".mc-picker-title").textContent = name;
+      b.querySelector(".mc-picker-subtitle").textContent = it.value ? "Фильтр по пользователю" : "Показать всех";
+      b.addEventListener("click", () => {
+        select.value = it.value;
+        setSelectedFromSelect();
+        bootstrap.Dropdown.getOrCreateInstance(btn).hide();
+        form.submit();
+      });
+      results.appendChild(b);
+    }
+  }
+
+  function filter(q) {
+    const qq = (q || "").trim().toLowerCase();
+    if (!qq) return render(options);
+    render(options.filter((o) => o.text.toLowerCase().includes(qq)));
+  }
+
+  render(options);
+  setSelectedFromSelect();
+  search.addEventListener("input", () => filter(search.value));
+})();
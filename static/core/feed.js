@@ -0,0 +1,77 @@
+(function () {
+  // Live dashboard updates over Server-Sent Events (see core.views.api_feed): each
+  // response ends right away and EventSource polls again with the last event id.
+  // The first request resumes from the ?cursor= the page was rendered with.
+  const table = document.getElementById("txTable");
+  if (!table || !window.EventSource) return;
+
+  const body = table.querySelector("tbody");
+  const cashier = table.dataset.cashier === "1";
+  const limit = parseInt(table.dataset.limit || "25", 10);
+  const balanceEl = document.getElementById("walletBalance");
+
+  function td(text, className) {
+    const cell = document.createElement("td");
+    if (className) cell.className = className;
+    if (text) {
+      cell.textContent = text;
+    } else {
+      const dash = document.createElement("span");
+      dash.className = "text-muted";
+      dash.textContent = "—";
+      cell.appendChild(dash);
+    }
+    return cell;
+  }
+
+  function upsert(rowId, cells) {
+    const tr = document.createElement("tr");
+    tr.dataset.rowId = rowId;
+    for (const c of cells) tr.appendChild(c);
+
+    const existing = body.querySelector('tr[data-row-id="' + rowId + '"]');
+    if (existing) {
+      existing.replaceWith(tr);
+      return;
+    }
+    const empty = body.querySelector(".mc-empty-row");
+    if (empty) empty.remove();
+    body.prepend(tr);
+    const rows = body.querySelectorAll("tr[data-row-id]");
+    for (let i = limit; i < rows.length; i++) rows[i].remove();
+  }
+
+  const source = new EventSource(table.dataset.feedUrl);
+
+  source.addEventListener("transaction", (e) => {
+    const d = JSON.parse(e.data);
+    const cells = [td(String(d.id), "text-muted"), td(d.type_display)];
+    if (cashier) cells.push(td(d.username, "text-muted"));
+    cells.push(
+      td(d.token, "text-truncate font-monospace"),
+      td(d.client, "text-truncate fw-semibold"),
+      td(d.amount, "text-end"),
+      td(d.created_at, "text-nowrap")
+    );
+    upsert("tx-" + d.id, cells);
+  });
+
+  source.addEventListener("transfer", (e) => {
+    const d = JSON.parse(e.data);
+    const route = d.from_username + " → " + d.to_username;
+    const cells = [td(String(d.id), "text-muted"), td("Перевод")];
+    if (cashier) cells.push(td(route, "text-muted"));
+    cells.push(
+      td(""),
+      td(cashier ? "" : route, "text-truncate"),
+      td(d.amount, "text-end"),
+      td(d.created_at, "text-nowrap")
+    );
+    upsert("tr-" + d.id, cells);
+  });
+
+  source.addEventListener("wallet", (e) => {
+    const d = JSON.parse(e.data);
+    if (balanceEl && d.balance) balanceEl.textContent = d.balance;
+  });
+})();
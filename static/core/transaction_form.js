@@ -0,0 +1,129 @@
+(function () {
+  const input = document.getElementById("clientSearch");
+  const select = document.getElementById("id_client_id");
+  const resultsEl = document.getElementById("clientResults");
+  const btn = document.getElementById("clientPickerBtn");
+  if (!input || !select || !resultsEl || !btn) return;
+
+  // Endpoint URLs are rendered by the template as data-* attributes.
+  const apiUrl = input.dataset.apiUrl;
+  const batchUrl = input.dataset.batchUrl;
+
+  const labelEl = btn.querySelector(".mc-client-picker-label");
+  const originalOptions = Array.from(select.options).map((o) => ({
+    value: o.value,
+    text: o.text,
+  }));
+
+  function parseOptionText(text) {
+    // "name (email)" -> {name,email}
+    const m = text.match(/^(.*?)(?:\s*\(([^)]+)\))?\s*$/);
+    const name = (m && m[1] ? m[1] : text).trim();
+    const email = (m && m[2] ? m[2] : "").trim();
+    return { name, email };
+  }
+
+  function renderList(items) {
+    resultsEl.innerHTML = "";
+    if (!items || items.length === 0) {
+      const empty = document.createElement("div");
+      empty.className = "px-3 py-2 text-muted small";
+      empty.textContent = "Клиенты не найдены.";
+      resultsEl.appendChild(empty);
+      return;
+    }
+    for (const it of items) {
+      const { name, email } = parseOptionText(it.text);
+      const a = document.createElement("button");
+      a.type = "button";
+      a.className = "list-group-item list-group-item-action mc-client-item";
+      a.dataset.value = it.value;
+
+      const initial = (name || "?").slice(0, 1).toUpperCase();
+      a.innerHTML =
+        '<span class="mc-client-avatar" aria-hidden="true">' +
+        initial +
+        "</span>" +
+        '<span class="mc-client-main">' +
+        '<span class="mc-client-name"></span>' +
+        (email ? '<span class="mc-client-email"></span>' : "") +
+        "</span>";
+      a.querySelector(".mc-client-name").textContent = name || it.text;
+      if (email) a.querySelector(".mc-client-email").textContent = email;
+
+      a.addEventListener("click", () => {
+        select.value = String(it.value);
+        if (labelEl) labelEl.textContent = it.text;
+        // close dropdown
+        const dd = bootstrap.Dropdown.getOrCreateInstance(btn);
+        dd.hide();
+      });
+      resultsEl.appendChild(a);
+    }
+  }
+
+  function looksLikeReferralToken(q) {
+    const s = (q || "").trim();
+    if (s.length < 6) return false;
+    return /^[a-zA-Z0-9]+$/.test(s);
+  }
+
+  function localFilter(q) {
+    const qq = (q || "").trim().toLowerCase();
+    if (!qq) return renderList(originalOptions);
+    return renderList(originalOptions.filter((o) => o.text.toLowerCase().includes(qq)));
+  }
+
+  function setSelectionFromSelect() {
+    const opt = select.options[select.selectedIndex];
+    if (opt && opt.value) {
+      if (labelEl) labelEl.textContent = opt.text;
+    } else if (labelEl) {
+      labelEl.textContent = "Выберите клиента…";
+    }
+  }
+
+  // init
+  renderList(originalOptions);
+  setSelectionFromSelect();
+
+  function splitTokens(q) {
+    return (q || "").split(/[\s,;]+/).filter(Boolean);
+  }
+
+  async function fetchClients(q) {
+    const tokens = splitTokens(q);
+    if (tokens.length > 1) {
+      // Pasted list of tokens: resolve all of them in one request.
+      const url = batchUrl + "?tokens=" + encodeURIComponent(tokens.join(","));
+      const resp = await fetch(url, { headers: { "Accept": "application/json" } });
+      if (!resp.ok) return [];
+      const data = await resp.json();
+      return Object.values((data && data.results) || {}).flat();
+    }
+    const url = apiUrl + "?referral_token=" + encodeURIComponent(q.trim());
+    const resp = await fetch(url, { headers: { "Accept": "application/json" } });
+    if (!resp.ok) return [];
+    const data = await resp.json();
+    return (data && data.results) || [];
+  }
+
+  let t = null;
+  input.addEventListener("input", function () {
+    const q = input.value || "";
+    const tokens = splitTokens(q);
+    if (tokens.length <= 1) localFilter(q);
+
+    if (tokens.length === 0 || !tokens.every(looksLikeReferralToken)) return;
+    if (t) clearTimeout(t);
+    t = setTimeout(async () => {
+      try {
+        const results = await fetchClients(q);
+        if (!Array.isArray(results) || results.length === 0) return;
+        renderList(results.map((r) => ({ value: String(r.id), text: r.label || String(r.id) })));
+      } catch (e) {
+        // ignore
+      }
+    }, 350);
+  });
+})();